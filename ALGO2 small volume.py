@@ -12,10 +12,25 @@ Created on Wed Mar 26 05:10:22 2025
 @author: supre
 """
 
+import asyncio
+import os
 import signal
+import threading
 import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
+from async_log import AsyncLogger
+from latency_stats import LatencyStats, instrument
+from loop_profiler import PhaseProfiler, profile_requests
+from backpressure import AdaptiveRate, backpressure
+from flatten import flatten
+from poll_scheduler import PollScheduler, count_requests
+from rate_limiter import RateLimiter
+from rit_client import RitApiError, RitClient
+from session_recorder import SessionRecorder, record_session
+from tas_stream import TasStream
+from warm_start import open_connections, start_workers, wait_for_case
 
 class ApiException(Exception):
     pass
@@ -29,6 +44,10 @@ def signal_handler(signum, frame):
 # USER PARAMETERS (Adjust as needed)
 # =============================================================================
 API_KEY = {'X-API-Key': 'NYVYJ53X'}  # Replace with your actual API key
+BASE_URL = os.environ.get('RIT_BASE_URL', 'http://localhost:9999/v1')  # RIT client or rit_mock_server.py
+
+# Tickers quoted concurrently by one engine (shared session, connection pool and order budget)
+TICKERS = ['ALGO']
 
 # Market-making parameters
 # Adjusted to capture a larger effective spread:
@@ -36,13 +55,49 @@ SPREAD = 0.03          # New spread offset (in dollars)
 BUY_VOLUME = 1000        # Reduced volume per BUY order
 SELL_VOLUME = 1000       # Reduced volume per SELL order
 POSITION_THRESHOLD = 500 # Maximum net position before corrective action
+QUOTE_TOLERANCE = 0.02   # Keep a resting quote while its price is within this of the target
+FLATTEN_ON_EXIT = True   # Cancel quotes and flatten all TICKERS concurrently when the loop ends (tick 295, shutdown, error)
+FLATTEN_CHUNK = 5000     # Max shares per MARKET flatten order
+
+# Speed-bump parameters (token bucket, see rate_limiter.py)
+ORDER_LIMIT = 5          # Target orders per second, across all TICKERS
+ORDER_BURST = 2          # Orders allowed back-to-back (2 lets both legs of a pair go out together)
+MAX_RETRIES = 3          # Retries of a request rejected with HTTP 429; 429s also lower the rate (see backpressure.py)
+
+# Loop pacing (tick-aligned adaptive polling, see poll_scheduler.py)
+LOOP_SLEEP = 0.2         # Idle poll interval (in seconds); backs off up to the next tick boundary
+ACTIVE_LOOP_SLEEP = 0.05 # Poll interval while we have open orders or just acted
+POLL_RPS = 25            # Requests per second shared by everything the loop sends
+TICK_SECONDS = 1.0       # Wall-clock length of one tick
+
+# Start-up
+WARM_START = True        # Wait for the case to open and warm up first (see warm_start.py); False = exit unless open
+
+# Market-data reads per loop pass (tick, position, open orders, last price)
+ASYNC_READS = True       # True: issue the reads concurrently; False: serial fallback
+POOL_SIZE = 8            # Keep-alive connections shared by the concurrent reads (grown for many TICKERS)
 
-# Speed-bump parameters
-ORDER_LIMIT = 5          # Target orders per second
-DESIRED_DELAY = 1.0 / ORDER_LIMIT
+# Last price source
+TAS_LAST_PRICE = True    # True: last trade from the time-and-sales stream; False: last history close
 
-# Sleep time between main loop checks (in seconds)
-LOOP_SLEEP = 0.2
+# Paired quote submission
+PIPELINE_PAIRS = True    # True: send BUY and SELL legs concurrently; False: one after another
+
+# API latency instrumentation (see latency_stats.py)
+LATENCY_REPORT_SECONDS = 10          # Periodic one-line summary, 0 = off
+LATENCY_DUMP = 'algo2_latency.csv'   # Written at exit (*.prom = Prometheus text), None = off
+
+# Session recording (see session_recorder.py)
+SESSION_RECORD = 'algo2_session'     # Every API response -> algo2_session.idx/.dat, None = off
+
+# Loop profiling (see loop_profiler.py); set RIT_PROFILE=phases, cprofile or sample to enable
+PROFILE = os.environ.get('RIT_PROFILE', '')
+PROFILE_OUTPUT = 'algo2_profile'     # -> algo2_profile.txt / .collapsed (/ .pstats), written at exit
+
+# Logging (see async_log.py): formatted and written by a background thread, off the loop
+LOG_LEVEL = os.environ.get('RIT_LOG_LEVEL', 'info')     # debug, info, warning, error or off
+LOG_FILE = os.environ.get('RIT_LOG_FILE', '')           # Empty = console
+LOG_FORMAT = os.environ.get('RIT_LOG_FORMAT', 'text')   # 'json' = one JSON object per line
 
 # =============================================================================
 # GLOBALS for Speed Bump
@@ -51,6 +106,16 @@ shutdown = False
 placed_orders = 0
 total_speedbumps = 0.0
 total_transaction_time = 0.0
+total_retry_wait = 0.0                 # Time spent backing off from 429s (not in the transaction times)
+order_limiter = RateLimiter({'orders': (ORDER_LIMIT, ORDER_BURST)})
+stats_lock = threading.Lock()          # Guards the speed bump counters when legs run concurrently
+pair_workers = 2 * len(TICKERS)        # Both legs of every ticker's quote pair at once
+ticker_workers = len(TICKERS)
+pair_executor = ThreadPoolExecutor(max_workers=pair_workers, thread_name_prefix='order-leg')
+ticker_executor = ThreadPoolExecutor(max_workers=ticker_workers, thread_name_prefix='quote')
+api_stats = LatencyStats()
+profiler = PhaseProfiler(PROFILE)
+log = AsyncLogger(LOG_LEVEL, LOG_FILE, LOG_FORMAT)
 
 # =============================================================================
 # HELPER FUNCTIONS
@@ -60,10 +125,10 @@ def get_tick(session):
     """
     Returns the current tick/time in the simulation.
     """
-    resp = session.get('http://localhost:9999/v1/case')
-    if not resp.ok:
-        raise ApiException(f"Failed to get case info: {resp.status_code} {resp.reason}")
-    return resp.json()['tick']
+    try:
+        return session.tick()
+    except RitApiError as e:
+        raise ApiException(f"Failed to get case info: {e}")
 
 def get_last_close(session, ticker):
     """
@@ -71,7 +136,7 @@ def get_last_close(session, ticker):
     Falls back to 0 if no data is found.
     """
     params = {'ticker': ticker, 'limit': 1}
-    resp = session.get('http://localhost:9999/v1/securities/history', params=params)
+    resp = session.get(f'{BASE_URL}/securities/history', params=params)
     if not resp.ok:
         raise ApiException(f"Failed to get history for {ticker}: {resp.status_code} {resp.reason}")
     history = resp.json()
@@ -79,190 +144,536 @@ def get_last_close(session, ticker):
         return history[0]['close']
     return 0
 
+TAS_STREAMS = {}
+
+def get_last_trade(session, ticker):
+    """
+    Returns the last traded price for the given ticker from its time-and-sales
+    stream; each call only fetches the prints since the previous one.
+    Falls back to the last history close until the first print arrives.
+    """
+    stream = TAS_STREAMS.get(ticker)
+    if stream is None:
+        stream = TAS_STREAMS[ticker] = TasStream(session, BASE_URL, ticker)
+    try:
+        stream.update()
+    except (requests.RequestException, ValueError) as e:    # HTTP or connection error, or a bad JSON body
+        raise ApiException(f"Failed to get time and sales for {ticker}: {e}")
+    if stream.last is None:
+        return get_last_close(session, ticker)
+    return stream.last
+
+def get_last_price(session, ticker):
+    """Last price from the source selected by TAS_LAST_PRICE."""
+    if TAS_LAST_PRICE:
+        return get_last_trade(session, ticker)
+    return get_last_close(session, ticker)
+
 def get_open_orders(session):
     """
-    Returns a list of all open orders from the /v1/orders endpoint.
+    Returns a list of all open orders (Order records) from the /v1/orders endpoint.
     """
-    params = {'status': 'OPEN'}
-    resp = session.get('http://localhost:9999/v1/orders', params=params)
-    if not resp.ok:
-        raise ApiException(f"Failed to get open orders: {resp.status_code} {resp.reason}")
-    return resp.json()
+    try:
+        return session.orders('OPEN')
+    except RitApiError as e:
+        raise ApiException(f"Failed to get open orders: {e}")
+
+class FillLedger:
+    """
+    Running fill totals for one ticker, built from its TRANSACTED orders (Order records).
+
+    The ids already ingested are kept in a set, and each update only ingests the
+    orders not in it: one set lookup per listed order and no re-summing, whatever
+    order the quotes filled in (an older resting quote often fills after a newer
+    one). Net position and filled quantities are kept as running totals and read
+    in O(1).
+
+    A gap is detected when the response lists fewer orders than were already
+    ingested (TRANSACTED orders never leave the list). In that case the ledger
+    rebuilds from the full list.
+    """
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+        self.reset()
+
+    def reset(self):
+        self.seen = set()         # order_ids ingested so far
+        self.bought = 0           # Sum of BUY quantity_filled
+        self.sold = 0             # Sum of SELL quantity_filled
+        self.resyncs = 0
+
+    @property
+    def count(self):
+        return len(self.seen)
+
+    @property
+    def net(self):
+        return self.bought - self.sold
+
+    def _ingest(self, order):
+        filled = order.quantity_filled or 0
+        if order.action == 'BUY':
+            self.bought += filled
+        elif order.action == 'SELL':
+            self.sold += filled
+        self.seen.add(order.order_id)
+
+    def update(self, orders):
+        """
+        Ingests a TRANSACTED order list. Returns the number of new orders taken in.
+        """
+        if len(orders) < len(self.seen):
+            self.resync(orders)
+            return len(orders)
+
+        seen = self.seen
+        new_orders = [order for order in orders if order.order_id not in seen]
+        for order in new_orders:
+            self._ingest(order)
+        return len(new_orders)
+
+    def resync(self, orders):
+        """
+        Rebuilds the totals from scratch from a full TRANSACTED order list.
+        """
+        resyncs = self.resyncs + 1
+        self.reset()
+        self.resyncs = resyncs
+        for order in orders:
+            self._ingest(order)
+
+# One ledger per ticker, kept for the whole session
+FILL_LEDGERS = {}
+
+def fill_ledger(ticker):
+    ledger = FILL_LEDGERS.get(ticker)
+    if ledger is None:
+        ledger = FILL_LEDGERS[ticker] = FillLedger(ticker)
+    return ledger
 
 def get_position(session, ticker):
     """
-    Computes net position by summing filled (transacted) orders for the given ticker.
+    Computes net position from filled (transacted) orders for the given ticker.
     Net Position = Sum(BUY filled quantities) - Sum(SELL filled quantities)
     This approach avoids the issue where /v1/trader returns a net position of 0.
+    Fills are accumulated incrementally in the ticker's FillLedger.
     """
-    params = {'status': 'TRANSACTED', 'ticker': ticker}
-    resp = session.get('http://localhost:9999/v1/orders', params=params)
-    if not resp.ok:
-        raise ApiException(f"Failed to get transacted orders: {resp.status_code} {resp.reason}")
-    orders = resp.json()
-    net = 0
+    try:
+        orders = session.orders('TRANSACTED', ticker)
+    except RitApiError as e:
+        raise ApiException(f"Failed to get transacted orders: {e}")
+    ledger = fill_ledger(ticker)
+    ledger.update(orders)
+    return ledger.net
+
+def get_positions(session, tickers):
+    """
+    Same as get_position for several tickers from a single TRANSACTED orders request.
+    Returns {ticker: net position}.
+    """
+    if len(tickers) == 1:
+        return {tickers[0]: get_position(session, tickers[0])}
+    try:
+        orders = session.orders('TRANSACTED')
+    except RitApiError as e:
+        raise ApiException(f"Failed to get transacted orders: {e}")
+    by_ticker = group_by_ticker(orders, tickers)
+    positions = {}
+    for ticker in tickers:
+        ledger = fill_ledger(ticker)
+        ledger.update(by_ticker[ticker])
+        positions[ticker] = ledger.net
+    return positions
+
+def group_by_ticker(orders, tickers):
+    """Splits an order list into {ticker: orders}, keeping the list order."""
+    grouped = {ticker: [] for ticker in tickers}
     for order in orders:
-        filled = order.get('quantity_filled', 0)
-        if order.get('action') == 'BUY':
-            net += filled
-        elif order.get('action') == 'SELL':
-            net -= filled
-    return net
+        if order.ticker in grouped:
+            grouped[order.ticker].append(order)
+    return grouped
+
+def read_market_state(session, tickers):
+    """
+    Synchronous fallback: reads tick, net positions, open orders and last prices
+    one after another. Returns them as a (tick, positions, orders, last_prices)
+    tuple, the last three keyed by ticker.
+    """
+    return (get_tick(session),
+            get_positions(session, tickers),
+            group_by_ticker(get_open_orders(session), tickers),
+            {ticker: get_last_price(session, ticker) for ticker in tickers})
+
+async def read_market_state_async(session, tickers):
+    """
+    Same reads as read_market_state, but all requests are in flight at once
+    over the session's connection pool, so one loop pass costs about one round trip
+    whatever the number of tickers.
+    If any read fails, the first failure in call order is raised, exactly as the
+    serial version would raise it.
+    """
+    results = await asyncio.gather(
+        asyncio.to_thread(get_tick, session),
+        asyncio.to_thread(get_positions, session, tickers),
+        asyncio.to_thread(get_open_orders, session),
+        *(asyncio.to_thread(get_last_price, session, ticker) for ticker in tickers),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    tick, positions, orders = results[:3]
+    return tick, positions, group_by_ticker(orders, tickers), dict(zip(tickers, results[3:]))
 
 def cancel_all_orders(session):
     """
     Cancels all open orders.
     """
-    resp = session.post('http://localhost:9999/v1/commands/cancel', params={'all': 1})
+    resp = session.post(f'{BASE_URL}/commands/cancel', params={'all': 1})
+    if resp.ok:
+        log.info("Cancelled orders: {}", resp.json().get('cancelled_order_ids', []))
+    else:
+        log.warning("Order cancellation failed: {}", resp.json())
+
+def cancel_orders(session, order_ids):
+    """
+    Cancels the given open orders with one bulk cancel request.
+    """
+    resp = session.post(f'{BASE_URL}/commands/cancel', params={'ids': ','.join(str(i) for i in order_ids)})
+    if resp.ok:
+        log.info("Cancelled orders: {}", resp.json().get('cancelled_order_ids', []))
+    else:
+        log.warning("Order cancellation failed: {}", resp.json())
+
+def cancel_order(session, order_id):
+    """
+    Cancels a single open order. Returns True if the exchange accepted the cancel.
+    """
+    resp = session.delete(f'{BASE_URL}/orders/{order_id}')
     if resp.ok:
-        cancelled_ids = resp.json().get('cancelled_order_ids', [])
-        print("Cancelled orders:", cancelled_ids)
+        log.info("Cancelled order {}", order_id)
     else:
-        print("Order cancellation failed:", resp.json())
+        try:
+            error_data = resp.json()
+        except ValueError:
+            error_data = resp.text
+        log.warning("Cancel of order {} failed: {}", order_id, error_data)
+    return resp.ok
 
 # -----------------------------------------------------------------------------
 # SPEED BUMP LOGIC
 # -----------------------------------------------------------------------------
 
-def dynamic_speedbump(transaction_time):
+@profiler.timed('speedbump', 'sleep')
+def dynamic_speedbump(slot=None):
     """
-    Dynamically adjust how long we sleep to maintain the target ORDER_LIMIT.
-    We measure each order's transaction time, then compute a 'speed bump' so that, on average,
-    we stay near ORDER_LIMIT orders/second.
+    Waits for an order token from the ORDER_LIMIT token bucket before an order is sent.
+    The wait is only as long as needed for this order's slot, so a slow order never
+    distorts the pacing of later ones and the rate can never exceed ORDER_LIMIT.
+    `slot` is a token already reserved by reserve_order_slots (its time.monotonic()
+    due time); without one, a token is taken now.
+    Returns this order's speed bump (time waited) and the average so far.
     """
-    global placed_orders, total_speedbumps, total_transaction_time
-
-    order_speedbump = DESIRED_DELAY - transaction_time
-    total_speedbumps += order_speedbump
-    total_transaction_time += transaction_time
-    placed_orders += 1
+    global placed_orders, total_speedbumps
 
-    avg_speedbump = total_speedbumps / placed_orders
-    if avg_speedbump > 0:
-        sleep(avg_speedbump)
+    if slot is None:
+        order_speedbump = order_limiter.acquire('orders')
+    else:
+        order_speedbump = max(0.0, slot - time.monotonic())
+        sleep(order_speedbump)
+    with stats_lock:
+        total_speedbumps += order_speedbump
+        placed_orders += 1
+        avg_speedbump = total_speedbumps / placed_orders
     return order_speedbump, avg_speedbump
 
-def place_order(session, payload):
+@profiler.timed('place_order')
+def place_order(session, payload, slot=None):
     """
-    Places a single order using the given payload. Measures transaction time,
-    applies dynamic speed bump, and returns the response.
+    Places a single order using the given payload. Waits for the speed bump first
+    (or for a pre-reserved `slot`), then measures transaction time, and returns the response.
     """
-    start_time = time.time()
-    resp = session.post('http://localhost:9999/v1/orders', params=payload)
-    transaction_time = time.time() - start_time
+    global total_transaction_time, total_retry_wait
 
-    current_sb, avg_sb = dynamic_speedbump(transaction_time)
+    current_sb, avg_sb = dynamic_speedbump(slot)
+
+    start_time = time.time()
+    resp = session.post(f'{BASE_URL}/orders', params=payload)
+    retry_wait = getattr(resp, 'retry_wait', 0.0)        # 429 back-off sleeps (backpressure.py)
+    transaction_time = time.time() - start_time - retry_wait
+    with stats_lock:
+        total_transaction_time += transaction_time
+        total_retry_wait += retry_wait
 
     if resp.ok:
-        print(f"Order placed: {payload['action']} {payload['quantity']}@{payload.get('price','MKT')} | "
-              f"TxTime={transaction_time:.4f}s | SB={current_sb:.4f}s | AvgSB={avg_sb:.4f}s")
+        log.info("Order placed: {} {} {}@{} | TxTime={:.4f}s | SB={:.4f}s | AvgSB={:.4f}s",
+                 payload['ticker'], payload['action'], payload['quantity'], payload.get('price', 'MKT'),
+                 transaction_time, current_sb, avg_sb)
     else:
         try:
             error_data = resp.json()
         except:
             error_data = resp.text
-        print(f"Order error: {error_data}")
+        log.warning("Order error: {}", error_data)
     return resp
 
 # -----------------------------------------------------------------------------
 # ALGO2 MARKET MAKING LOGIC
 # -----------------------------------------------------------------------------
 
-def submit_order_pair(session, last_price):
+PAYLOAD_TEMPLATES = {}   # (ticker, action, quantity) -> LIMIT payload without the price
+
+def build_payload_templates(tickers):
+    """Pre-builds the quote payloads of every ticker; only the price changes per order."""
+    for ticker in tickers:
+        for action, quantity in (('BUY', BUY_VOLUME), ('SELL', SELL_VOLUME)):
+            PAYLOAD_TEMPLATES[(ticker, action, quantity)] = {
+                'ticker': ticker,
+                'type': 'LIMIT',
+                'quantity': quantity,
+                'action': action,
+            }
+
+def limit_payload(ticker, action, quantity, price):
+    template = PAYLOAD_TEMPLATES.get((ticker, action, quantity))
+    if template is None:
+        template = {'ticker': ticker, 'type': 'LIMIT', 'quantity': quantity, 'action': action}
+    payload = template.copy()
+    payload['price'] = price
+    return payload
+
+def submit_order_pair(session, buy_payload, sell_payload, slots=(None, None)):
     """
-    Submits a BUY and a SELL limit order around the last_price ± SPREAD.
+    Submits a BUY and a SELL limit order (built around the last_price ± SPREAD).
     With the new parameters, the effective profit per share increases.
+
+    With PIPELINE_PAIRS both legs are in flight at the same time (ORDER_BURST lets
+    them through the rate limiter together), so the quote is two-sided after one
+    round trip. `slots` are the legs' pre-reserved order tokens, if any.
+    If one leg is rejected, the surviving leg is cancelled so we are
+    never left quoting one side. Returns (buy_order_id, sell_order_id), or
+    (None, None) if the pair could not be placed.
+    """
+    if PIPELINE_PAIRS:
+        buy_leg = pair_executor.submit(place_order, session, buy_payload, slots[0])
+        sell_leg = pair_executor.submit(place_order, session, sell_payload, slots[1])
+        buy_resp, sell_resp = buy_leg.result(), sell_leg.result()
+    else:
+        buy_resp = place_order(session, buy_payload, slots[0])
+        sell_resp = place_order(session, sell_payload, slots[1])
+
+    if buy_resp.ok and sell_resp.ok:
+        return buy_resp.json()['order_id'], sell_resp.json()['order_id']
+
+    # Roll back whichever leg got through
+    for resp in (buy_resp, sell_resp):
+        if resp.ok:
+            order = resp.json()
+            log.warning("Other leg rejected; rolling back {} order {}", order['action'], order['order_id'])
+            if order.get('status') == 'OPEN':
+                cancel_order(session, order['order_id'])
+    return None, None
+
+def target_quotes(ticker, net_position, last_price):
+    """
+    ALGO2 inventory rules for one ticker: the limit orders we want resting
+    (as order payloads) and the reason.
     """
-    buy_price = last_price - SPREAD
-    sell_price = last_price + SPREAD
-
-    buy_payload = {
-        'ticker': 'ALGO',
-        'type': 'LIMIT',
-        'quantity': BUY_VOLUME,
-        'action': 'BUY',
-        'price': buy_price
-    }
-    sell_payload = {
-        'ticker': 'ALGO',
-        'type': 'LIMIT',
-        'quantity': SELL_VOLUME,
-        'action': 'SELL',
-        'price': sell_price
-    }
-
-    place_order(session, buy_payload)
-    place_order(session, sell_payload)
+    # If net position is too long, only SELL to reduce
+    if net_position > POSITION_THRESHOLD:
+        return [limit_payload(ticker, 'SELL', SELL_VOLUME, last_price + SPREAD)], \
+            "Position too long, reducing inventory"
+    # If net position is too short, only BUY to cover
+    if net_position < -POSITION_THRESHOLD:
+        return [limit_payload(ticker, 'BUY', BUY_VOLUME, last_price - SPREAD)], \
+            "Position too short, covering"
+    # Position is within threshold: quote both sides
+    return [limit_payload(ticker, 'BUY', BUY_VOLUME, last_price - SPREAD),
+            limit_payload(ticker, 'SELL', SELL_VOLUME, last_price + SPREAD)], "Quoting both sides"
+
+def reconcile_quotes(targets, orders, tolerance=QUOTE_TOLERANCE):
+    """
+    Diffs target quotes against the open orders for the same ticker.
+    An open order on the target's side within `tolerance` of the target price is
+    kept (with its queue priority); the closest one wins if several qualify.
+    Returns (order ids to cancel, target payloads to place); both empty when
+    the book already matches.
+    """
+    kept = set()
+    missing = []
+    for target in targets:
+        candidates = [o for o in orders if o.order_id not in kept and o.action == target['action']
+                      and abs(o.price - target['price']) <= tolerance + 1e-9]
+        if candidates:
+            kept.add(min(candidates, key=lambda o: abs(o.price - target['price'])).order_id)
+        else:
+            missing.append(target)
+    return [o.order_id for o in orders if o.order_id not in kept], missing
+
+def plan_quotes(ticker, net_position, orders, last_price):
+    """
+    Target quotes for one ticker reconciled against its open orders.
+    Returns (cancel_ids, payloads, note): the open orders to cancel, the orders
+    to place (a [BUY, SELL] list is sent as a pair), and a description.
+    """
+    targets, reason = target_quotes(ticker, net_position, last_price)
+    cancel_ids, payloads = reconcile_quotes(targets, orders)
+    if not cancel_ids and not payloads:
+        return cancel_ids, payloads, f"{reason}; quotes in place"
+    return cancel_ids, payloads, (f"{reason}; keep {len(orders) - len(cancel_ids)}, "
+                                  f"cancel {len(cancel_ids)}, place {len(payloads)}")
+
+def reserve_order_slots(plans, first):
+    """
+    Reserves one token of the shared order budget for every planned order, taking
+    tickers round-robin (one order each per turn) starting with ticker index `first`,
+    which the caller rotates every pass. When the budget is saturated every ticker
+    gets the same share of it and none is always served first.
+    Returns {ticker: [due time of each order]} on the time.monotonic() clock.
+    """
+    tickers = list(plans)
+    first %= len(tickers)
+    tickers = tickers[first:] + tickers[:first]
+    slots = {ticker: [] for ticker in tickers}
+    for turn in range(max(len(plans[ticker][1]) for ticker in tickers)):
+        for ticker in tickers:
+            if turn < len(plans[ticker][1]):
+                slots[ticker].append(time.monotonic() + order_limiter.reserve('orders'))
+    return slots
+
+def quote_ticker(session, ticker, plan, slots):
+    """
+    Carries out one ticker's plan from plan_quotes using its reserved slots.
+    Stale orders are cancelled before their replacements go out.
+    """
+    cancel_ids, payloads, note = plan
+    log.info("[{}] {}", ticker, note)
+    if cancel_ids:
+        cancel_orders(session, cancel_ids)
+    if len(payloads) == 2:
+        submit_order_pair(session, payloads[0], payloads[1], slots)
+    elif payloads:
+        place_order(session, payloads[0], slots[0])
+
+def quote_all(session, positions, orders, last_prices, rotation):
+    """
+    One engine pass: plans every ticker, reserves their order slots fairly and
+    runs the tickers concurrently on ticker_executor. API errors from any ticker
+    are raised after all of them have finished. Returns the number of cancels and
+    orders sent.
+    """
+    plans = {ticker: plan_quotes(ticker, positions[ticker], orders[ticker], last_prices[ticker])
+             for ticker in TICKERS}
+    slots = reserve_order_slots(plans, rotation)
+    futures = [ticker_executor.submit(quote_ticker, session, ticker, plans[ticker], slots[ticker])
+               for ticker in TICKERS]
+    with profiler.phase('wait_orders', 'network'):
+        for future in futures:
+            future.result()
+    return sum(len(cancel_ids) + len(payloads) for cancel_ids, payloads, _ in plans.values())
 
 def main():
     global shutdown
-    with requests.Session() as s:
-        s.headers.update(API_KEY)
-        tick = get_tick(s)
+    # Keep-alive pool sized so concurrent reads reuse connections instead of opening new ones
+    pool_size = max(POOL_SIZE, 3 * len(TICKERS) + 3)
+    with RitClient(BASE_URL, API_KEY, pool_size=pool_size) as s:
+        profile_requests(s, profiler)
+        instrument(s, api_stats)
+        recorder = SessionRecorder(SESSION_RECORD) if SESSION_RECORD else None
+        if recorder:
+            record_session(s, recorder)
+        api_stats.start_reporter(LATENCY_REPORT_SECONDS, emit=log.info)
+        scheduler = PollScheduler(POLL_RPS, TICK_SECONDS, ACTIVE_LOOP_SLEEP, LOOP_SLEEP)
+        # 429s are retried after their wait hint and slow down the bucket that paces them
+        order_rate = AdaptiveRate(order_limiter.buckets['orders'])
+        poll_rate = AdaptiveRate(scheduler.budget)
+        backpressure(s, {'POST /orders': order_rate, None: poll_rate}, MAX_RETRIES,
+                     sleep=profiler.wrap('retry_wait', time.sleep, 'sleep'))
+        count_requests(s, scheduler)
+        loop = asyncio.new_event_loop() if ASYNC_READS else None
+
+        def read_state():
+            if loop is not None:
+                return loop.run_until_complete(read_market_state_async(s, TICKERS))
+            return read_market_state(s, TICKERS)
+
+        def warm_up():
+            """Does now what the first loop pass would otherwise do cold."""
+            open_connections(s, f'{BASE_URL}/case', pool_size)
+            start_workers(pair_executor, pair_workers)
+            start_workers(ticker_executor, ticker_workers)
+            build_payload_templates(TICKERS)
+            try:
+                read_state()        # One request per read endpoint; catches up TAS streams and fill ledgers
+            except ApiException as e:
+                log.warning("Warm-up read failed: {}", e)
+
+        profiler.start()
+        if WARM_START:
+            log.info("Waiting for the case to open...")
+            tick = wait_for_case(lambda: get_tick(s), scheduler, arm=warm_up, stop=lambda: shutdown)
+        else:
+            tick = get_tick(s)
 
-        print("Starting ALGO2 with dynamic speed bump & position control...")
+        log.info("Starting ALGO2 with dynamic speed bump & position control on {}...", ', '.join(TICKERS))
 
+        tick_line = "Tick: {} | " + " | ".join(f"{ticker} Net Pos: {{}} Open Orders: {{}}" for ticker in TICKERS)
+        rotation = 0
         while tick > 5 and tick < 295 and not shutdown:
             try:
-                net_position = get_position(s, 'ALGO')
-                orders = get_open_orders(s)
-                last_price = get_last_close(s, 'ALGO')
-
-                print(f"Tick: {tick} | Net Pos: {net_position} | Open Orders: {len(orders)}")
-
-                # If net position is too long, place SELL to reduce
-                if net_position > POSITION_THRESHOLD:
-                    print("Position too long, reducing inventory...")
-                    cancel_all_orders(s)
-                    sell_payload = {
-                        'ticker': 'ALGO',
-                        'type': 'LIMIT',
-                        'quantity': SELL_VOLUME,
-                        'action': 'SELL',
-                        'price': last_price + SPREAD
-                    }
-                    place_order(s, sell_payload)
-
-                # If net position is too short, place BUY to cover
-                elif net_position < -POSITION_THRESHOLD:
-                    print("Position too short, covering...")
-                    cancel_all_orders(s)
-                    buy_payload = {
-                        'ticker': 'ALGO',
-                        'type': 'LIMIT',
-                        'quantity': BUY_VOLUME,
-                        'action': 'BUY',
-                        'price': last_price - SPREAD
-                    }
-                    place_order(s, buy_payload)
-
-                else:
-                    # Position is within threshold
-                    if len(orders) == 0:
-                        print("No open orders, submitting a pair...")
-                        submit_order_pair(s, last_price)
-                    elif len(orders) != 2:
-                        print("Unbalanced orders, resetting...")
-                        cancel_all_orders(s)
-                    else:
-                        print("Balanced pair in market; continuing...")
-
-                sleep(LOOP_SLEEP)
-                tick = get_tick(s)
+                with profiler.phase('read', 'network'):
+                    tick, positions, orders, last_prices = read_state()
+                scheduler.observe_tick(tick)
+                if tick <= 5 or tick >= 295:
+                    break
+
+                log.info(tick_line, tick, *[value for ticker in TICKERS
+                                            for value in (positions[ticker], len(orders[ticker]))])
+
+                with profiler.phase('quote'):
+                    acted = quote_all(s, positions, orders, last_prices, rotation)
+                rotation += 1
+
+                # The next pass re-reads the tick together with the rest of the state
+                with profiler.phase('sleep', 'sleep'):
+                    scheduler.wait(active=acted > 0 or any(orders.values()))
 
             except ApiException as e:
-                print("API Error:", e)
+                log.error("API Error: {}", e)
                 break
 
+        if loop is not None:
+            loop.close()
+
+        if FLATTEN_ON_EXIT:
+            try:
+                residual = flatten(s, TICKERS, FLATTEN_CHUNK, reserve=lambda: order_limiter.reserve('orders'),
+                                   executor=pair_executor)
+                log.info("Flattened, residual positions: {}", residual)
+            except RitApiError as e:
+                log.error("Flatten failed: {}", e)
+
         if placed_orders > 0:
             avg_tx_time = total_transaction_time / placed_orders
             avg_sb = total_speedbumps / placed_orders
-            print("\n=== FINAL SPEED BUMP STATS ===")
-            print(f"Orders Placed      : {placed_orders}")
-            print(f"Avg TransactionTime: {avg_tx_time:.4f}s")
-            print(f"Avg SpeedBump Delay: {avg_sb:.4f}s")
+            log.info("\n=== FINAL SPEED BUMP STATS ===")
+            log.info("Orders Placed      : {}", placed_orders)
+            log.info("Avg TransactionTime: {:.4f}s", avg_tx_time)
+            log.info("Avg SpeedBump Delay: {:.4f}s", avg_sb)
+            log.info("Final Order Rate   : {:.2f}/s ({} rejected with 429)", order_rate.rate, order_rate.rejections)
+            log.info("Total Retry Wait   : {:.4f}s", total_retry_wait)
         else:
-            print("No orders placed; no stats available.")
+            log.info("No orders placed; no stats available.")
+
+        api_stats.stop_reporter()
+        log.close()                    # Writes what is queued before the reports below (printed directly)
+        api_stats.report()
+        if LATENCY_DUMP:
+            api_stats.dump(LATENCY_DUMP)
+        if recorder:
+            recorder.close()
+        profiler.save(PROFILE_OUTPUT)
 
 if __name__ == '__main__':
     signal.signal(signal.SIGINT, signal_handler)
@@ -25,6 +25,8 @@ Otherwise, decline the tender by sending a DELETE to the tender's endpoint.
 Before accepting a tender, ensure any open position is unwound (balanced to 0) using MARKET orders.
 After tender acceptance, unwind the tender-induced position using LIMIT orders at the best bid/ask,
 but only if market conditions are favorable relative to the tender price plus/minus the commission.
+The unwind runs in the background (one state machine per ticker) so new tenders keep being
+processed; a limit unwind falls back to MARKET orders at its deadline or in the last 30 seconds.
 
 Refer to:
 https://rit.306w.ca/RIT-REST-API/1.0.3/#/
@@ -32,9 +34,23 @@ for API instructions.
 """
 
 import requests
-from time import sleep
+import time
 import signal
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from backpressure import AdaptiveRate, backpressure
+from flatten import ROUNDS, flatten
+from async_log import AsyncLogger
+from latency_stats import LatencyStats, instrument
+from loop_profiler import PhaseProfiler, profile_requests
+from poll_scheduler import PollScheduler, count_requests
+from rate_limiter import TokenBucket
+from order_book import OrderBook
+from rit_client import RitApiError, RitClient
+from session_recorder import SessionRecorder, record_session
+from tas_stream import TasStream
+from warm_start import open_connections, start_workers, wait_for_case
 
 # -------------------------------------------------------------------------------------
 # Exception & Shutdown Handling
@@ -54,83 +70,186 @@ def signal_handler(signum, frame):
 # Configuration
 # -------------------------------------------------------------------------------------
 API_KEY = {'X-API-key': 'NYVYJ53X'}  # Replace with your actual API key
-SLEEP_TIME = 0.2                   # Seconds between checks
-UNWIND_CHUNK = 1500                # Shares per unwind order
+BASE_URL = os.environ.get("RIT_BASE_URL", "http://localhost:9999/v1")  # RIT client or rit_mock_server.py
+SLEEP_TIME = 0.2                   # Seconds between checks when idle (backs off up to the next tick)
+ACTIVE_SLEEP_TIME = 0.05           # Seconds between checks while tenders or unwinds are pending
+POLL_RPS = 25                      # Requests per second shared by everything the loop sends
+TICK_SECONDS = 1.0                 # Wall-clock length of one tick
+WARM_START = True                  # Wait for the case to open and warm up first (warm_start.py); False = exit unless open
+MAX_RETRIES = 3                    # Retries of a request rejected with HTTP 429 (see backpressure.py)
+UNWIND_CHUNK = 1500                # Shares per MARKET unwind order
+ORDER_LIMIT = 5                    # Exchange order limit: flatten orders per second
+ORDER_BURST = 2                    # Flatten orders allowed back-to-back
+FLATTEN_ON_EXIT = True             # Flatten CRZY/TAME concurrently when the loop ends (tick 295 or shutdown)
+MAX_LIMIT_CHUNK = 5000             # Cap on a LIMIT unwind order sized from book depth
+MIN_LIMIT_CHUNK = 100              # Favorable depth needed to post a LIMIT unwind (the whole position if smaller)
+BOOK_LEVELS = 100                  # Levels requested from /securities/book
+TENDER_PRICING = "BOOK"            # "BOOK": VWAP to unwind the full tender size; "LAST": last price
 LAST_SECONDS = 30                  # Don't accept tender if tick >= 300 - LAST_SECONDS
 PRICE_THRESHOLD = 0.05             # $0.05 threshold for acceptance
 COMMISSION = 0.02                  # Transaction fee per share (2 cents)
+SNAPSHOT_MAX_AGE = 1.0             # Max seconds a securities snapshot is reused (about one tick)
+TAS_TICKERS = ["CRZY", "TAME"]     # Last price from time-and-sales streams for these tickers, [] = snapshot only
+UNWIND_DEADLINE_TICKS = 20         # Ticks a LIMIT unwind may run before falling back to MARKET
+LIMIT_REPLACE_SECONDS = 1.0        # Cancel/replace a resting unwind order older than this
+LATENCY_REPORT_SECONDS = 10        # Periodic API latency summary line, 0 = off
+LATENCY_DUMP = "lt3_latency.csv"   # Latency stats written at exit (*.prom = Prometheus text), None = off
+SESSION_RECORD = "lt3_session"     # Every API response -> lt3_session.idx/.dat (session_recorder.py), None = off
+PROFILE = os.environ.get("RIT_PROFILE", "")  # Loop profiling: "phases", "cprofile" or "sample" (loop_profiler.py), "" = off
+PROFILE_OUTPUT = "lt3_profile"     # -> lt3_profile.txt / .collapsed (/ .pstats), written at exit
+LOG_LEVEL = os.environ.get("RIT_LOG_LEVEL", "info")     # Logging (async_log.py): debug, info, warning, error or off
+LOG_FILE = os.environ.get("RIT_LOG_FILE", "")           # Log destination, "" = console
+LOG_FORMAT = os.environ.get("RIT_LOG_FORMAT", "text")   # "json" = one JSON object per line
+
+TENDER_WORKERS = 4                 # Concurrent accept/decline requests per batch
+
+api_stats = LatencyStats()
+profiler = PhaseProfiler(PROFILE)
+log = AsyncLogger(LOG_LEVEL, LOG_FILE, LOG_FORMAT)
+order_bucket = TokenBucket(ORDER_LIMIT, ORDER_BURST)     # Paces the MARKET chunks of every flatten
+tender_executor = ThreadPoolExecutor(max_workers=TENDER_WORKERS, thread_name_prefix="tender")
+flatten_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="flatten")  # Separate: flattens run on tender workers
+tender_first_seen = {}             # tender_id -> monotonic time the tender was first listed
 
 # -------------------------------------------------------------------------------------
 # Helper Functions
 # -------------------------------------------------------------------------------------
 
 def get_tick(session):
-    """Returns the current simulation tick."""
-    resp = session.get("http://localhost:9999/v1/case")
-    if resp.status_code == 401:
-        raise ApiException("Invalid API key. Check your credentials.")
-    case_info = resp.json()
-    return case_info.get("tick", 0)
+    """Returns the current simulation tick (0 if the case could not be read)."""
+    try:
+        return session.tick()
+    except RitApiError as e:
+        if e.status == 401:
+            raise ApiException("Invalid API key. Check your credentials.")
+        log.warning("Error retrieving case: {}", e)
+        return 0
+
+class SecuritiesSnapshot:
+    """
+    Tick-scoped cache of /v1/securities for all tickers.
+
+    One GET /v1/securities (no ticker filter) fills the snapshot; position, last,
+    bid and ask for every ticker are then served from memory. The snapshot is
+    dropped when the main loop sees a new tick, after any order or tender action
+    we send, and in any case after SNAPSHOT_MAX_AGE seconds (loops that do not
+    read the tick themselves still see fills from resting orders).
+    """
+
+    def __init__(self, max_age=SNAPSHOT_MAX_AGE):
+        self.max_age = max_age
+        self.securities = {}
+        self.tick = None
+        self.fetched_at = None
+        self.fetches = 0
+
+    def invalidate(self):
+        self.fetched_at = None
+
+    def note_tick(self, tick):
+        """Drops the snapshot if the simulation has moved to a new tick."""
+        if tick != self.tick:
+            self.tick = tick
+            self.invalidate()
+
+    def refresh(self, session):
+        try:
+            securities = session.securities()
+        except RitApiError as e:
+            if e.status == 401:
+                raise ApiException("Invalid API key. Check your credentials.")
+            raise ApiException(f"Failed to get securities: {e}")
+        self.securities = {sec.ticker: sec for sec in securities}
+        self.fetched_at = time.monotonic()
+        self.fetches += 1
+
+    def get(self, session, ticker):
+        """Returns the Security record for `ticker`, fetching a new snapshot only if needed."""
+        if self.fetched_at is None or time.monotonic() - self.fetched_at > self.max_age:
+            self.refresh(session)
+        security = self.securities.get(ticker)
+        if security is None:
+            raise ApiException(f"Unknown ticker {ticker}")
+        return security
+
+securities_cache = SecuritiesSnapshot()
 
 def check_position(session, ticker):
     """Returns the current position (int) for a given ticker."""
-    params = {"ticker": ticker}
-    resp = session.get("http://localhost:9999/v1/securities", params=params)
-    if resp.status_code == 401:
-        raise ApiException("Invalid API key. Check your credentials.")
-    security = resp.json()[0]
-    return security.get("position", 0)
-
-def check_tender(session):
-    """Returns the first active tender (dict) if available, else None."""
-    resp = session.get("http://localhost:9999/v1/tenders")
-    if resp.status_code == 401:
-        raise ApiException("Invalid API key. Check your credentials.")
-    tenders = resp.json()
-    if tenders:
-        return tenders[0]
-    return None
+    return securities_cache.get(session, ticker).position or 0
+
+def check_tenders(session):
+    """Returns the list of all active tenders (Tender records); empty if there are none."""
+    try:
+        return session.tenders()
+    except RitApiError as e:
+        if e.status == 401:
+            raise ApiException("Invalid API key. Check your credentials.")
+        log.warning("Error retrieving tenders: {}", e)
+        return []
+
+tas_streams = {}                   # ticker -> TasStream, updated once per loop pass
+
+def update_tas(session):
+    """Pulls the new time-and-sales prints for every ticker in TAS_TICKERS."""
+    for ticker in TAS_TICKERS:
+        stream = tas_streams.get(ticker)
+        if stream is None:
+            stream = tas_streams[ticker] = TasStream(session, BASE_URL, ticker)
+        try:
+            stream.update()
+        except (requests.RequestException, json.JSONDecodeError) as e:
+            log.warning("Error updating time and sales for {}: {}", ticker, e)
 
 def get_last_price(session, ticker):
-    """Retrieves the 'last' price for the given ticker."""
-    params = {"ticker": ticker}
-    resp = session.get("http://localhost:9999/v1/securities", params=params)
-    if resp.status_code != 200:
-        print(f"Error retrieving securities info for {ticker}. Status code {resp.status_code}")
-        return None
+    """
+    Retrieves the last traded price for the given ticker: from its time-and-sales
+    stream if it has one with prints, otherwise from the securities snapshot.
+    """
+    stream = tas_streams.get(ticker)
+    if stream is not None and stream.last is not None:
+        return stream.last
     try:
-        security = resp.json()[0]
-    except (IndexError, json.JSONDecodeError) as e:
-        print("Error parsing last price for", ticker, e)
+        security = securities_cache.get(session, ticker)
+    except (ApiException, json.JSONDecodeError) as e:
+        log.warning("Error retrieving last price for {} {}", ticker, e)
         return None
-    return security.get("last", None)
+    return security.last
 
 def get_market_info(session, ticker):
     """
-    Retrieves the order book for the given ticker.
+    Returns the top of book for the given ticker from the securities snapshot.
     Returns a dict with keys: 'best_bid' and 'best_ask'.
     """
-    params = {"ticker": ticker}
-    resp = session.get("http://localhost:9999/v1/securities/book", params=params)
-    if resp.status_code != 200:
-        print(f"Error retrieving order book for {ticker}.")
-        return {"best_bid": None, "best_ask": None}
     try:
-        book = resp.json()
-    except json.JSONDecodeError as e:
-        print("JSON decode error while parsing order book:", e)
+        security = securities_cache.get(session, ticker)
+    except (ApiException, json.JSONDecodeError) as e:
+        log.warning("Error retrieving market info for {}: {}", ticker, e)
         return {"best_bid": None, "best_ask": None}
 
-    bids = book.get("bids", [])
-    asks = book.get("asks", [])
-    best_bid = float(bids[0]["price"]) if (bids and "price" in bids[0]) else None
-    best_ask = float(asks[0]["price"]) if (asks and "price" in asks[0]) else None
+    best_bid = float(security.bid) if security.bid else None
+    best_ask = float(security.ask) if security.ask else None
     return {"best_bid": best_bid, "best_ask": best_ask}
 
+def get_order_book(session, ticker):
+    """
+    Fetches the full-depth order book for the given ticker in one request.
+    Returns an OrderBook (NumPy arrays per side), or None if it could not be read.
+    """
+    try:
+        return OrderBook.from_json(session.get_json("/securities/book", ticker=ticker, limit=BOOK_LEVELS))
+    except RitApiError:
+        log.warning("Error retrieving order book for {}.", ticker)
+        return None
+    except (json.JSONDecodeError, KeyError) as e:
+        log.warning("Error parsing order book: {}", e)
+        return None
+
 # -------------------------------------------------------------------------------------
 # Unwinding Positions using MARKET Orders
 # -------------------------------------------------------------------------------------
 
+@profiler.timed("unwind_market")
 def unwind_position(session, ticker):
     """
     Unwinds the current position using MARKET orders in chunks of UNWIND_CHUNK.
@@ -145,11 +264,12 @@ def unwind_position(session, ticker):
             "quantity": qty,
             "action": "SELL"
         }
-        resp = session.post("http://localhost:9999/v1/orders", params=payload)
+        resp = session.post(f"{BASE_URL}/orders", params=payload)
+        securities_cache.invalidate()
         if resp.ok:
-            print(f"[UNWIND MARKET] Sold {qty} of {ticker}.")
+            log.info("[UNWIND MARKET] Sold {} of {}.", qty, ticker)
         else:
-            print("Market sell failed:", resp.json())
+            log.warning("Market sell failed: {}", resp.json())
     elif pos < 0:
         # If short, buy
         qty = min(UNWIND_CHUNK, abs(pos))
@@ -159,102 +279,262 @@ def unwind_position(session, ticker):
             "quantity": qty,
             "action": "BUY"
         }
-        resp = session.post("http://localhost:9999/v1/orders", params=payload)
+        resp = session.post(f"{BASE_URL}/orders", params=payload)
+        securities_cache.invalidate()
         if resp.ok:
-            print(f"[UNWIND MARKET] Bought {qty} of {ticker} to cover short.")
+            log.info("[UNWIND MARKET] Bought {} of {} to cover short.", qty, ticker)
         else:
-            print("Market buy failed:", resp.json())
+            log.warning("Market buy failed: {}", resp.json())
     else:
-        print(f"[UNWIND MARKET] {ticker} position is already 0.")
+        log.info("[UNWIND MARKET] {} position is already 0.", ticker)
 
+def flatten_positions(session, tickers, positions=None, cancel_open=False, rounds=None):
+    """
+    Flattens `tickers` with UNWIND_CHUNK MARKET orders sent concurrently within
+    the ORDER_LIMIT budget (flatten.py). With rounds=None it re-runs until every
+    position is 0, stopping early only when a run makes no progress (orders
+    rejected, e.g. the case has closed). Returns the residual {ticker: position}.
+    """
+    def run(positions, cancel_open, rounds):
+        return flatten(session, tickers, UNWIND_CHUNK, reserve=order_bucket.reserve, executor=flatten_executor,
+                       cancel_open=cancel_open, rounds=rounds or ROUNDS, positions=positions)
+
+    residual = run(positions, cancel_open, rounds)
+    open_shares = sum(abs(pos) for pos in residual.values())
+    while rounds is None and open_shares:
+        residual = run(residual, False, None)
+        remaining = sum(abs(pos) for pos in residual.values())
+        if remaining >= open_shares:
+            break
+        open_shares = remaining
+    securities_cache.invalidate()
+    return residual
+
+@profiler.timed("ensure_balanced")
 def ensure_balanced(session, ticker):
     """
-    Loops until the ticker's position is 0, using MARKET orders.
+    Brings the ticker's position to 0 with MARKET orders (flatten_positions):
+    the UNWIND_CHUNK chunks go out together, paced by ORDER_LIMIT, until flat.
+    Returns True once the position is 0.
     """
     pos = check_position(session, ticker)
-    while pos != 0 and not shutdown:
-        print(f"Balancing {ticker} with market orders. Position = {pos}")
-        unwind_position(session, ticker)
-        sleep(SLEEP_TIME)
-        pos = check_position(session, ticker)
-    print(f"{ticker} is balanced at 0 (market).")
+    if pos != 0:
+        log.info("Balancing {} with market orders. Position = {}", ticker, pos)
+        pos = flatten_positions(session, [ticker], positions={ticker: pos})[ticker]
+    if pos != 0:
+        log.warning("{} still at {} after balancing (market).", ticker, pos)
+        return False
+    log.info("{} is balanced at 0 (market).", ticker)
+    return True
 
 # -------------------------------------------------------------------------------------
 # Unwinding Positions using LIMIT Orders with Market Condition Checks
 # -------------------------------------------------------------------------------------
 
+@profiler.timed("unwind_limit")
 def unwind_position_limit(session, ticker, cost, commission):
     """
-    Unwinds the current position using LIMIT orders at best bid/ask,
-    but only posts an order if the market offers a favorable price relative
-    to the tender cost (cost) plus/minus commission.
+    Unwinds the current position using a LIMIT order sized from one full-depth book
+    fetch: the order takes every share resting at a favorable price relative to the
+    tender cost (cost) plus/minus commission, up to MAX_LIMIT_CHUNK, and is priced
+    at the worst favorable level so it fills at once.
+    Returns the posted order (dict), or None if nothing was posted.
     """
     pos = check_position(session, ticker)
-    info = get_market_info(session, ticker)
-    best_bid = info["best_bid"]
-    best_ask = info["best_ask"]
+    if pos == 0:
+        log.info("[UNWIND LIMIT] {} position is already 0.", ticker)
+        return None
+    book = get_order_book(session, ticker)
+    if book is None:
+        return None
 
     if pos > 0:
-        # For long positions (we are selling):
-        if best_ask is None:
-            print("No best ask available. Cannot evaluate condition for limit sell.")
-            return
-        # Only post a sell limit order if the best ask is above cost + commission.
-        if best_ask <= cost + commission:
-            print(f"Not posting limit sell order because best ask ({best_ask:.2f}) <= tender cost+commission ({cost+commission:.2f}).")
+        # For long positions (we are selling into the bids):
+        action, bound = "SELL", cost + commission
+        if book.best_bid is None:
+            log.warning("No best bid available. Cannot evaluate condition for limit sell.")
+            return None
+    else:
+        # For short positions (we are buying to cover from the asks):
+        action, bound = "BUY", cost - commission
+        if book.best_ask is None:
+            log.warning("No best ask available. Cannot evaluate condition for limit buy.")
+            return None
+
+    available = book.depth_within(action, bound)
+    # MIN_LIMIT_CHUNK applies to the depth only: a smaller remainder still goes out whole
+    if available < min(abs(pos), MIN_LIMIT_CHUNK):
+        side = "bids at or above" if action == "SELL" else "asks at or below"
+        log.info("Not posting limit {} order: only {} shares of {} tender cost{}commission ({:.2f}).",
+                 action.lower(), available, side, "+" if action == "SELL" else "-", bound)
+        return None
+
+    qty = min(abs(pos), available, MAX_LIMIT_CHUNK)
+    price = book.sweep_price(action, qty)
+    payload = {
+        "ticker": ticker,
+        "type": "LIMIT",
+        "quantity": qty,
+        "price": price,
+        "action": action
+    }
+    resp = session.post(f"{BASE_URL}/orders", params=payload)
+    securities_cache.invalidate()
+    if resp.ok:
+        log.info("[UNWIND LIMIT] {} {} of {} at {:.2f} (favorable depth {})",
+                 action.capitalize(), qty, ticker, price, available)
+        return resp.json()
+    log.warning("Limit {} failed: {}", action.lower(), resp.json())
+    return None
+
+def cancel_order(session, order_id):
+    """
+    Cancels one order by DELETE to /v1/orders/{order_id}.
+    Returns False if it could not be cancelled (e.g. it already filled).
+    """
+    resp = session.delete(f"{BASE_URL}/orders/{order_id}")
+    securities_cache.invalidate()
+    return resp.ok
+
+# -------------------------------------------------------------------------------------
+# Background Unwinding Engine
+# -------------------------------------------------------------------------------------
+
+class UnwindTask:
+    """
+    Unwind of one ticker's position as a non-blocking state machine.
+
+    Each call to step() does at most one round of work (position check plus one
+    order or cancel) and returns, so the main loop keeps polling tenders while
+    the unwind is in progress.
+    - MARKET mode sends UNWIND_CHUNK market orders until the position is 0.
+    - LIMIT mode keeps at most one limit order working, sized from the favorable
+      book depth versus cost +/- commission and priced at the worst level it
+      sweeps (unwind_position_limit); any remainder rests at that price. The order
+      is cancelled and replaced once it is older than LIMIT_REPLACE_SECONDS or
+      another quote is ahead of it (a lower ask for a SELL, a higher bid for a BUY).
+    - A LIMIT unwind switches to MARKET at its deadline tick, or once the case is
+      within its last LAST_SECONDS, so it can never run forever.
+    """
+
+    def __init__(self, ticker, mode, cost=None, commission=COMMISSION, deadline_tick=None):
+        self.ticker = ticker
+        self.mode = mode
+        self.cost = cost
+        self.commission = commission
+        self.deadline_tick = deadline_tick
+        self.order = None          # Our resting LIMIT order, as returned by POST /orders
+        self.order_pos = 0         # Position when that order was posted
+        self.order_time = 0.0
+        self.next_step = 0.0
+        self.done = False
+
+    def fallback_tick(self):
+        last_window = 300 - LAST_SECONDS
+        if self.deadline_tick is None:
+            return last_window
+        return min(self.deadline_tick, last_window)
+
+    def cancel_resting(self, session):
+        if self.order is not None:
+            cancel_order(session, self.order["order_id"])
+            self.order = None
+
+    def _resting_done(self, pos):
+        """True once the position has moved by the full resting order quantity."""
+        return abs(pos) <= abs(self.order_pos) - self.order["quantity"]
+
+    def _resting_stale(self, session, now):
+        """
+        True when the resting remainder should be replaced: it is too old, or it is
+        no longer first in line at its own side of the book. It rests at its sweep
+        price, so that price is what the best quote on its side is compared with.
+        """
+        if now - self.order_time > LIMIT_REPLACE_SECONDS:
+            return True
+        info = get_market_info(session, self.ticker)
+        price = self.order["price"]
+        if self.order["action"] == "SELL":
+            return info["best_ask"] is not None and info["best_ask"] < price
+        return info["best_bid"] is not None and info["best_bid"] > price
+
+    def step(self, session, tick):
+        now = time.monotonic()
+        if self.done or now < self.next_step:
             return
-        qty = min(UNWIND_CHUNK, pos)
-        payload = {
-            "ticker": ticker,
-            "type": "LIMIT",
-            "quantity": qty,
-            "price": best_bid,  # selling at best_bid
-            "action": "SELL"
-        }
-        resp = session.post("http://localhost:9999/v1/orders", params=payload)
-        if resp.ok:
-            print(f"[UNWIND LIMIT] Sell {qty} of {ticker} at best_bid {best_bid:.2f}")
-        else:
-            print("Limit sell failed:", resp.json())
+        self.next_step = now + SLEEP_TIME
 
-    elif pos < 0:
-        # For short positions (we are buying to cover):
-        if best_bid is None:
-            print("No best bid available. Cannot evaluate condition for limit buy.")
+        pos = check_position(session, self.ticker)
+        if pos == 0:
+            self.cancel_resting(session)
+            log.info("{} is balanced at 0 ({}).", self.ticker, self.mode.lower())
+            self.done = True
             return
-        # Only post a buy limit order if the best bid is below cost - commission.
-        if best_bid >= cost - commission:
-            print(f"Not posting limit buy order because best bid ({best_bid:.2f}) >= tender cost-commission ({cost-commission:.2f}).")
+
+        if self.mode == "LIMIT" and tick >= self.fallback_tick():
+            log.info("[UNWIND] {} limit unwind reached tick {}; falling back to MARKET. Position = {}",
+                     self.ticker, tick, pos)
+            self.cancel_resting(session)
+            self.mode = "MARKET"
+
+        if self.mode == "MARKET":
+            log.info("Balancing {} with market orders. Position = {}", self.ticker, pos)
+            unwind_position(session, self.ticker)
             return
-        qty = min(UNWIND_CHUNK, abs(pos))
-        payload = {
-            "ticker": ticker,
-            "type": "LIMIT",
-            "quantity": qty,
-            "price": best_ask,  # buying at best_ask
-            "action": "BUY"
-        }
-        resp = session.post("http://localhost:9999/v1/orders", params=payload)
-        if resp.ok:
-            print(f"[UNWIND LIMIT] Buy {qty} of {ticker} at best_ask {best_ask:.2f}")
-        else:
-            print("Limit buy failed:", resp.json())
-    else:
-        print(f"[UNWIND LIMIT] {ticker} position is already 0.")
 
-def ensure_balanced_limit(session, ticker, cost, commission):
+        if self.order is not None:
+            if self._resting_done(pos):
+                self.order = None
+            elif self._resting_stale(session, now):
+                self.cancel_resting(session)
+                pos = check_position(session, self.ticker)
+                if pos == 0:
+                    return
+            else:
+                return
+
+        log.info("Balancing {} with limit orders. Position = {}", self.ticker, pos)
+        order = unwind_position_limit(session, self.ticker, self.cost, self.commission)
+        if order is not None and order.get("status") == "OPEN":
+            self.order = order
+            self.order_pos = pos
+            self.order_time = now
+
+class UnwindEngine:
     """
-    Loops until the ticker's position is 0, using LIMIT orders at best bid/ask.
-    Stops posting additional orders if market conditions indicate that further orders
-    would not be favorable relative to the tender cost.
+    Runs one UnwindTask per ticker alongside the tender poller.
+    The main loop calls step() once per pass.
     """
-    pos = check_position(session, ticker)
-    while pos != 0 and not shutdown:
-        print(f"Balancing {ticker} with limit orders. Position = {pos}")
-        unwind_position_limit(session, ticker, cost, commission)
-        sleep(SLEEP_TIME)
-        pos = check_position(session, ticker)
-    print(f"{ticker} is balanced at 0 (limit).")
+
+    def __init__(self):
+        self.tasks = {}
+
+    def active(self, ticker):
+        return ticker in self.tasks
+
+    def start(self, session, ticker, mode, tick, cost=None, commission=COMMISSION):
+        """Starts (or replaces) the unwind for `ticker`."""
+        self.stop(session, ticker)
+        deadline = tick + UNWIND_DEADLINE_TICKS if mode == "LIMIT" else None
+        self.tasks[ticker] = UnwindTask(ticker, mode, cost, commission, deadline)
+
+    def stop(self, session, ticker):
+        """Drops the unwind for `ticker`, cancelling its resting order."""
+        task = self.tasks.pop(ticker, None)
+        if task is not None:
+            task.cancel_resting(session)
+
+    def stop_all(self, session):
+        for ticker in list(self.tasks):
+            self.stop(session, ticker)
+
+    def step(self, session, tick):
+        for ticker, task in list(self.tasks.items()):
+            task.step(session, tick)
+            if task.done:
+                del self.tasks[ticker]
+
+unwinder = UnwindEngine()
 
 # -------------------------------------------------------------------------------------
 # Tender Acceptance/Decline
@@ -264,31 +544,205 @@ def accept_tender(session, tender):
     """
     Accepts a tender by POST to /v1/tenders/{tender_id}.
     """
-    t_id = tender.get("tender_id")
+    t_id = tender.tender_id
     if t_id is None:
-        print("Cannot accept tender: no tender_id.")
+        log.warning("Cannot accept tender: no tender_id.")
         return
-    url = f"http://localhost:9999/v1/tenders/{t_id}"
+    url = f"{BASE_URL}/tenders/{t_id}"
     resp = session.post(url)
+    securities_cache.invalidate()
     if resp.ok:
-        print(f"Tender {t_id} accepted for {tender.get('ticker')}")
+        log.info("Tender {} accepted for {}", t_id, tender.ticker)
     else:
-        print("Failed to accept tender:", resp.json())
+        log.warning("Failed to accept tender: {}", resp.json())
+    return resp.ok
 
 def decline_tender(session, tender):
     """
     Declines a tender by DELETE to /v1/tenders/{tender_id}.
     """
-    t_id = tender.get("tender_id")
+    t_id = tender.tender_id
     if t_id is None:
-        print("Cannot decline tender: no tender_id. Possibly auto-declined.")
+        log.warning("Cannot decline tender: no tender_id. Possibly auto-declined.")
         return
-    url = f"http://localhost:9999/v1/tenders/{t_id}"
+    url = f"{BASE_URL}/tenders/{t_id}"
     resp = session.delete(url)
     if resp.ok:
-        print(f"Tender {t_id} declined for {tender.get('ticker')}")
+        log.info("Tender {} declined for {}", t_id, tender.ticker)
+    else:
+        log.warning("Failed to decline tender: {}", resp.json())
+    return resp.ok
+
+def balance_and_accept(session, tender):
+    """
+    Unwinds any existing position in the tender's ticker with MARKET orders,
+    then accepts the tender. A position that cannot be flattened leaves the
+    tender pending (it is re-evaluated on the next pass).
+    """
+    if not ensure_balanced(session, tender.ticker):
+        log.warning("Tender {} not accepted: {} could not be balanced.", tender.tender_id, tender.ticker)
+        return False
+    return accept_tender(session, tender)
+
+# -------------------------------------------------------------------------------------
+# Batch Tender Evaluation
+# -------------------------------------------------------------------------------------
+
+def tender_reference_price(tender, last_price, book):
+    """
+    Price we expect to unwind the tender at. With TENDER_PRICING = "BOOK" this is
+    the VWAP of walking the book for the full tender quantity (thin books are
+    extrapolated at the worst visible level); otherwise, or without a usable
+    book, it is the last price.
+    """
+    if TENDER_PRICING != "BOOK" or book is None:
+        return last_price
+    # After a BUY tender we sell into the bids; after a SELL tender we buy from the asks
+    unwind_action = "SELL" if (tender.action or "").upper() == "BUY" else "BUY"
+    vwap, _ = book.vwap_to_fill(unwind_action, tender.quantity or 0, extrapolate=True)
+    if vwap is None:
+        return last_price
+    log.info("Book VWAP to unwind {} {}: ${:.3f} (impact {:.3f}/share)", tender.quantity, tender.ticker,
+             vwap, book.impact_cost(unwind_action, tender.quantity or 0))
+    return vwap
+
+def evaluate_tender(session, tender, tick, book=None):
+    """
+    Scores one tender against the current securities snapshot and, if given,
+    the ticker's full-depth book. Returns (accept, edge): edge is how far the
+    tender price beats the expected unwind price in our favour (None if it
+    could not be evaluated).
+    """
+    ticker = tender.ticker or "UNKNOWN"
+
+    # Check if we are in the last 30 seconds
+    if tick >= 300 - LAST_SECONDS:
+        log.info("Tender {}: within last 30 seconds. Declining tender.", tender.tender_id)
+        return False, None
+
+    last_price = get_last_price(session, ticker)
+    if last_price is None:
+        log.info("Tender {}: no last price available; declining.", tender.tender_id)
+        return False, None
+    log.info("Last price for {}: ${:.2f}", ticker, last_price)
+    tender_price = tender.price or 0
+    ref_price = tender_reference_price(tender, last_price, book)
+
+    # SELL tender => institution sells to you => we buy if condition
+    if (tender.action or "").upper() == "BUY":
+        edge = ref_price - tender_price
+        if edge >= PRICE_THRESHOLD:
+            log.info("Criteria met for BUY tender: ref={:.2f}, tender={:.2f}", ref_price, tender_price)
+            return True, edge
+
+    # BUY tender => institution buys from you => we sell if condition
+    elif (tender.action or "").upper() == "SELL":
+        edge = tender_price - ref_price
+        if edge >= PRICE_THRESHOLD:
+            log.info("Criteria met for SELL tender: ref={:.2f}, tender={:.2f}", ref_price, tender_price)
+            return True, edge
+
     else:
-        print("Failed to decline tender:", resp.json())
+        edge = None
+    log.info("Tender {} does not meet criteria; declining.", tender.tender_id)
+    return False, edge
+
+def log_tender_decision(tender, decision, tick, ok, done_at):
+    """
+    Logs the tender-arrival-to-decision latency for one tender: `done_at` is the
+    monotonic time its accept/decline completed, `tick` the tick it was decided in.
+    """
+    t_id = tender.tender_id
+    first_seen = tender_first_seen.get(t_id)
+    latency_ms = (done_at - first_seen) * 1000 if first_seen is not None else float("nan")
+    status = "done" if ok else "failed"
+    log.info("[TENDER LATENCY] {} {} {} {}: {} {} {:.1f} ms after arrival (issued tick {}, decided tick {})",
+             t_id, tender.action, tender.quantity, tender.ticker, decision, status, latency_ms, tender.tick, tick)
+
+def handle_tenders(session, tenders, tick):
+    """
+    Evaluates every outstanding tender in one pass against a single securities
+    snapshot, then dispatches all accepts and declines concurrently.
+
+    At most one tender per ticker is accepted per pass (the one with the largest
+    edge); other acceptable tenders in that ticker stay pending for the next pass.
+    Accepted tenders are handed to the background unwinder (LIMIT orders).
+    """
+    now = time.monotonic()
+    live_ids = set()
+    for tender in tenders:
+        live_ids.add(tender.tender_id)
+        tender_first_seen.setdefault(tender.tender_id, now)
+    for t_id in [t_id for t_id in tender_first_seen if t_id not in live_ids]:
+        del tender_first_seen[t_id]
+
+    # One fresh snapshot serves the whole batch
+    securities_cache.invalidate()
+    books = {}                     # ticker -> OrderBook, one fetch per ticker per batch
+    best = {}                      # ticker -> (edge, tender) of the best acceptable tender
+    declines = []
+    for tender in tenders:
+        ticker = tender.ticker or "UNKNOWN"
+        log.info("Active tender detected for {}: {}", ticker, tender)
+        if TENDER_PRICING == "BOOK" and ticker not in books:
+            books[ticker] = get_order_book(session, ticker)
+        accept, edge = evaluate_tender(session, tender, tick, books.get(ticker))
+        if not accept:
+            declines.append(tender)
+        elif ticker not in best or edge > best[ticker][0]:
+            best[ticker] = (edge, tender)
+    accepts = [tender for _, tender in best.values()]
+    for tender in accepts:
+        # The pre-accept MARKET balance takes over any unwind still running in this ticker
+        unwinder.stop(session, tender.ticker)
+    deferred = [t for t in tenders if t not in accepts and t not in declines]
+    for tender in deferred:
+        log.info("Tender {} deferred; a better tender for {} is being accepted.", tender.tender_id, tender.ticker)
+
+    jobs = [(tender, "DECLINE", tender_executor.submit(decline_tender, session, tender)) for tender in declines]
+    jobs += [(tender, "ACCEPT", tender_executor.submit(balance_and_accept, session, tender)) for tender in accepts]
+    # The loop's tick is from the end of the previous pass: read the decision tick alongside the answers
+    decided_tick = tender_executor.submit(get_tick, session) if jobs else None
+    accepted = []
+    decisions = []
+    decided = tick
+    for tender, decision, job in jobs:
+        with profiler.phase("wait_tenders", "network"):
+            ok = job.result()
+        decisions.append((tender, decision, ok, time.monotonic()))
+        if decision == "ACCEPT" and ok:
+            accepted.append(tender)
+    if decisions:
+        with profiler.phase("wait_tenders", "network"):
+            decided = decided_tick.result() or tick
+        for tender, decision, ok, done_at in decisions:
+            log_tender_decision(tender, decision, decided, ok, done_at)
+
+    # Unwind the newly acquired positions with LIMIT orders in the background,
+    # using tender price (cost) and commission to check market conditions.
+    # The LIMIT deadline counts from the tick the tender was accepted in.
+    for tender in accepted:
+        unwinder.start(session, tender.ticker, "LIMIT", decided, tender.price or 0, COMMISSION)
+
+# -------------------------------------------------------------------------------------
+# Warm Start
+# -------------------------------------------------------------------------------------
+
+def warm_up(session):
+    """
+    Opens the connections and prefetches what the first tender decision needs, so
+    it does not pay for them on the first tradable tick.
+    """
+    open_connections(session, f"{BASE_URL}/case", TENDER_WORKERS + 1)
+    start_workers(tender_executor, TENDER_WORKERS)
+    update_tas(session)
+    try:
+        securities_cache.refresh(session)
+    except ApiException as e:
+        log.warning("Warm-up securities read failed: {}", e)
+    for ticker in ["CRZY", "TAME"]:
+        get_order_book(session, ticker)
+    check_tenders(session)
 
 # -------------------------------------------------------------------------------------
 # Main Trading Loop
@@ -296,74 +750,84 @@ def decline_tender(session, tender):
 
 def main():
     global shutdown
-    with requests.Session() as s:
-        s.headers.update(API_KEY)
-        tick = get_tick(s)
-        print(f"Starting simulation at tick {tick}...")
+    with RitClient(BASE_URL, API_KEY) as s:
+        profile_requests(s, profiler)
+        instrument(s, api_stats)
+        recorder = SessionRecorder(SESSION_RECORD) if SESSION_RECORD else None
+        if recorder:
+            record_session(s, recorder)
+        api_stats.start_reporter(LATENCY_REPORT_SECONDS, emit=log.info)
+        scheduler = PollScheduler(POLL_RPS, TICK_SECONDS, ACTIVE_SLEEP_TIME, SLEEP_TIME)
+        # 429s are retried after their wait hint and slow down the budget that paces them
+        order_rate = AdaptiveRate(order_bucket)
+        poll_rate = AdaptiveRate(scheduler.budget)
+        backpressure(s, {"POST /orders": order_rate, None: poll_rate}, MAX_RETRIES, sleep=profiler.wrap("retry_wait", time.sleep, "sleep"))
+        count_requests(s, scheduler)
+        profiler.start()
+        if WARM_START:
+            log.info("Waiting for the case to open...")
+            tick = wait_for_case(lambda: get_tick(s), scheduler, arm=lambda: warm_up(s), stop=lambda: shutdown)
+        else:
+            tick = get_tick(s)
+            scheduler.observe_tick(tick)
+        log.info("Starting simulation at tick {}...", tick)
 
         while not shutdown and tick > 5 and tick < 295:
-            tender = check_tender(s)
-
-            if tender is not None:
-                ticker = tender.get("ticker", "UNKNOWN")
-                print(f"Active tender detected for {ticker}: {tender}")
-
-                # Check if we are in the last 30 seconds
-                if tick >= 300 - LAST_SECONDS:
-                    print("Within last 30 seconds. Declining tender.")
-                    decline_tender(s, tender)
-
-                else:
-                    last_price = get_last_price(s, ticker)
-                    if last_price is None:
-                        print("No last price available; declining.")
-                        decline_tender(s, tender)
-                    else:
-                        print(f"Last price for {ticker}: ${last_price:.2f}")
-                        tender_price = tender.get("price", 0)
-                        accept_flag = False
-
-                        # SELL tender => institution sells to you => we buy if condition
-                        if tender.get("action", "").upper() == "BUY":
-                            if (last_price - tender_price) >= PRICE_THRESHOLD:
-                                print(f"Criteria met for BUY tender: last={last_price:.2f}, tender={tender_price:.2f}")
-                                accept_flag = True
-
-                        # BUY tender => institution buys from you => we sell if condition
-                        elif tender.get("action", "").upper() == "SELL":
-                            if (tender_price - last_price) >= PRICE_THRESHOLD:
-                                print(f"Criteria met for SELL tender: last={last_price:.2f}, tender={tender_price:.2f}")
-                                accept_flag = True
-
-                        if accept_flag:
-                            # 1) Unwind current position with MARKET orders
-                            ensure_balanced(s, ticker)
-
-                            # 2) Accept the tender
-                            accept_tender(s, tender)
-
-                            # 3) Unwind the newly acquired position with LIMIT orders,
-                            #     using tender price (cost) and commission to check market conditions.
-                            ensure_balanced_limit(s, ticker, tender_price, COMMISSION)
-
-                        else:
-                            print("Tender does not meet criteria; declining.")
-                            decline_tender(s, tender)
+            with profiler.phase("tas"):
+                update_tas(s)
+            with profiler.phase("check_tenders"):
+                tenders = check_tenders(s)
+
+            if tenders:
+                with profiler.phase("handle_tenders"):
+                    handle_tenders(s, tenders, tick)
 
             else:
-                # No tender => ensure CRZY/TAME positions remain at 0 with MARKET unwinds
-                for tkr in ["CRZY", "TAME"]:
-                    pos = check_position(s, tkr)
-                    if pos != 0:
-                        print(f"No active tender, but {tkr} position is {pos}. Unwinding (market).")
-                        ensure_balanced(s, tkr)
-                sleep(SLEEP_TIME)
+                # No tender => flatten CRZY/TAME (those without a running unwind) together
+                with profiler.phase("positions"):
+                    exposed = {tkr: check_position(s, tkr) for tkr in ["CRZY", "TAME"] if not unwinder.active(tkr)}
+                    exposed = {tkr: pos for tkr, pos in exposed.items() if pos != 0}
+                    if exposed:
+                        log.info("No active tender, but positions are {}. Flattening (market).", exposed)
+                        residual = flatten_positions(s, list(exposed), positions=exposed, rounds=1)
+                        # Whatever is left is worked off by the background unwinder, one chunk per step
+                        for tkr, pos in residual.items():
+                            if pos != 0:
+                                unwinder.start(s, tkr, "MARKET", tick)
+
+            # Advance every running unwind by one step
+            with profiler.phase("unwind_step"):
+                unwinder.step(s, tick)
 
             # Refresh tick at end of loop
-            tick = get_tick(s)
-            print(f"Tick updated: {tick}")
-
-        print("Trading period ended or shutdown requested.")
+            with profiler.phase("tick"):
+                tick = get_tick(s)
+            scheduler.observe_tick(tick)
+            securities_cache.note_tick(tick)
+            log.info("Tick updated: {}", tick)
+
+            # Poll fast while tenders or unwinds are in play, back off to the next tick when idle
+            with profiler.phase("sleep", "sleep"):
+                scheduler.wait(active=bool(tenders) or bool(unwinder.tasks))
+
+        unwinder.stop_all(s)
+        log.info("Trading period ended or shutdown requested.")
+        if FLATTEN_ON_EXIT:
+            try:
+                log.info("Flattened, residual positions: {}", flatten_positions(s, ["CRZY", "TAME"], cancel_open=True))
+            except RitApiError as e:
+                log.error("Flatten failed: {}", e)
+        if poll_rate.rejections:
+            log.warning("Rate limited {} times; request budget settled at {:.1f}/s", poll_rate.rejections, poll_rate.rate)
+
+        api_stats.stop_reporter()
+        log.close()                    # Writes what is queued before the reports below (printed directly)
+        api_stats.report()
+        if LATENCY_DUMP:
+            api_stats.dump(LATENCY_DUMP)
+        if recorder:
+            recorder.close()
+        profiler.save(PROFILE_OUTPUT)
 
 # -------------------------------------------------------------------------------------
 # Run the Script
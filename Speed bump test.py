@@ -5,10 +5,19 @@ Created on Wed Mar 26 05:04:03 2025
 @author: supre
 """
 
+import os
+import random
 import signal
+import sys
+import threading
 import requests
 import time
-from time import sleep
+from async_log import AsyncLogger
+from backpressure import AdaptiveRate, backpressure, retry_after
+from latency_stats import LatencyHistogram, LatencyStats, instrument
+from rate_limiter import TokenBucket
+from rit_client import RitApiError, RitClient
+from session_recorder import SessionRecorder, record_session
 
 class ApiException(Exception):
     pass
@@ -20,50 +29,232 @@ def signal_handler(signum, frame):
 
 # Replace with your actual API key
 API_KEY = {'X-API-Key': 'NYVYJ53X'}
+BASE_URL = os.environ.get('RIT_BASE_URL', 'http://localhost:9999/v1')  # RIT client or rit_mock_server.py
 shutdown = False
 
 # Test parameters
 order_limit = 5          # Target orders per second (desired rate)
+order_burst = 1          # Orders allowed back-to-back before pacing applies
+max_retries = 3          # Retries of an order rejected with HTTP 429; 429s also lower the rate (backpressure.py)
 max_size = 1000          # Shares per order
 target_total_volume = 20000  # Total shares to trade in this test
 num_orders = target_total_volume // max_size  # Total number of orders to submit
+latency_report_seconds = 5   # Periodic API latency summary line, 0 = off
+latency_dump = 'speedbump_latency.csv'  # Latency stats written at exit (*.prom = Prometheus text), None = off
+session_record = 'speedbump_session'    # Every API response -> speedbump_session.idx/.dat, None = off
+log_level = os.environ.get('RIT_LOG_LEVEL', 'info')     # Logging (async_log.py): debug, info, warning, error or off
+log_file = os.environ.get('RIT_LOG_FILE', '')           # Log destination, '' = console
+log_format = os.environ.get('RIT_LOG_FORMAT', 'text')   # 'json' = one JSON object per line
+
+# Load-generator mode (python "Speed bump test.py" --load): concurrent workers, stepped offered rate
+load_mode = '--load' in sys.argv
+load_workers = 8             # Concurrent worker threads sharing one session and connection pool
+load_ramp = [5, 10, 20, 40, 80, 160, 0]  # Offered orders/sec per step, 0 = unthrottled
+load_step_seconds = 5        # Duration of each ramp step
+load_mix = {                 # Relative weights of each request type
+    'limit_buy': 3,
+    'limit_sell': 3,
+    'market_buy': 1,
+    'market_sell': 1,
+    'cancel': 2,             # Cancels one of our resting LIMIT orders (a LIMIT order if none rest)
+}
+load_limit_offset = 0.50     # LIMIT orders rest this far from last so they do not fill
+load_curve_dump = 'speedbump_load.csv'   # Saturation curve written at exit, None = off
 
 # Global counters for logging
 placed_orders = 0
 total_speedbumps = 0.0   # Sum of speed bump delays applied
-total_transaction_time = 0.0  # Sum of observed transaction times
+total_transaction_time = 0.0  # Sum of observed transaction times (429 back-off waits excluded)
+total_retry_wait = 0.0   # Sum of the 429 back-off waits
+order_bucket = TokenBucket(order_limit, order_burst)
+order_rate = AdaptiveRate(order_bucket)
+throttled_orders = 0     # Orders still rejected with 429 after max_retries
+api_stats = LatencyStats()
+log = AsyncLogger(log_level, log_file, log_format)
 
-def speedbump(transaction_time):
+def speedbump():
     """
-    Computes and applies a dynamic delay (speed bump) so that orders
-    are spaced out to approximately achieve the target order_limit.
-    Returns the current order's speed bump and average speed bump so far.
+    Waits (the speed bump) until the token bucket allows the next order, so
+    orders go out at order_limit per second regardless of transaction time.
+    Returns the time waited.
     """
-    global total_speedbumps, placed_orders, total_transaction_time
+    return order_bucket.acquire()
+
+# -----------------------------------------------------------------------------
+# Load generator
+# -----------------------------------------------------------------------------
+
+def get_last(session, ticker='ALGO'):
+    try:
+        return session.securities(ticker)[0].last
+    except RitApiError as e:
+        raise ApiException(f"Failed to get securities: {e}")
+
+class LoadStep:
+    """Results of one ramp step, shared by the workers."""
+
+    def __init__(self, offered):
+        self.offered = offered
+        self.latency = LatencyHistogram()
+        self.ok = 0
+        self.errors = 0
+        self.throttled = 0
+        self.by_kind = {kind: 0 for kind in load_mix}
+        self.lock = threading.Lock()
+
+    def record(self, kind, seconds, status):
+        with self.lock:
+            self.latency.add(seconds)
+            self.by_kind[kind] += 1
+            if status < 400:
+                self.ok += 1
+            else:
+                self.errors += 1
+                if status == 429:
+                    self.throttled += 1
+
+    def row(self, elapsed):
+        return {
+            'offered_rps': self.offered,
+            'achieved_rps': self.ok / elapsed,
+            'requests': self.latency.count,
+            'errors': self.errors,
+            'throttled': self.throttled,
+            'p50_ms': self.latency.percentile(50) * 1000,
+            'p90_ms': self.latency.percentile(90) * 1000,
+            'p99_ms': self.latency.percentile(99) * 1000,
+            'max_ms': self.latency.max * 1000,
+        }
+
+def load_request(session, kind, last, resting):
+    """Sends one request of the given kind. Returns (kind actually sent, HTTP status)."""
+    if kind == 'cancel':
+        try:
+            order_id = resting.pop()
+        except IndexError:
+            kind = 'limit_buy'
+        else:
+            return kind, session.delete(f'{BASE_URL}/orders/{order_id}').status_code
+    order_type, action = kind.split('_')
+    payload = {'ticker': 'ALGO', 'type': order_type.upper(), 'quantity': max_size, 'action': action.upper()}
+    if order_type == 'limit':
+        payload['price'] = round(last - load_limit_offset if action == 'buy' else last + load_limit_offset, 2)
+    resp = session.post(f'{BASE_URL}/orders', params=payload)
+    if resp.ok and order_type == 'limit':
+        resting.append(resp.json()['order_id'])
+    return kind, resp.status_code
 
-    # Calculate the desired delay (seconds per order)
-    desired_delay = 1.0 / order_limit
-    # Difference between desired delay and actual transaction time
-    order_speedbump = desired_delay - transaction_time
+def load_worker(session, step, bucket, step_end, last, resting, seed):
+    rng = random.Random(seed)
+    kinds, weights = list(load_mix), list(load_mix.values())
+    while not shutdown:
+        wait = bucket.reserve() if bucket is not None else 0.0
+        if time.monotonic() + wait >= step_end:
+            return
+        if wait > 0:
+            time.sleep(wait)
+        kind = rng.choices(kinds, weights)[0]
+        start = time.perf_counter()
+        try:
+            kind, status = load_request(session, kind, last, resting)
+        except requests.RequestException:
+            status = 599
+        step.record(kind, time.perf_counter() - start, status)
 
-    total_speedbumps += order_speedbump
-    total_transaction_time += transaction_time
-    placed_orders += 1
+def run_load_test(session):
+    """
+    Ramps the offered order rate through load_ramp with load_workers concurrent
+    workers and returns one saturation-curve row per step: offered vs achieved
+    orders/sec and the latency percentiles at that load.
+    """
+    resting = []              # Our resting LIMIT order ids (list.append/pop are atomic)
+    rows = []
+    log.info("Starting load test: {} workers, ramp {} orders/s, {}s per step", load_workers, load_ramp, load_step_seconds)
+    for i, offered in enumerate(load_ramp):
+        if shutdown:
+            break
+        step = LoadStep(offered)
+        bucket = TokenBucket(offered, 1) if offered > 0 else None
+        last = get_last(session)
+        step_start = time.monotonic()
+        step_end = step_start + load_step_seconds
+        workers = [threading.Thread(target=load_worker, name=f'load-{w}',
+                                    args=(session, step, bucket, step_end, last, resting, i * 1000 + w))
+                   for w in range(load_workers)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        row = step.row(time.monotonic() - step_start)
+        rows.append(row)
+        log.info("Offered {:>5} | achieved {:7.1f} orders/s | p50 {:6.1f} ms | p99 {:6.1f} ms | err {} (429: {})",
+                 offered or 'max', row['achieved_rps'], row['p50_ms'], row['p99_ms'], row['errors'], row['throttled'])
 
-    avg_speedbump = total_speedbumps / placed_orders
+    resp = session.post(f'{BASE_URL}/commands/cancel', params={'ticker': 'ALGO'})
+    if not resp.ok:
+        log.warning("Cleanup cancel failed: {}", resp.text)
+    return rows
 
-    if avg_speedbump > 0:
-        sleep(avg_speedbump)
+def report_load_curve(rows):
+    """
+    Logs the saturation curve and the ceiling: the highest achieved rate, and the
+    first step where achieved falls below 90% of offered or p99 doubles from the first step.
+    """
+    if not rows:
+        log.info("No load steps completed.")
+        return
+    log.info("\n=== Load Test Saturation Curve ===")
+    log.info(f"{'Offered':>8}{'Achieved':>10}{'Reqs':>7}{'Err':>6}{'429':>6}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'Max ms':>9}")
+    for r in rows:
+        log.info("{:>8}{:>10.1f}{:>7}{:>6}{:>6}{:>9.2f}{:>9.2f}{:>9.2f}{:>9.2f}", r['offered_rps'] or 'max',
+                 r['achieved_rps'], r['requests'], r['errors'], r['throttled'],
+                 r['p50_ms'], r['p90_ms'], r['p99_ms'], r['max_ms'])
+    ceiling = max(rows, key=lambda r: r['achieved_rps'])
+    log.info("Ceiling: {:.1f} orders/s (p99 {:.1f} ms)", ceiling['achieved_rps'], ceiling['p99_ms'])
+    base_p99 = rows[0]['p99_ms']
+    for r in rows:
+        if (r['offered_rps'] and r['achieved_rps'] < 0.9 * r['offered_rps']) or r['p99_ms'] > 2 * base_p99:
+            log.info("Saturation from offered {} orders/s (achieved {:.1f}, p99 {:.1f} ms)",
+                     r['offered_rps'] or 'max', r['achieved_rps'], r['p99_ms'])
+            break
 
-    return order_speedbump, avg_speedbump
+def write_load_curve(rows, path):
+    columns = ['offered_rps', 'achieved_rps', 'requests', 'errors', 'throttled', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms']
+    with open(path, 'w') as f:
+        f.write(','.join(columns) + '\n')
+        for r in rows:
+            f.write(','.join(f"{r[c]:.4f}" if isinstance(r[c], float) else str(r[c]) for c in columns) + '\n')
 
 def main():
-    global placed_orders
-    with requests.Session() as s:
-        s.headers.update(API_KEY)
-        print("Starting speed bump test for ALGO2...")
+    global placed_orders, total_speedbumps, total_transaction_time, total_retry_wait, throttled_orders
+    with RitClient(BASE_URL, API_KEY, pool_size=load_workers if load_mode else 1) as s:
+        instrument(s, api_stats)
+        recorder = SessionRecorder(session_record) if session_record else None
+        if recorder:
+            record_session(s, recorder)
+        api_stats.start_reporter(latency_report_seconds, emit=log.info)
+
+        if load_mode:
+            rows = run_load_test(s)
+            report_load_curve(rows)
+            if load_curve_dump and rows:
+                write_load_curve(rows, load_curve_dump)
+            api_stats.stop_reporter()
+            log.close()
+            api_stats.report()
+            if latency_dump:
+                api_stats.dump(latency_dump)
+            if recorder:
+                recorder.close()
+            return
+
+        # The load test measures raw responses; the paced test retries 429s and adapts its rate
+        backpressure(s, {'POST /orders': order_rate}, max_retries)
+        log.info("Starting speed bump test for ALGO2...")
+        test_start = time.monotonic()
 
         while placed_orders < num_orders and not shutdown:
+            current_sb = speedbump()
             start_time = time.time()
             
             # Submit a simple LIMIT BUY order for testing
@@ -74,30 +265,53 @@ def main():
                 'price': 19,  # Test price (adjust as needed)
                 'action': 'BUY'
             }
-            resp = s.post('http://localhost:9999/v1/orders', params=buy_payload)
+            resp = s.post(f'{BASE_URL}/orders', params=buy_payload)
+            retry_wait = getattr(resp, 'retry_wait', 0.0)   # 429 back-off sleeps (backpressure.py)
+            total_retry_wait += retry_wait
             
             if resp.ok:
-                transaction_time = time.time() - start_time
-                current_sb, avg_sb = speedbump(transaction_time)
-                print(f"Order #{placed_orders:3d}: Transaction Time = {transaction_time:.4f} s | "
-                      f"Current Speedbump = {current_sb:.4f} s | Average Speedbump = {avg_sb:.4f} s")
+                transaction_time = time.time() - start_time - retry_wait
+                total_speedbumps += current_sb
+                total_transaction_time += transaction_time
+                placed_orders += 1
+                avg_sb = total_speedbumps / placed_orders
+                log.info("Order #{:3d}: Transaction Time = {:.4f} s | Current Speedbump = {:.4f} s | "
+                         "Average Speedbump = {:.4f} s", placed_orders, transaction_time, current_sb, avg_sb)
+            elif retry_after(resp) is not None:
+                # Still rate limited after the retries: keep going, the bucket has slowed down
+                throttled_orders += 1
+                log.warning("Order throttled after {} retries; rate now {:.2f} orders/s", max_retries, order_rate.rate)
             else:
                 try:
                     error_data = resp.json()
                 except Exception:
                     error_data = resp.text
-                print(f"Error placing order: {error_data}")
+                log.error("Error placing order: {}", error_data)
                 break
 
+        test_time = time.monotonic() - test_start
+
         if placed_orders > 0:
             avg_transaction_time = total_transaction_time / placed_orders
             avg_speedbump_final = total_speedbumps / placed_orders
-            print("\n=== Speed Bump Test Summary ===")
-            print(f"Total Orders Placed      : {placed_orders}")
-            print(f"Average Transaction Time : {avg_transaction_time:.4f} s")
-            print(f"Average Speedbump Delay  : {avg_speedbump_final:.4f} s")
+            log.info("\n=== Speed Bump Test Summary ===")
+            log.info("Total Orders Placed      : {}", placed_orders)
+            log.info("Average Transaction Time : {:.4f} s", avg_transaction_time)
+            log.info("Average Speedbump Delay  : {:.4f} s", avg_speedbump_final)
+            log.info("Total 429 Retry Wait     : {:.4f} s", total_retry_wait)
+            log.info("Achieved Order Rate      : {:.2f} orders/s", placed_orders / test_time)
+            log.info("Final Paced Rate         : {:.2f} orders/s ({} rejected with 429, {} given up)",
+                     order_rate.rate, order_rate.rejections, throttled_orders)
         else:
-            print("No orders were placed during the test.")
+            log.info("No orders were placed during the test.")
+
+        api_stats.stop_reporter()
+        log.close()              # Writes what is queued before the reports below (printed directly)
+        api_stats.report()
+        if latency_dump:
+            api_stats.dump(latency_dump)
+        if recorder:
+            recorder.close()
 
 if __name__ == "__main__":
     signal.signal(signal.SIGINT, signal_handler)
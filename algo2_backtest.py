@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Offline backtester for the ALGO2 market-making strategy
+
+Replays recorded price history (candles from /v1/securities/history, or
+time-and-sales prints) through the same quoting and inventory rules as
+ALGO2's main():
+- net position above POSITION_THRESHOLD: target one SELL at last + SPREAD
+- net position below -POSITION_THRESHOLD: target one BUY at last - SPREAD
+- otherwise: target a BUY/SELL pair around last +/- SPREAD
+- a resting order within QUOTE_TOLERANCE of its side's target is kept; otherwise
+  it is cancelled and the target posted; orders on untargeted sides are cancelled
+
+The simulation is a loop over ticks only. All state (position, cash, resting
+orders) is held in NumPy arrays with one entry per parameter combination, so a
+whole parameter grid is simulated in one batched call and a 300-tick case takes
+milliseconds.
+
+Fill model: a resting BUY fills in full when the tick's low reaches its price,
+a resting SELL when the tick's high reaches its price (fill_on_touch=False
+requires the price to trade through). One decision per tick, using that tick's
+close as the last price.
+
+Example:
+    python algo2_backtest.py history.json --spreads 0.01:0.10:0.01 --thresholds 250,500,1000
+    python algo2_backtest.py --mock-seed 7          # history generated by rit_mock_server
+"""
+
+import argparse
+import csv
+import json
+import time
+
+import numpy as np
+
+from script_loader import ALGO2_SCRIPT, load_script
+
+FIRST_TICK = 6               # ALGO2 trades while 5 < tick < 295
+LAST_TICK = 294
+
+
+# -------------------------------------------------------------------------------------
+# Price History
+# -------------------------------------------------------------------------------------
+
+class PriceHistory:
+    """Per-tick OHLC arrays (oldest first)."""
+
+    def __init__(self, ticks, open_, high, low, close):
+        self.ticks = np.asarray(ticks, dtype=np.int64)
+        self.open = np.asarray(open_, dtype=float)
+        self.high = np.asarray(high, dtype=float)
+        self.low = np.asarray(low, dtype=float)
+        self.close = np.asarray(close, dtype=float)
+
+    def __len__(self):
+        return self.ticks.size
+
+    @classmethod
+    def from_candles(cls, candles):
+        """From /v1/securities/history candles, in either order."""
+        candles = sorted(candles, key=lambda c: c['tick'])
+        data = np.array([(c['tick'], c['open'], c['high'], c['low'], c['close']) for c in candles], dtype=float)
+        return cls(data[:, 0], data[:, 1], data[:, 2], data[:, 3], data[:, 4])
+
+    @classmethod
+    def from_tas(cls, prints):
+        """From /v1/securities/tas prints ({'tick', 'price', ...}); builds candles per tick."""
+        data = np.array([(p['tick'], p['price']) for p in prints], dtype=float)
+        order = np.argsort(data[:, 0], kind='stable')
+        ticks, prices = data[order, 0].astype(np.int64), data[order, 1]
+        unique, first = np.unique(ticks, return_index=True)
+        last = np.append(first[1:], ticks.size) - 1
+        high = np.maximum.reduceat(prices, first)
+        low = np.minimum.reduceat(prices, first)
+        return cls(unique, prices[first], high, low, prices[last])
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a JSON file (candle list or TAS print list, as returned by the API)
+        or a CSV file with tick,open,high,low,close columns.
+        """
+        if path.endswith('.csv'):
+            with open(path, newline='') as f:
+                rows = [{k: float(v) for k, v in row.items()} for row in csv.DictReader(f)]
+            return cls.from_candles(rows)
+        with open(path) as f:
+            records = json.load(f)
+        if records and 'close' not in records[0]:
+            return cls.from_tas(records)
+        return cls.from_candles(records)
+
+
+def mock_history(seed=1, ticker='ALGO', ticks=300):
+    """Generates one full case of candles with rit_mock_server's simulated market."""
+    from rit_mock_server import MockExchange
+
+    now = [0.0]
+    exchange = MockExchange(tick_seconds=1.0, start_tick=1, ticks_per_period=ticks,
+                            seed=seed, clock=lambda: now[0])
+    now[0] = float(ticks)
+    return PriceHistory.from_candles(exchange.get_history(ticker))
+
+
+# -------------------------------------------------------------------------------------
+# Parameter Grid
+# -------------------------------------------------------------------------------------
+
+def algo2_defaults():
+    """Current SPREAD / BUY_VOLUME / SELL_VOLUME / POSITION_THRESHOLD / QUOTE_TOLERANCE from the ALGO2 script."""
+    algo2 = load_script(ALGO2_SCRIPT)
+    return {'spread': algo2.SPREAD, 'buy_volume': algo2.BUY_VOLUME,
+            'sell_volume': algo2.SELL_VOLUME, 'threshold': algo2.POSITION_THRESHOLD,
+            'tolerance': algo2.QUOTE_TOLERANCE}
+
+
+def param_grid(spreads, buy_volumes, sell_volumes, thresholds):
+    """Cartesian product of the parameter lists, as a dict of equal-length arrays."""
+    mesh = np.meshgrid(np.asarray(spreads, dtype=float), np.asarray(buy_volumes, dtype=float),
+                       np.asarray(sell_volumes, dtype=float), np.asarray(thresholds, dtype=float),
+                       indexing='ij')
+    return {name: axis.ravel() for name, axis in
+            zip(('spread', 'buy_volume', 'sell_volume', 'threshold'), mesh)}
+
+
+# -------------------------------------------------------------------------------------
+# Simulation
+# -------------------------------------------------------------------------------------
+
+def simulate(history, params, commission=0.0, fill_on_touch=True, tolerance=0.0,
+             first_tick=FIRST_TICK, last_tick=LAST_TICK):
+    """
+    Runs the ALGO2 rules over `history` for every parameter combination at once.
+    `params` holds equal-length arrays 'spread', 'buy_volume', 'sell_volume', 'threshold';
+    `tolerance` is ALGO2's QUOTE_TOLERANCE.
+    Returns a dict of result arrays (one entry per combination) plus the params.
+    """
+    spread = np.asarray(params['spread'], dtype=float)
+    buy_volume = np.asarray(params['buy_volume'], dtype=float)
+    sell_volume = np.asarray(params['sell_volume'], dtype=float)
+    threshold = np.asarray(params['threshold'], dtype=float)
+    n = spread.size
+
+    position = np.zeros(n)
+    cash = np.zeros(n)
+    volume = np.zeros(n)
+    orders_sent = np.zeros(n)
+    cancels = np.zeros(n)
+    max_position = np.zeros(n)
+    buy_px = np.zeros(n)
+    buy_qty = np.zeros(n)              # 0 = no resting BUY
+    sell_px = np.zeros(n)
+    sell_qty = np.zeros(n)             # 0 = no resting SELL
+
+    window = (history.ticks >= first_tick) & (history.ticks <= last_tick)
+    highs, lows, closes = history.high[window], history.low[window], history.close[window]
+
+    for high, low, last in zip(highs, lows, closes):
+        # 1) Resting orders fill against this tick's range
+        if fill_on_touch:
+            buy_fill = (buy_qty > 0) & (low <= buy_px)
+            sell_fill = (sell_qty > 0) & (high >= sell_px)
+        else:
+            buy_fill = (buy_qty > 0) & (low < buy_px)
+            sell_fill = (sell_qty > 0) & (high > sell_px)
+        bought = np.where(buy_fill, buy_qty, 0.0)
+        sold = np.where(sell_fill, sell_qty, 0.0)
+        position += bought - sold
+        cash += sold * sell_px - bought * buy_px
+        volume += bought + sold
+        buy_qty[buy_fill] = 0.0
+        sell_qty[sell_fill] = 0.0
+        np.maximum(max_position, np.abs(position), out=max_position)
+
+        # 2) ALGO2 decision on this tick's last price: reconcile targets with resting orders
+        too_long = position > threshold
+        too_short = position < -threshold
+        want_buy = ~too_long
+        want_sell = ~too_short
+        buy_target = last - spread
+        sell_target = last + spread
+        keep_buy = want_buy & (buy_qty > 0) & (np.abs(buy_px - buy_target) <= tolerance + 1e-9)
+        keep_sell = want_sell & (sell_qty > 0) & (np.abs(sell_px - sell_target) <= tolerance + 1e-9)
+
+        cancels += ((buy_qty > 0) & ~keep_buy).astype(int) + ((sell_qty > 0) & ~keep_sell)
+        post_buy = want_buy & ~keep_buy
+        post_sell = want_sell & ~keep_sell
+        buy_px = np.where(post_buy, buy_target, buy_px)
+        buy_qty = np.where(post_buy, buy_volume, np.where(keep_buy, buy_qty, 0.0))
+        sell_px = np.where(post_sell, sell_target, sell_px)
+        sell_qty = np.where(post_sell, sell_volume, np.where(keep_sell, sell_qty, 0.0))
+        orders_sent += post_buy.astype(int) + post_sell
+
+    final_price = closes[-1] if closes.size else 0.0
+    pnl = cash + position * final_price - commission * volume
+    return {
+        **{name: np.asarray(values) for name, values in params.items()},
+        'pnl': pnl,
+        'final_position': position,
+        'max_position': max_position,
+        'volume': volume,
+        'orders_sent': orders_sent,
+        'cancels': cancels,
+    }
+
+
+def ranked(results, key='pnl', top=None):
+    """Result rows (dicts) sorted by `key`, best first."""
+    order = np.argsort(-results[key], kind='stable')[:top]
+    return [{name: values[i].item() for name, values in results.items()} for i in order]
+
+
+# -------------------------------------------------------------------------------------
+# Command Line
+# -------------------------------------------------------------------------------------
+
+def _values(text, cast=float):
+    """Parses 'a,b,c' or 'start:stop:step' (stop inclusive)."""
+    if ':' in text:
+        start, stop, step = (float(x) for x in text.split(':'))
+        return [cast(round(v, 10)) for v in np.arange(start, stop + step / 2, step)]
+    return [cast(v) for v in text.split(',')]
+
+
+def main():
+    defaults = algo2_defaults()
+    parser = argparse.ArgumentParser(description="Vectorized offline backtest of the ALGO2 strategy")
+    parser.add_argument('history', nargs='?', help="JSON candles/TAS prints or CSV tick,open,high,low,close")
+    parser.add_argument('--mock-seed', type=int, help="use a case generated by rit_mock_server instead of a file")
+    parser.add_argument('--spreads', default=str(defaults['spread']))
+    parser.add_argument('--buy-volumes', default=str(defaults['buy_volume']))
+    parser.add_argument('--sell-volumes', default=str(defaults['sell_volume']))
+    parser.add_argument('--thresholds', default=str(defaults['threshold']))
+    parser.add_argument('--tolerance', type=float, default=defaults['tolerance'], help="quote price tolerance")
+    parser.add_argument('--commission', type=float, default=0.0, help="per-share commission")
+    parser.add_argument('--through', action='store_true', help="require the price to trade through to fill")
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.history:
+        history = PriceHistory.load(args.history)
+    else:
+        history = mock_history(args.mock_seed or 1)
+
+    params = param_grid(_values(args.spreads), _values(args.buy_volumes, int),
+                        _values(args.sell_volumes, int), _values(args.thresholds, int))
+    start = time.perf_counter()
+    results = simulate(history, params, args.commission, fill_on_touch=not args.through,
+                       tolerance=args.tolerance)
+    elapsed = time.perf_counter() - start
+
+    print(f"Simulated {results['pnl'].size} parameter sets over {len(history)} ticks in {elapsed * 1000:.1f} ms")
+    print(f"{'Spread':>7}{'BuyVol':>8}{'SellVol':>8}{'Thresh':>8}{'P&L':>12}{'FinalPos':>10}"
+          f"{'MaxPos':>8}{'Volume':>9}{'Orders':>8}")
+    for row in ranked(results, top=args.top):
+        print(f"{row['spread']:>7.2f}{row['buy_volume']:>8.0f}{row['sell_volume']:>8.0f}{row['threshold']:>8.0f}"
+              f"{row['pnl']:>12.2f}{row['final_position']:>10.0f}{row['max_position']:>8.0f}"
+              f"{row['volume']:>9.0f}{row['orders_sent']:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
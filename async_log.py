@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Queue-backed logging for the trading loops
+
+print() writes to the console synchronously, so every status line inside a
+loop pass adds its formatting and console I/O to the pass (and to measured
+transaction times when it sits between a request and its timing). AsyncLogger
+keeps both off the calling thread:
+- log.info(template, *args) checks the level and puts one small tuple
+  (time, level, template, args) on a queue: no formatting, no I/O
+- a background thread wakes every `interval` seconds, takes whatever is
+  queued, formats it (template.format(*args)) and writes it with one write and
+  one flush per BATCH_SIZE records, to the console or to a file. It never
+  blocks on the queue, so a put() never has to wake a waiting thread
+
+Records are written in the order they were queued. Arguments are formatted
+later, on the writer thread: pass values that are not mutated afterwards.
+
+Levels: debug < info < warning < error; 'off' drops everything. Formats:
+'text' writes the message as print() would, 'json' writes one JSON object per
+line ({"ts", "level", "msg", "args"}).
+
+flush() waits until everything queued so far is written (call it before
+printing outside the logger, e.g. a final report). close() flushes and stops
+the writer; it also runs at exit. Anything logged after close() is dropped.
+
+Example (RIT_LOG_LEVEL, RIT_LOG_FILE, RIT_LOG_FORMAT):
+    log = AsyncLogger(os.environ.get('RIT_LOG_LEVEL'), os.environ.get('RIT_LOG_FILE'))
+    log.info("Order placed: {} {} {}@{} | TxTime={:.4f}s", ticker, action, qty, price, tx_time)
+    log.warning("Order error: {}", error)
+    ...
+    log.close()
+"""
+
+import atexit
+import json
+import queue
+import sys
+import threading
+import time
+
+DEBUG, INFO, WARNING, ERROR, OFF = 10, 20, 30, 40, 100
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR, 'off': OFF}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+FORMATS = ('text', 'json')
+BATCH_SIZE = 512               # Max records formatted and written per write/flush
+WRITE_INTERVAL = 0.05          # Seconds between writer passes (console latency of a line)
+FLUSH_TIMEOUT = 2.0            # Seconds flush()/close() wait for the writer
+
+_STOP = object()
+
+
+def parse_level(level):
+    """Level number for a name ('debug', ..., 'off') or number; unknown or empty -> INFO."""
+    if isinstance(level, int):
+        return level
+    level = (level or '').strip().lower()
+    if level in ('0', 'false', 'no', 'none'):
+        return OFF
+    return LEVELS.get(level, INFO)
+
+
+class AsyncLogger:
+    """Leveled logger that formats and writes on a background thread (see the module docstring)."""
+
+    def __init__(self, level=INFO, path=None, fmt='text', interval=WRITE_INTERVAL):
+        self.level = parse_level(level)
+        self.path = path or None
+        self.fmt = fmt if fmt in FORMATS else 'text'
+        self.interval = interval
+        self.queue = queue.SimpleQueue()
+        self.closed = False
+        self.written = 0               # Records written so far
+        self.batches = 0               # write() calls so far
+        self.file = open(self.path, 'a', encoding='utf-8') if self.path else None
+        self.thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    # ---------------------------------------------------------------- logging (any thread)
+
+    def log(self, level, msg, *args):
+        if level >= self.level:
+            self.queue.put((time.time(), level, msg, args))
+
+    def debug(self, msg, *args):
+        if DEBUG >= self.level:
+            self.queue.put((time.time(), DEBUG, msg, args))
+
+    def info(self, msg, *args):
+        if INFO >= self.level:
+            self.queue.put((time.time(), INFO, msg, args))
+
+    def warning(self, msg, *args):
+        if WARNING >= self.level:
+            self.queue.put((time.time(), WARNING, msg, args))
+
+    def error(self, msg, *args):
+        if ERROR >= self.level:
+            self.queue.put((time.time(), ERROR, msg, args))
+
+    def enabled(self, level):
+        """True when records of `level` are written (to skip building expensive arguments)."""
+        return level >= self.level
+
+    # ---------------------------------------------------------------- control
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Waits until every record queued before this call is written."""
+        if self.closed or not self.thread.is_alive():
+            return
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait(timeout)
+
+    def close(self, timeout=FLUSH_TIMEOUT):
+        """Writes what is queued, stops the writer thread and closes the file."""
+        if self.closed:
+            return
+        self.closed = True
+        self.level = OFF
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+        if self.file is not None:
+            self.file.close()
+        atexit.unregister(self.close)
+
+    # ---------------------------------------------------------------- writer thread
+
+    def format(self, record):
+        """One output line (with its newline) for a queued record."""
+        ts, level, msg, args = record
+        try:
+            text = msg.format(*args) if args else msg
+        except Exception as e:             # A bad template must not stop the writer
+            text = f"{msg!r} {args!r} (format failed: {e})"
+        if self.fmt == 'json':
+            entry = {'ts': round(ts, 6), 'level': LEVEL_NAMES.get(level, level), 'msg': text}
+            if args:
+                entry['args'] = args
+            return json.dumps(entry, default=str) + '\n'
+        return text + '\n'
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                while len(batch) < BATCH_SIZE:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                time.sleep(self.interval)
+                continue
+            lines, waiters, stop = [], [], False
+            for record in batch:
+                if record is _STOP:
+                    stop = True
+                elif isinstance(record, threading.Event):
+                    waiters.append(record)
+                else:
+                    lines.append(self.format(record))
+            if lines:
+                self._write(''.join(lines))
+                self.written += len(lines)
+                self.batches += 1
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _write(self, data):
+        stream = self.file if self.file is not None else sys.stdout
+        try:
+            stream.write(data)
+            stream.flush()
+        except (OSError, ValueError):      # Console gone or file closed: drop the batch
+            pass
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Rate-limit (HTTP 429) backpressure for RIT API sessions
+
+backpressure(session, controllers) wraps a requests.Session (like
+latency_stats.instrument) so a request the exchange rejects for rate limiting is
+retried instead of being handed back as an error:
+- the wait hint is read from the 429 response (the 'wait' field of the body, or
+  the Retry-After header)
+- the rejection is fed to the AdaptiveRate that paces the endpoint: its token
+  bucket is emptied for the hinted time, so every caller sharing the bucket
+  holds off, and its rate is cut multiplicatively
+- the request is sent again when the bucket next gives it a token, up to
+  `max_retries` times; after that the 429 response is returned as before
+
+Every accepted request raises the rate again by a small step, up to the rate the
+bucket was configured with (additive increase, multiplicative decrease), so a
+script set faster than the exchange allows settles just under the real limit
+instead of alternating between bursts and rejections.
+
+The returned response carries `retry_wait`, the seconds slept between its
+attempts, so a caller timing the request can leave the waits out of it.
+
+Example:
+    orders = AdaptiveRate(order_bucket)
+    backpressure(session, {'POST /orders': orders, None: AdaptiveRate(poll_bucket)})
+    ...
+    print(f"order rate {orders.rate:.2f}/s after {orders.rejections} rejections")
+"""
+
+import threading
+import time
+
+from latency_stats import endpoint_name
+from rit_client import loads
+
+MAX_RETRIES = 3
+DEFAULT_WAIT = 0.5           # Seconds to back off when a 429 carries no hint
+
+
+def retry_after(resp, default=DEFAULT_WAIT):
+    """
+    Seconds the exchange asked us to wait before retrying, for a 429 response;
+    None for any other response.
+    """
+    if resp.status_code != 429:
+        return None
+    try:
+        return max(0.0, float(loads(resp.content)['wait']))
+    except (ValueError, TypeError, KeyError):
+        pass
+    try:
+        return max(0.0, float(resp.headers['Retry-After']))
+    except (ValueError, KeyError):
+        return default
+
+
+class AdaptiveRate:
+    """
+    AIMD controller for one TokenBucket. The bucket's configured rate is the
+    ceiling; a rejection multiplies the rate by `decrease` (at most once per hinted
+    wait, so a burst of rejections from one overload counts once) and an accepted
+    request adds `increase` * ceiling, never going below `floor` * ceiling.
+    """
+
+    def __init__(self, bucket, decrease=0.8, increase=0.01, floor=0.1, clock=time.monotonic):
+        self.bucket = bucket
+        self.ceiling = bucket.rate
+        self.decrease = decrease
+        self.step = increase * self.ceiling
+        self.min_rate = floor * self.ceiling
+        self.clock = clock
+        self.hold_until = 0.0
+        self.rejections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def rejected(self, wait):
+        """Feeds a 429 with its wait hint: empties the bucket for `wait` and lowers the rate."""
+        now = self.clock()
+        with self.lock:
+            self.rejections += 1
+            if now >= self.hold_until:
+                self.bucket.set_rate(max(self.min_rate, self.bucket.rate * self.decrease))
+            self.hold_until = max(self.hold_until, now + wait)
+        self.bucket.penalize(wait)
+
+    def accepted(self):
+        """Feeds an accepted request: creeps the rate back up towards the ceiling."""
+        if self.bucket.rate < self.ceiling:
+            with self.lock:
+                self.bucket.set_rate(min(self.ceiling, self.bucket.rate + self.step))
+
+    def retry_delay(self, wait):
+        """Takes a token for the retry; returns how long to wait before sending it."""
+        return max(wait, self.bucket.reserve())
+
+
+def backpressure(session, controllers, max_retries=MAX_RETRIES, sleep=time.sleep):
+    """
+    Wraps session.request so 429 responses are retried after their wait hint and
+    reported to the controller of their endpoint. `controllers` maps endpoint
+    labels ('POST /orders', ...) to AdaptiveRate; the None key, if present, covers
+    every other endpoint. Returns the session.
+    """
+    send = session.request
+    default = controllers.get(None)
+
+    def throttled_request(method, url, *args, **kwargs):
+        controller = controllers.get(endpoint_name(method, url), default)
+        attempt = 0
+        waited = 0.0
+        while True:
+            resp = send(method, url, *args, **kwargs)
+            resp.retry_wait = waited
+            wait = retry_after(resp)
+            if wait is None:
+                if controller is not None:
+                    controller.accepted()
+                return resp
+            if controller is not None:
+                controller.rejected(wait)
+            if attempt == max_retries:
+                return resp
+            attempt += 1
+            delay = controller.retry_delay(wait) if controller is not None else wait
+            sleep(delay)
+            waited += delay
+
+    session.request = throttled_request
+    return session
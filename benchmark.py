@@ -0,0 +1,456 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for the trading scripts' hot paths
+
+Drives the real functions of ALGO2 and LT3 (loaded with script_loader) against
+an in-process MockExchange. Requests never touch a socket: MockTransport is a
+requests adapter that answers each call through rit_mock_server.dispatch() after
+a fixed latency, and the exchange runs on a manual clock, so the same case and
+the same responses are seen on every run.
+
+On a shared machine, the speed of identical code drifts by tens of percent from
+one second to the next. That drift moves any average or median of wall-clock
+time, but the fastest of many short samples spread over a few seconds hardly
+moves. So every measurement times its calls in batches of about BATCH_SECONDS
+and keeps the fastest batch (fastest_batch). LT3 replays its tender script
+LT3_PASSES times and keeps each decision's fastest pass. The iteration counts
+are sized so the samples span enough time, and each metric is the best of
+--repeat interleaved runs.
+
+Benchmarks:
+- algo2.get_position_per_sec    get_position() calls per second, ledger warm
+- algo2.orders_per_sec          orders per second through submit_order_pair(), pacing off
+- algo2.loop_passes_per_sec     main() passes per second (state reads + quote_all, no sleep)
+- lt3.tender_decision_p50_ms    check_tenders() + handle_tenders() for one new tender
+- lt3.tender_decision_p90_ms
+- speedbump.calls_per_sec       dynamic_speedbump() overhead with an unlimited bucket
+- speedbump.pacing_error_pct    |achieved - target| / target at PACING_RATE orders/sec
+- log.call_us                   caller-side cost of one hot-path log call (async_log.py)
+
+The scripts' logs are written to os.devnull by a live AsyncLogger, so their
+logging cost is part of every benchmark.
+
+Results are written as JSON. With --baseline, every metric is compared with the
+baseline file and the run fails (exit status 1) when one is worse by more than
+its threshold: THRESHOLD by default, THRESHOLDS per metric, and never for a
+change smaller than the metric's FLOORS entry. A benchmark that regresses is
+re-run (--confirm times) and its metrics keep the better value, so a stretch
+of slow machine has to last through both runs to fail the gate while a real
+regression shows up in every run.
+
+Example:
+    python benchmark.py --save-baseline                 # writes benchmark_baseline.json
+    python benchmark.py --baseline benchmark_baseline.json
+    python benchmark.py --only lt3 --latency-ms 2 --repeat 5
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from async_log import INFO, AsyncLogger
+from rate_limiter import RateLimiter, TokenBucket
+from rit_client import RitClient
+from rit_mock_server import MockExchange, dispatch
+from script_loader import ALGO2_SCRIPT, LT3_SCRIPT, load_script
+
+BENCH_URL = 'http://bench/v1'
+LATENCY_MS = 0.5             # Fixed latency of every fake exchange response
+UNLIMITED = 1e9              # Order rate used to switch the speed bump off
+PACING_RATE = 200            # Orders/sec for the speed bump pacing check
+REPEAT = 5                   # Runs per benchmark; the median run is reported
+BATCH_SECONDS = 0.002        # Length of one timed batch; the fastest batch counts
+LT3_PASSES = 3               # Replays of the LT3 tender script; each decision's fastest counts
+CONFIRM_RUNS = 1             # Re-runs of a regressed benchmark before the gate fails
+
+# name -> (unit, 'higher' or 'lower' is better)
+METRICS = {
+    'algo2.get_position_per_sec': ('calls/s', 'higher'),
+    'algo2.orders_per_sec': ('orders/s', 'higher'),
+    'algo2.loop_passes_per_sec': ('passes/s', 'higher'),
+    'lt3.tender_decision_p50_ms': ('ms', 'lower'),
+    'lt3.tender_decision_p90_ms': ('ms', 'lower'),
+    'speedbump.calls_per_sec': ('calls/s', 'higher'),
+    'speedbump.pacing_error_pct': ('%', 'lower'),
+    'log.call_us': ('us', 'lower'),
+}
+THRESHOLD = 0.15             # Relative change that counts as a regression
+THRESHOLDS = {               # Per-metric overrides (thread scheduling makes these noisier)
+    'algo2.loop_passes_per_sec': 0.25,
+    'lt3.tender_decision_p50_ms': 0.25,
+    'lt3.tender_decision_p90_ms': 0.25,
+    'speedbump.calls_per_sec': 0.25,
+    'log.call_us': 0.25,
+}
+FLOORS = {                   # Absolute changes always tolerated (noise on small values)
+    'lt3.tender_decision_p50_ms': 1.0,
+    'lt3.tender_decision_p90_ms': 2.0,
+    'speedbump.pacing_error_pct': 1.0,
+}
+
+
+# -------------------------------------------------------------------------------------
+# Fake exchange plumbing
+# -------------------------------------------------------------------------------------
+
+class ManualClock:
+    """Exchange clock that only moves when told to (ticks advance on demand)."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class MockTransport(BaseAdapter):
+    """requests adapter answering from a MockExchange after a fixed `latency` (seconds)."""
+
+    def __init__(self, exchange, latency=0.0):
+        super().__init__()
+        self.exchange = exchange
+        self.latency = latency
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        if self.latency > 0:
+            time.sleep(self.latency)
+        status, body, headers = dispatch(self.exchange, request.method, url.path, parse_qs(url.query))
+        resp = requests.Response()
+        resp.status_code = status
+        resp.reason = 'OK' if status < 400 else 'Error'
+        resp.headers = CaseInsensitiveDict({'Content-Type': 'application/json', **headers})
+        resp._content = json.dumps(body).encode()
+        resp.encoding = 'utf-8'
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    def close(self):
+        pass
+
+
+def bench_session(exchange, latency):
+    """RitClient whose requests to BENCH_URL are answered by `exchange`."""
+    client = RitClient(BENCH_URL)
+    client.mount('http://bench/', MockTransport(exchange, latency))
+    return client
+
+
+def load_quiet(filename):
+    """Loads a script with BASE_URL pointing at the fake exchange and its log going to os.devnull."""
+    module = load_script(filename)
+    module.BASE_URL = BENCH_URL
+    module.log.close()
+    module.log = AsyncLogger(INFO, os.devnull)
+    return module
+
+
+def rate(count, seconds):
+    return count / seconds if seconds > 0 else float('inf')
+
+
+def fastest_batch(call, n, batch_seconds=BATCH_SECONDS):
+    """
+    Calls call() about `n` times in batches of about `batch_seconds` (sized from
+    one timed call) and returns the seconds per call of the fastest batch.
+    """
+    start = time.perf_counter()
+    call()
+    first = time.perf_counter() - start
+    size = max(1, min(n, int(batch_seconds / first) if first > 0 else n))
+    fastest = first
+    for _ in range(max(1, n // size)):
+        start = time.perf_counter()
+        for _ in range(size):
+            call()
+        fastest = min(fastest, (time.perf_counter() - start) / size)
+    return fastest
+
+
+# -------------------------------------------------------------------------------------
+# Benchmarks
+# -------------------------------------------------------------------------------------
+
+def bench_algo2(latency, scale=1.0):
+    """get_position, submit_order_pair and full loop passes."""
+    algo2 = load_quiet(ALGO2_SCRIPT)
+    algo2.order_limiter = RateLimiter({'orders': (UNLIMITED, UNLIMITED)})
+    exchange = MockExchange(tick_seconds=0, start_tick=10)
+    ticker = algo2.TICKERS[0]
+    metrics = {}
+    with bench_session(exchange, latency) as s:
+        # Some fills so the TRANSACTED orders response has content
+        for i in range(20):
+            s.post_order(ticker, 'MARKET', 100, 'BUY' if i % 2 else 'SELL')
+
+        n = max(1, int(800 * scale))
+        algo2.get_position(s, ticker)
+        seconds = fastest_batch(lambda: algo2.get_position(s, ticker), n)
+        metrics['algo2.get_position_per_sec'] = rate(1, seconds)
+
+        n = max(1, int(800 * scale))
+        last = exchange.securities[ticker]['last']
+        buy = algo2.limit_payload(ticker, 'BUY', algo2.BUY_VOLUME, round(last - 5, 2))
+        sell = algo2.limit_payload(ticker, 'SELL', algo2.SELL_VOLUME, round(last + 5, 2))
+        seconds = fastest_batch(lambda: algo2.submit_order_pair(s, buy, sell), n)
+        metrics['algo2.orders_per_sec'] = rate(2, seconds)
+        exchange.cancel_orders(True, None, None)
+
+        n = max(1, int(400 * scale))
+        loop = asyncio.new_event_loop() if algo2.ASYNC_READS else None
+        passes = itertools.count()
+
+        def loop_pass():
+            if loop is not None:
+                tick, positions, orders, last_prices = loop.run_until_complete(
+                    algo2.read_market_state_async(s, algo2.TICKERS))
+            else:
+                tick, positions, orders, last_prices = algo2.read_market_state(s, algo2.TICKERS)
+            algo2.quote_all(s, positions, orders, last_prices, next(passes))
+
+        try:
+            metrics['algo2.loop_passes_per_sec'] = rate(1, fastest_batch(loop_pass, n))
+        finally:
+            if loop is not None:
+                loop.close()
+    algo2.pair_executor.shutdown()
+    algo2.ticker_executor.shutdown()
+    algo2.log.close()
+    return metrics
+
+
+def tender_script(rounds, first_tick):
+    """One tender per tick, alternating tickers and sides; every other one is worth accepting."""
+    script = []
+    for i in range(rounds):
+        action = 'BUY' if i % 2 else 'SELL'
+        good = i % 4 < 2
+        # A BUY tender is attractive below the market, a SELL tender above it
+        offset = 0.30 if (action == 'SELL') == good else -0.30
+        script.append({'tick': first_tick + i, 'ticker': ('CRZY', 'TAME')[i % 2], 'action': action,
+                       'quantity': 5000, 'price_offset': offset, 'expires_in': 2})
+    return script
+
+
+def lt3_pass(lt3, latency, rounds):
+    """Decision times (seconds) of one replay of the tender script against a fresh exchange."""
+    clock = ManualClock()
+    exchange = MockExchange(tick_seconds=1.0, start_tick=10, clock=clock,
+                            tenders=tender_script(rounds, 11))
+    lt3.securities_cache.invalidate()
+    timings = []
+    with bench_session(exchange, latency) as s:
+        for _ in range(rounds):
+            clock.advance(1.0)
+            tick = exchange.current_tick()
+            start = time.perf_counter()
+            tenders = lt3.check_tenders(s)
+            if tenders:
+                lt3.handle_tenders(s, tenders, tick)
+            timings.append(time.perf_counter() - start)
+            lt3.securities_cache.note_tick(tick)
+    return timings
+
+
+def bench_lt3(latency, scale=1.0):
+    """Decision latency from reading /tenders to every accept/decline answered."""
+    lt3 = load_quiet(LT3_SCRIPT)
+    lt3.SLEEP_TIME = 0.0
+    lt3.order_bucket = TokenBucket(UNLIMITED, UNLIMITED)     # Pre-accept flattens unpaced
+    rounds = max(1, int(60 * scale))
+    # The script is deterministic, so decision i is the same work in every pass
+    timings = np.min([lt3_pass(lt3, latency, rounds) for _ in range(LT3_PASSES)], axis=0)
+    lt3.tender_executor.shutdown()
+    lt3.flatten_executor.shutdown()
+    lt3.log.close()
+    timings_ms = timings * 1000
+    return {
+        'lt3.tender_decision_p50_ms': float(np.percentile(timings_ms, 50)),
+        'lt3.tender_decision_p90_ms': float(np.percentile(timings_ms, 90)),
+    }
+
+
+def bench_speedbump(latency, scale=1.0):
+    """dynamic_speedbump() overhead, and how closely it holds a target rate."""
+    algo2 = load_quiet(ALGO2_SCRIPT)
+    metrics = {}
+    algo2.order_limiter = RateLimiter({'orders': (UNLIMITED, UNLIMITED)})
+    n = max(1, int(200000 * scale))
+    metrics['speedbump.calls_per_sec'] = rate(1, fastest_batch(algo2.dynamic_speedbump, n))
+
+    algo2.order_limiter = RateLimiter({'orders': (PACING_RATE, 1)})
+    n = max(2, int(PACING_RATE * scale))
+    algo2.dynamic_speedbump()                 # Takes the one burst token
+    start = time.perf_counter()
+    for _ in range(n):
+        algo2.dynamic_speedbump()
+    achieved = rate(n, time.perf_counter() - start)
+    metrics['speedbump.pacing_error_pct'] = abs(achieved - PACING_RATE) / PACING_RATE * 100
+    algo2.pair_executor.shutdown()
+    algo2.ticker_executor.shutdown()
+    algo2.log.close()
+    return metrics
+
+
+def bench_log(latency, scale=1.0):
+    """What an 'Order placed' log line costs the loop thread (writer running, output to os.devnull)."""
+    log = AsyncLogger(INFO, os.devnull)
+    n = max(1, int(200000 * scale))
+
+    def log_call():
+        log.info("Order placed: {} {} {}@{} | TxTime={:.4f}s | SB={:.4f}s | AvgSB={:.4f}s",
+                 'ALGO', 'BUY', 1000, 19.99, 0.0031, 0.0, 0.0)
+
+    seconds = fastest_batch(log_call, n)
+    log.close()
+    return {'log.call_us': seconds * 1e6}
+
+
+BENCHMARKS = {
+    'algo2': bench_algo2,
+    'lt3': bench_lt3,
+    'speedbump': bench_speedbump,
+    'log': bench_log,
+}
+
+
+def best(metric, values):
+    """The best of a metric's runs (the lowest or the highest, per METRICS)."""
+    return float(min(values) if METRICS.get(metric, ('', 'higher'))[1] == 'lower' else max(values))
+
+
+def run(names, latency, repeat=REPEAT, scale=1.0):
+    """
+    Runs the named benchmarks `repeat` times (script output muted). Returns the
+    best run of each metric. The repeats are interleaved (a, b, a, b, ...) so a
+    slow stretch on the machine hits one run of each benchmark, not all of one.
+    """
+    samples = {}
+    for _ in range(repeat):
+        for name in names:
+            with contextlib.redirect_stdout(io.StringIO()):
+                metrics = BENCHMARKS[name](latency, scale)
+            for metric, value in metrics.items():
+                samples.setdefault(metric, []).append(value)
+    return {metric: best(metric, values) for metric, values in samples.items()}
+
+
+# -------------------------------------------------------------------------------------
+# Results
+# -------------------------------------------------------------------------------------
+
+def regressions(metrics, baseline, threshold=THRESHOLD):
+    """
+    Compares metrics with a baseline {metric: value}. Returns (metric, baseline,
+    current, change) for each metric worse than allowed; change is relative, positive = worse.
+    """
+    worse = []
+    for metric, current in metrics.items():
+        base = baseline.get(metric)
+        if base is None or metric not in METRICS:
+            continue
+        delta = current - base if METRICS[metric][1] == 'lower' else base - current
+        change = delta / abs(base) if base else (float('inf') if delta > 0 else 0.0)
+        if change > THRESHOLDS.get(metric, threshold) and delta > FLOORS.get(metric, 0.0):
+            worse.append((metric, base, current, change))
+    return worse
+
+
+def report(metrics, baseline=None):
+    print(f"{'Metric':<32}{'Value':>12}  {'Unit':<9}{'Baseline':>12}{'Change':>9}")
+    for metric, value in metrics.items():
+        unit = METRICS.get(metric, ('', ''))[0]
+        line = f"{metric:<32}{value:>12.2f}  {unit:<9}"
+        if baseline and metric in baseline:
+            base = baseline[metric]
+            line += f"{base:>12.2f}{(value - base) / base * 100 if base else 0.0:>8.1f}%"
+        print(line)
+
+
+def save(path, metrics, args):
+    data = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'latency_ms': args.latency_ms,
+        'repeat': args.repeat,
+        'scale': args.scale,
+        'metrics': metrics,
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the ALGO2 / LT3 / speed bump hot paths")
+    parser.add_argument('--only', default=','.join(BENCHMARKS), help="comma-separated: " + ', '.join(BENCHMARKS))
+    parser.add_argument('--latency-ms', type=float, default=LATENCY_MS, help="fake exchange latency per request")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="runs per benchmark; the best run is reported")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplies the iteration counts")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="fail if a metric regressed against this results file")
+    parser.add_argument('--save-baseline', nargs='?', const='benchmark_baseline.json',
+                        help="also write the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="default relative regression threshold")
+    parser.add_argument('--confirm', type=int, default=CONFIRM_RUNS,
+                        help="re-runs of a regressed benchmark before it fails the gate")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    start = time.perf_counter()
+    metrics = run(names, args.latency_ms / 1000.0, args.repeat, args.scale)
+    print(f"Benchmarks {', '.join(names)}: {args.repeat} run(s) each, "
+          f"{args.latency_ms} ms latency, {time.perf_counter() - start:.1f} s")
+
+    baseline = None
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            parser.error(f"baseline {args.baseline} not found")
+        with open(args.baseline) as f:
+            baseline = json.load(f)['metrics']
+        for _ in range(args.confirm):
+            worse = regressions(metrics, baseline, args.threshold)
+            if not worse:
+                break
+            again = sorted({metric.split('.')[0] for metric, *_ in worse})
+            print(f"Re-running {', '.join(again)} to confirm: {', '.join(metric for metric, *_ in worse)}")
+            for metric, value in run(again, args.latency_ms / 1000.0, args.repeat, args.scale).items():
+                metrics[metric] = best(metric, [metrics[metric], value])
+    report(metrics, baseline)
+    save(args.output, metrics, args)
+    if args.save_baseline:
+        save(args.save_baseline, metrics, args)
+
+    if baseline:
+        worse = regressions(metrics, baseline, args.threshold)
+        for metric, base, current, change in worse:
+            print(f"REGRESSION {metric}: {base:.2f} -> {current:.2f} ({change * 100:.1f}% worse)")
+        if worse:
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == '__main__':
+    main()
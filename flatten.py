@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent position flattening
+
+flatten() takes every ticker to a zero position in a round trip or two instead
+of one ticker and one order at a time:
+1. cancels the open orders of the tickers (one bulk cancel per ticker, in parallel)
+   so resting quotes cannot rebuild the position
+2. reads the whole position vector from one /v1/securities call (or takes the
+   caller's, if it just read one)
+3. splits each position into MARKET orders of at most `max_order` shares and
+   sends all of them concurrently; each order's send time is reserved from the
+   caller's rate budget up front (`reserve`), so the burst stays within it
+4. re-reads /v1/securities, and repeats from step 3 for whatever is left, up to
+   `rounds` times
+
+Example:
+    residual = flatten(session, ['CRZY', 'TAME'], max_order=5000,
+                       reserve=lambda: order_limiter.reserve('orders'))
+    if any(residual.values()):
+        print("Still open:", residual)
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rit_client import RitApiError
+
+ROUNDS = 2
+
+
+def read_positions(session, tickers):
+    """{ticker: position} for `tickers` from one /v1/securities request."""
+    positions = dict.fromkeys(tickers, 0)
+    for security in session.securities():
+        if security.ticker in positions:
+            positions[security.ticker] = int(security.position or 0)
+    return positions
+
+
+def flatten_orders(positions, max_order):
+    """MARKET orders that bring every position to zero: a list of (ticker, action, quantity)."""
+    orders = []
+    for ticker, position in positions.items():
+        action = 'SELL' if position > 0 else 'BUY'
+        remaining = abs(position)
+        while remaining > 0:
+            quantity = min(remaining, max_order)
+            orders.append((ticker, action, quantity))
+            remaining -= quantity
+    return orders
+
+
+def _send(session, ticker, action, quantity, due):
+    delay = due - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+    try:
+        session.post_order(ticker, 'MARKET', quantity, action)
+    except RitApiError:
+        pass                    # Left in the residual read back afterwards
+
+
+def flatten(session, tickers, max_order, reserve=None, executor=None, cancel_open=True,
+            rounds=ROUNDS, positions=None):
+    """
+    Flattens `tickers` (see the module docstring) and returns the residual
+    {ticker: position} from the last /v1/securities read. `session` is a
+    RitClient. `reserve()` returns the wait in seconds before the next order may
+    be sent (None: no pacing). `executor` runs the concurrent requests (a
+    temporary one is used if None; never pass the executor the caller runs on).
+    `positions` skips the first read when the caller has a fresh position vector.
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max(4, 2 * len(tickers)), thread_name_prefix='flatten')
+    try:
+        if cancel_open:
+            cancels = [executor.submit(session.cancel_orders, ticker=ticker) for ticker in tickers]
+            for future in cancels:
+                try:
+                    future.result()
+                except RitApiError:
+                    pass
+        if positions is None:
+            positions = read_positions(session, tickers)
+        for _ in range(rounds):
+            orders = flatten_orders({t: p for t, p in positions.items() if p}, max_order)
+            if not orders:
+                break
+            now = time.monotonic()
+            jobs = [executor.submit(_send, session, ticker, action, quantity,
+                                    now + (reserve() if reserve is not None else 0.0))
+                    for ticker, action, quantity in orders]
+            for job in jobs:
+                job.result()
+            positions = read_positions(session, tickers)
+        return positions
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False)
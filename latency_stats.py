@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Per-endpoint latency histograms for RIT API calls
+
+instrument(session, stats) wraps a requests.Session so every call it makes is
+timed and recorded under its endpoint ("GET /case", "POST /orders",
+"DELETE /tenders/{id}", ...). Each endpoint keeps a fixed-bucket histogram
+(log-spaced, ~19% resolution from 0.1 ms to 13 s), so recording is a bisect and
+a counter increment and memory does not grow with the number of calls.
+
+Reports:
+- p50 / p90 / p99 / max latency, error (HTTP >= 400 or exception) and 429 counts,
+  requests per second
+- a periodic one-line summary from a background thread (start_reporter), handed
+  to `emit` (a logger method such as log.info, or print)
+- a CSV or Prometheus text dump at shutdown (dump, chosen by file extension)
+
+Example:
+    api_stats = LatencyStats()
+    instrument(session, api_stats)
+    api_stats.start_reporter(10, emit=log.info)
+    ...
+    api_stats.dump('algo2_latency.csv')
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+
+# Bucket upper bounds in seconds: 0.1 ms * 2**(i/4), up to ~13 s
+BUCKET_BOUNDS = [1e-4 * 2 ** (i / 4) for i in range(69)]
+
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+
+def endpoint_name(method, url):
+    """
+    Maps a request to its endpoint label: method plus the path after /v1,
+    with numeric ids collapsed, e.g. ('DELETE', '.../v1/orders/42') -> 'DELETE /orders/{id}'.
+    """
+    path = url.split('?', 1)[0]
+    marker = path.find('/v1/')
+    if marker >= 0:
+        path = path[marker + 3:]
+    return f"{method.upper()} {_ID_SEGMENT.sub('/{id}', path)}"
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with count, sum and max."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)   # Last bucket is overflow
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """
+        Returns the upper bound of the bucket holding the q-th percentile (0-100),
+        capped at the observed max. Returns 0.0 when empty.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                bound = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class EndpointStats:
+    """Histogram plus error and throttle counters for one endpoint."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.throttled = 0
+
+
+class LatencyStats:
+    """
+    Thread-safe registry of EndpointStats keyed by endpoint label.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.start = clock()
+        self.endpoints = {}
+        self.lock = threading.Lock()
+        self._reporter = None
+        self._stop = threading.Event()
+
+    def record(self, endpoint, seconds, status=None):
+        """
+        Records one call. `status` is the HTTP status code, or None if the
+        request raised before a response arrived (counted as an error).
+        """
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.latency.add(seconds)
+            if status is None or status >= 400:
+                stats.errors += 1
+                if status == 429:
+                    stats.throttled += 1
+
+    def rows(self):
+        """
+        Returns one dict per endpoint (sorted by label) with count, errors,
+        throttled, rps and mean/p50/p90/p99/max latency in milliseconds.
+        """
+        elapsed = max(self.clock() - self.start, 1e-9)
+        rows = []
+        with self.lock:
+            for endpoint in sorted(self.endpoints):
+                stats = self.endpoints[endpoint]
+                hist = stats.latency
+                rows.append({
+                    'endpoint': endpoint,
+                    'count': hist.count,
+                    'errors': stats.errors,
+                    'throttled': stats.throttled,
+                    'rps': hist.count / elapsed,
+                    'mean_ms': hist.mean * 1000,
+                    'p50_ms': hist.percentile(50) * 1000,
+                    'p90_ms': hist.percentile(90) * 1000,
+                    'p99_ms': hist.percentile(99) * 1000,
+                    'max_ms': hist.max * 1000,
+                })
+        return rows
+
+    def summary_line(self):
+        """One-line summary: overall req/s, errors, 429s and p50/p99 per endpoint."""
+        rows = self.rows()
+        total = sum(r['count'] for r in rows)
+        rps = sum(r['rps'] for r in rows)
+        errors = sum(r['errors'] for r in rows)
+        throttled = sum(r['throttled'] for r in rows)
+        parts = [f"[latency] {total} calls {rps:.1f} req/s err={errors} 429={throttled}"]
+        for r in rows:
+            parts.append(f"{r['endpoint']} p50={r['p50_ms']:.1f} p99={r['p99_ms']:.1f}ms")
+        return ' | '.join(parts)
+
+    def report(self):
+        """Prints a per-endpoint percentile table."""
+        rows = self.rows()
+        if not rows:
+            print("No API calls recorded.")
+            return
+        print("\n=== API LATENCY (ms) ===")
+        print(f"{'Endpoint':<28}{'Count':>7}{'Err':>5}{'429':>5}{'Req/s':>8}"
+              f"{'p50':>8}{'p90':>8}{'p99':>8}{'Max':>8}")
+        for r in rows:
+            print(f"{r['endpoint']:<28}{r['count']:>7}{r['errors']:>5}{r['throttled']:>5}{r['rps']:>8.1f}"
+                  f"{r['p50_ms']:>8.2f}{r['p90_ms']:>8.2f}{r['p99_ms']:>8.2f}{r['max_ms']:>8.2f}")
+
+    def start_reporter(self, interval, emit=print):
+        """Calls emit(summary_line()) every `interval` seconds from a daemon thread."""
+        if interval <= 0 or self._reporter is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                emit(self.summary_line())
+
+        self._reporter = threading.Thread(target=run, name='latency-reporter', daemon=True)
+        self._reporter.start()
+
+    def stop_reporter(self):
+        self._stop.set()
+
+    def dump(self, path):
+        """
+        Writes the stats to `path`: Prometheus text format for *.prom / *.txt,
+        CSV otherwise.
+        """
+        if path.endswith(('.prom', '.txt')):
+            self.write_prometheus(path)
+        else:
+            self.write_csv(path)
+
+    def write_csv(self, path):
+        columns = ['endpoint', 'count', 'errors', 'throttled', 'rps',
+                   'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms']
+        with open(path, 'w') as f:
+            f.write(','.join(columns) + '\n')
+            for r in self.rows():
+                f.write(','.join([r['endpoint']] + [f"{r[c]:.4f}" if isinstance(r[c], float) else str(r[c])
+                                                   for c in columns[1:]]) + '\n')
+
+    def write_prometheus(self, path):
+        lines = [
+            '# HELP rit_request_duration_seconds RIT API call latency.',
+            '# TYPE rit_request_duration_seconds histogram',
+        ]
+        counters = []
+        with self.lock:
+            for endpoint in sorted(self.endpoints):
+                stats = self.endpoints[endpoint]
+                hist = stats.latency
+                method, path_label = endpoint.split(' ', 1)
+                labels = f'method="{method}",path="{path_label}"'
+                cumulative = 0
+                for bound, n in zip(BUCKET_BOUNDS, hist.counts):
+                    cumulative += n
+                    lines.append(f'rit_request_duration_seconds_bucket{{{labels},le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'rit_request_duration_seconds_bucket{{{labels},le="+Inf"}} {hist.count}')
+                lines.append(f'rit_request_duration_seconds_sum{{{labels}}} {hist.total:.6f}')
+                lines.append(f'rit_request_duration_seconds_count{{{labels}}} {hist.count}')
+                counters.append((labels, stats.errors, stats.throttled))
+        lines.append('# HELP rit_request_errors_total RIT API calls that failed or returned HTTP >= 400.')
+        lines.append('# TYPE rit_request_errors_total counter')
+        lines.extend(f'rit_request_errors_total{{{labels}}} {errors}' for labels, errors, _ in counters)
+        lines.append('# HELP rit_request_throttled_total RIT API calls rejected with HTTP 429.')
+        lines.append('# TYPE rit_request_throttled_total counter')
+        lines.extend(f'rit_request_throttled_total{{{labels}}} {throttled}' for labels, _, throttled in counters)
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+def instrument(session, stats):
+    """
+    Wraps session.request so every call through the session (get/post/delete/...)
+    is timed and recorded in `stats`. Returns the session.
+    """
+    send = session.request
+    clock = stats.clock
+
+    def timed_request(method, url, *args, **kwargs):
+        start = clock()
+        try:
+            resp = send(method, url, *args, **kwargs)
+        except Exception:
+            stats.record(endpoint_name(method, url), clock() - start, None)
+            raise
+        stats.record(endpoint_name(method, url), clock() - start, resp.status_code)
+        return resp
+
+    session.request = timed_request
+    return session
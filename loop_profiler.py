@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Phase profiler for the trading loops
+
+PhaseProfiler times named phases of a loop pass:
+    with profiler.phase('read'):
+        ...
+Phases nest (a phase inside another is recorded under its path, e.g.
+main;quote;place_order;http), each thread keeps its own stack, and every phase
+has a category used for the time breakdown: network, compute or sleep.
+Helpers attach the common ones without touching the call sites:
+- profile_requests(session, profiler): every HTTP call is an 'http' (network) phase
+- profiler.wrap('retry_wait', time.sleep, 'sleep'): any function as a phase
+- @profiler.timed('place_order'): the same, as a decorator
+
+When the profiler is disabled, phase() returns one shared no-op context manager
+and wrap() returns the function unchanged, so the instrumentation costs a method
+call per phase and nothing per request.
+
+Optionally, for the whole case:
+- 'cprofile': cProfile of the thread that called start(), saved as <name>.pstats
+- 'sample': a background thread samples the stacks of every thread each
+  `sample_interval` seconds
+
+At exit, save() prints and writes <name>.txt (per-phase totals, and the loop
+thread's wall time split into network/compute/sleep/unprofiled) and
+<name>.collapsed: flamegraph-compatible collapsed stacks ("a;b;c <count>"), from
+the samples when sampling, else from phase self times in microseconds.
+
+Example (RIT_PROFILE=phases|cprofile|sample, empty = off):
+    profiler = PhaseProfiler(os.environ.get('RIT_PROFILE'))
+    profile_requests(session, profiler)
+    profiler.start()
+    while running:
+        with profiler.phase('read', 'network'):
+            state = read_state()
+        with profiler.phase('sleep', 'sleep'):
+            scheduler.wait(active)
+    profiler.save('algo2_profile')
+"""
+
+import cProfile
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+MODES = ('phases', 'cprofile', 'sample')
+CATEGORIES = ('network', 'compute', 'sleep')
+SAMPLE_INTERVAL = 0.005
+
+_DISABLED = nullcontext()
+
+
+class _Phase:
+    """Context manager for one timed phase (created per use when enabled)."""
+
+    __slots__ = ('profiler', 'name', 'category', 'start', 'child')
+
+    def __init__(self, profiler, name, category):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.child = 0.0
+        self.profiler._stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = self.profiler.local.stack
+        stack.pop()
+        if stack:
+            stack[-1].child += elapsed
+        path = tuple(phase.name for phase in stack) + (self.name,)
+        stats = self.profiler.local.stats
+        entry = stats.get(path)
+        if entry is None:
+            entry = stats[path] = [self.category, 0, 0.0, 0.0, 0.0]
+        entry[1] += 1
+        entry[2] += elapsed
+        entry[3] += elapsed - self.child
+        entry[4] = max(entry[4], elapsed)
+        return False
+
+
+class PhaseProfiler:
+    """
+    Phase timer plus optional whole-case cProfile or stack sampling. `mode` is
+    one of MODES, or None/'' to disable (any other true value means 'phases').
+    """
+
+    def __init__(self, mode=None, sample_interval=SAMPLE_INTERVAL):
+        mode = (mode or '').strip().lower()
+        if mode in ('0', 'off', 'false', 'no'):
+            mode = ''
+        self.enabled = bool(mode)
+        self.mode = mode if mode in MODES else 'phases' if mode else ''
+        self.sample_interval = sample_interval
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.threads = []              # (thread name, stats dict) for every thread that ran a phase
+        self.cprofile = None
+        self.sampler = None
+        self.samples = {}              # Collapsed stack -> sample count
+        self.started = None
+        self.stopped = None
+        self.loop_thread = None
+
+    def _stack(self):
+        try:
+            return self.local.stack
+        except AttributeError:
+            self.local.stack = []
+            self.local.stats = {}
+            with self.lock:
+                self.threads.append((threading.current_thread().name, self.local.stats))
+            return self.local.stack
+
+    def phase(self, name, category='compute'):
+        """Context manager timing `name`; its own time (minus nested phases) counts as `category`."""
+        if not self.enabled:
+            return _DISABLED
+        return _Phase(self, name, category)
+
+    def wrap(self, name, func, category='compute'):
+        """Returns func timed as phase `name` (func itself when disabled)."""
+        if not self.enabled:
+            return func
+
+        def timed(*args, **kwargs):
+            with _Phase(self, name, category):
+                return func(*args, **kwargs)
+
+        timed.__wrapped__ = func
+        return timed
+
+    def timed(self, name, category='compute'):
+        """Decorator form of wrap()."""
+        return lambda func: self.wrap(name, func, category)
+
+    # Whole-case capture
+
+    def start(self):
+        """Starts the case clock (and cProfile or the sampler) from the loop thread."""
+        if not self.enabled:
+            return
+        self.loop_thread = threading.current_thread().name
+        self.started = time.perf_counter()
+        if self.mode == 'cprofile':
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        elif self.mode == 'sample':
+            self.sampler = threading.Thread(target=self._sample, name='profile-sampler', daemon=True)
+            self.sampler.start()
+
+    def stop(self):
+        if not self.enabled or self.stopped is not None or self.started is None:
+            return
+        self.stopped = time.perf_counter()
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        if self.sampler is not None:
+            self.sampler.join()
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {}
+        while self.stopped is None:
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                key = ';'.join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+            time.sleep(self.sample_interval)
+
+    # Reports
+
+    def rows(self):
+        """Per-phase totals merged over threads: (path, category, count, total, self, max)."""
+        merged = {}
+        with self.lock:
+            threads = list(self.threads)
+        for _, stats in threads:
+            for path, (category, count, total, own, longest) in list(stats.items()):
+                row = merged.setdefault(path, [category, 0, 0.0, 0.0, 0.0])
+                row[1] += count
+                row[2] += total
+                row[3] += own
+                row[4] = max(row[4], longest)
+        return sorted(((path,) + tuple(row) for path, row in merged.items()), key=lambda r: -r[3])
+
+    def breakdown(self):
+        """Loop thread wall time split by category, plus 'unprofiled' time outside any phase."""
+        wall = (self.stopped or time.perf_counter()) - self.started
+        split = dict.fromkeys(CATEGORIES, 0.0)
+        with self.lock:
+            threads = [stats for name, stats in self.threads if name == self.loop_thread]
+        for stats in threads:
+            for category, _, _, own, _ in list(stats.values()):
+                split[category] = split.get(category, 0.0) + own
+        split['unprofiled'] = max(0.0, wall - sum(split.values()))
+        return wall, split
+
+    def summary(self):
+        wall, split = self.breakdown()
+        lines = [f"=== LOOP PROFILE ({self.mode}, {wall:.1f}s on {self.loop_thread}) ===",
+                 "  ".join(f"{k} {v:.2f}s ({100 * v / wall:.1f}%)" for k, v in split.items()) if wall else "",
+                 f"{'Phase':<44}{'Kind':>9}{'Count':>8}{'Total s':>10}{'Self s':>9}{'Mean ms':>9}{'Max ms':>9}"]
+        for path, category, count, total, own, longest in self.rows():
+            lines.append(f"{';'.join(path):<44}{category:>9}{count:>8}{total:>10.3f}{own:>9.3f}"
+                         f"{1000 * total / count:>9.2f}{1000 * longest:>9.2f}")
+        return '\n'.join(lines)
+
+    def collapsed(self):
+        """Collapsed stacks: sampled stacks if sampling, else phase self time in microseconds."""
+        if self.samples:
+            return dict(self.samples)
+        stacks = {}
+        with self.lock:
+            threads = list(self.threads)
+        for thread, stats in threads:
+            for path, (_, _, _, own, _) in list(stats.items()):
+                key = ';'.join((thread,) + path)
+                stacks[key] = stacks.get(key, 0) + int(own * 1e6)
+        return stacks
+
+    def save(self, name):
+        """Stops the capture, prints the summary and writes <name>.txt, .collapsed (and .pstats)."""
+        if not self.enabled or self.started is None:
+            return
+        self.stop()
+        summary = self.summary()
+        print(summary)
+        with open(name + '.txt', 'w') as f:
+            f.write(summary + '\n')
+        with open(name + '.collapsed', 'w') as f:
+            for stack, count in sorted(self.collapsed().items()):
+                if count > 0:
+                    f.write(f"{stack} {count}\n")
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(name + '.pstats')
+
+
+def profile_requests(session, profiler):
+    """
+    Wraps session.request so every call through the session is timed as an
+    'http' network phase. Does nothing when the profiler is disabled. Returns the session.
+    """
+    if profiler.enabled:
+        session.request = profiler.wrap('http', session.request, 'network')
+    return session
@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel parameter sweep for the LT3 tender thresholds
+
+Replays a recorded case (per-tick prices for each ticker plus the tender stream)
+through the LT3 decision and unwind rules for every combination of
+PRICE_THRESHOLD, COMMISSION, UNWIND_CHUNK and LAST_SECONDS, and prints the
+combinations ranked by P&L.
+
+Replay model (one case, ticks 6..294, STEPS_PER_TICK unwind steps per tick):
+- Only last prices are recorded, so each tick's book is synthetic: the best
+  bid/ask sit HALF_SPREAD from last and every share deeper in the book costs
+  another 2 * IMPACT_PER_SHARE, so filling q shares averages IMPACT_PER_SHARE * q
+  worse than the touch. The book refills between steps.
+- Outstanding tenders are evaluated every tick: declined inside the last
+  LAST_SECONDS, accepted when the edge versus LT3's reference price is at least
+  PRICE_THRESHOLD (best tender per ticker first; others wait, as in LT3). With
+  TENDER_PRICING = "BOOK" the reference is the VWAP of unwinding the whole tender
+  against the book, otherwise the last price.
+- Before an accept, any position in that ticker is flattened with UNWIND_CHUNK
+  MARKET orders.
+- After an accept, each step posts one LIMIT order sized, as in LT3, from the
+  book depth at or better than the tender price +/- COMMISSION, capped at
+  MAX_LIMIT_CHUNK and skipped while that depth is below MIN_LIMIT_CHUNK (or the
+  whole position, if smaller). After UNWIND_DEADLINE_TICKS or inside the last
+  LAST_SECONDS it falls back to UNWIND_CHUNK MARKET orders, as LT3's unwinder does.
+  UNWIND_CHUNK therefore only sizes MARKET orders.
+- LT3's TENDER_PRICING, UNWIND_DEADLINE_TICKS, MIN_LIMIT_CHUNK and MAX_LIMIT_CHUNK
+  are read from the loaded script (lt3_rules), not swept.
+- Every trade pays `fee` per share; the case ends with open positions marked at
+  the final last price.
+
+The combinations are spread over a ProcessPoolExecutor on all cores. The market
+data lives in multiprocessing.shared_memory blocks; workers attach to them by
+name once at start-up and each converts them once to the lists the replay
+indexes (one private copy per worker), so each task only carries its slice of
+the parameter grid.
+
+Example:
+    python lt3_sweep.py case.json --thresholds 0.01:0.15:0.01 --chunks 500:5000:500
+    python lt3_sweep.py --mock-seed 3 --save-case case.json
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from script_loader import LT3_SCRIPT, load_script
+
+FIRST_TICK = 6               # LT3 trades while 5 < tick < 295
+LAST_TICK = 294
+CASE_TICKS = 300
+STEPS_PER_TICK = 5           # Unwind steps per tick (SLEEP_TIME = 0.2 on a 1 s tick)
+HALF_SPREAD = 0.01           # Bid/ask assumed at last -/+ HALF_SPREAD
+IMPACT_PER_SHARE = 2e-6      # Extra price concession per share of order size
+FEE = 0.02                   # Per-share cost of every trade
+
+# Tender record layout shared with the workers
+TENDER_DTYPE = np.dtype([('tick', 'i4'), ('expires', 'i4'), ('ticker', 'i4'),
+                         ('side', 'i4'), ('quantity', 'f8'), ('price', 'f8')])
+RESULT_FIELDS = ('pnl', 'accepted', 'declined', 'max_position', 'end_position')
+# LT3 settings the replay follows but does not sweep
+RULE_NAMES = ('TENDER_PRICING', 'UNWIND_DEADLINE_TICKS', 'MIN_LIMIT_CHUNK', 'MAX_LIMIT_CHUNK')
+
+
+def lt3_rules(lt3):
+    """{name: value} of the RULE_NAMES settings of a loaded LT3 script."""
+    return {name: getattr(lt3, name) for name in RULE_NAMES}
+
+
+# -------------------------------------------------------------------------------------
+# Recorded Case
+# -------------------------------------------------------------------------------------
+
+class CaseData:
+    """
+    One recorded case: `last` is a (tickers x ticks) array of last prices indexed
+    by tick number, `tenders` a TENDER_DTYPE array sorted by arrival tick.
+    """
+
+    def __init__(self, tickers, last, tenders):
+        self.tickers = list(tickers)
+        self.last = np.ascontiguousarray(last, dtype=float)
+        self.tenders = np.ascontiguousarray(tenders, dtype=TENDER_DTYPE)
+        self.lists = None
+
+    def as_lists(self):
+        """
+        (last, tenders) as plain Python lists, which index much faster than NumPy
+        scalars in the replay's per-step loop. Converted on the first call only.
+        """
+        if self.lists is None:
+            self.lists = (self.last.tolist(), self.tenders.tolist())
+        return self.lists
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        From {"history": {ticker: [candles]}, "tenders": [tender dicts]}, using the
+        API's field names for both.
+        """
+        tickers = sorted(data['history'])
+        last = np.zeros((len(tickers), CASE_TICKS + 1))
+        for i, ticker in enumerate(tickers):
+            candles = sorted(data['history'][ticker], key=lambda c: c['tick'])
+            ticks = np.array([c['tick'] for c in candles])
+            closes = np.array([c['close'] for c in candles], dtype=float)
+            # Carry the last close forward across ticks without a candle
+            idx = np.searchsorted(ticks, np.arange(CASE_TICKS + 1), side='right') - 1
+            last[i] = closes[np.clip(idx, 0, None)]
+        index = {t: i for i, t in enumerate(tickers)}
+        tenders = np.array(sorted(
+            ((t['tick'], t['expires'], index[t['ticker']], 1 if t['action'] == 'BUY' else -1,
+              t['quantity'], t['price']) for t in data['tenders'] if t['ticker'] in index)),
+            dtype=TENDER_DTYPE)
+        return cls(tickers, last, tenders)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_json(json.load(f))
+
+
+def record_mock_case(seed=1, tender_interval=10, ticks=CASE_TICKS):
+    """
+    Plays one case of rit_mock_server's simulated market tick by tick and records
+    the candles and every tender it issues. Returns the JSON-style dict.
+    """
+    from rit_mock_server import MockExchange
+
+    now = [0.0]
+    exchange = MockExchange(tick_seconds=1.0, start_tick=1, ticks_per_period=ticks, seed=seed,
+                            tender_interval=tender_interval, clock=lambda: now[0])
+    tenders = {}
+    for tick in range(1, ticks):
+        now[0] = float(tick)
+        for tender in exchange.get_tenders():
+            tenders.setdefault(tender['tender_id'], tender)
+    now[0] = float(ticks)
+    history = {ticker: exchange.get_history(ticker) for ticker in exchange.tender_tickers}
+    return {'history': history, 'tenders': list(tenders.values())}
+
+
+# -------------------------------------------------------------------------------------
+# Shared Memory
+# -------------------------------------------------------------------------------------
+
+class SharedCase:
+    """Copies a CaseData into shared memory blocks that worker processes attach to."""
+
+    def __init__(self, case, rules):
+        self.blocks = []
+        self.spec = {'tickers': case.tickers, 'rules': rules}
+        for name, array in (('last', case.last), ('tenders', case.tenders)):
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.spec[name] = (block.name, array.shape, array.dtype)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+
+_worker_case = None
+_worker_rules = None
+_worker_blocks = []
+
+
+def _attach(spec):
+    """
+    Process-pool initializer: maps the shared blocks into this worker, then
+    copies them once into the lists the replay indexes, for all of the worker's
+    tasks.
+    """
+    global _worker_case, _worker_rules
+    arrays = {}
+    for name in ('last', 'tenders'):
+        block_name, shape, dtype = spec[name]
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype, buffer=block.buf)
+    _worker_case = CaseData.__new__(CaseData)
+    _worker_case.tickers = spec['tickers']
+    _worker_case.last = arrays['last']
+    _worker_case.tenders = arrays['tenders']
+    _worker_case.lists = None
+    _worker_case.as_lists()
+    _worker_rules = spec['rules']
+
+
+def _run_chunk(params):
+    """Worker task: simulates a (k x 4) block of parameter rows against the shared case."""
+    return np.array([simulate_lt3(_worker_case, *row, rules=_worker_rules) for row in params])
+
+
+# -------------------------------------------------------------------------------------
+# LT3 Replay
+# -------------------------------------------------------------------------------------
+
+def simulate_lt3(case, threshold, commission, chunk, last_seconds, rules,
+                 fee=FEE, half_spread=HALF_SPREAD, impact=IMPACT_PER_SHARE):
+    """
+    Replays the case through the LT3 rules for one parameter set; `rules` holds
+    LT3's RULE_NAMES settings (lt3_rules). Returns (pnl, accepted, declined,
+    max_position, end_position).
+    """
+    last, tenders = case.as_lists()
+    n_tickers = len(last)
+    chunk = max(int(chunk), 1)
+    cutoff = CASE_TICKS - last_seconds
+    book_pricing = rules['TENDER_PRICING'] == 'BOOK'
+    deadline_ticks = rules['UNWIND_DEADLINE_TICKS']
+    min_limit = rules['MIN_LIMIT_CHUNK']
+    max_limit = rules['MAX_LIMIT_CHUNK']
+
+    position = [0.0] * n_tickers
+    cost = [0.0] * n_tickers              # Tender price being unwound
+    deadline = [None] * n_tickers         # Tick of MARKET fallback, None = no LIMIT unwind
+    cash = 0.0
+    accepted = declined = 0
+    max_position = 0.0
+    pending = []
+    next_tender = 0
+
+    def trade(i, qty, price):
+        """Trade of signed qty that walks the book from `price` (the touch), with fee."""
+        nonlocal cash
+        fill = price + impact * abs(qty) * (1 if qty > 0 else -1)
+        position[i] += qty
+        cash -= qty * fill + fee * abs(qty)
+
+    def flatten(i, px):
+        """Takes position i to 0 with `chunk`-sized MARKET orders."""
+        while position[i] != 0:
+            pos = position[i]
+            qty = min(chunk, abs(pos))
+            trade(i, -qty if pos > 0 else qty, px - half_spread if pos > 0 else px + half_spread)
+
+    def depth_within(touch, bound):
+        """Shares between the touch and `bound` (inclusive) on one side of the synthetic book."""
+        if touch < bound:
+            return 0
+        return int((touch - bound) / (2 * impact)) if impact > 0 else float('inf')
+
+    for tick in range(FIRST_TICK, LAST_TICK + 1):
+        while next_tender < len(tenders) and tenders[next_tender][0] <= tick:
+            pending.append(tenders[next_tender])
+            next_tender += 1
+
+        # Tender decisions: one pass over everything outstanding
+        best = {}
+        still_pending = []
+        for t in pending:
+            _, expires, i, side, quantity, price = t
+            if expires <= tick:
+                continue
+            px = last[i][tick]
+            if book_pricing:
+                # After a BUY tender we sell into the bids, after a SELL tender we buy from the asks
+                px += -(half_spread + impact * quantity) if side > 0 else half_spread + impact * quantity
+            edge = (px - price) if side > 0 else (price - px)
+            if tick >= cutoff or edge < threshold:
+                declined += 1
+                continue
+            if i not in best or edge > best[i][0]:
+                if i in best:
+                    still_pending.append(best[i][1])
+                best[i] = (edge, t)
+            else:
+                still_pending.append(t)
+        pending = still_pending
+        for i, (_, t) in best.items():
+            _, _, _, side, quantity, price = t
+            flatten(i, last[i][tick])
+            position[i] += side * quantity
+            cash -= side * quantity * price
+            cost[i] = price
+            deadline[i] = min(tick + deadline_ticks, cutoff)
+            accepted += 1
+
+        # Unwind steps
+        for i in range(n_tickers):
+            if position[i] == 0:
+                deadline[i] = None
+                continue
+            px = last[i][tick]
+            bid, ask = px - half_spread, px + half_spread
+            for _ in range(STEPS_PER_TICK):
+                pos = position[i]
+                if pos == 0:
+                    break
+                if deadline[i] is None or tick >= deadline[i]:
+                    qty = min(chunk, abs(pos))
+                    trade(i, -qty if pos > 0 else qty, bid if pos > 0 else ask)
+                    continue
+                if pos > 0:
+                    available = depth_within(bid, cost[i] + commission)
+                else:
+                    available = depth_within(-ask, -(cost[i] - commission))
+                if available < min(abs(pos), min_limit):
+                    break
+                qty = min(abs(pos), available, max_limit)
+                trade(i, -qty if pos > 0 else qty, bid if pos > 0 else ask)
+            max_position = max(max_position, abs(position[i]))
+
+    pnl = cash + sum(position[i] * last[i][CASE_TICKS] for i in range(n_tickers))
+    return pnl, accepted, declined, max_position, float(sum(abs(p) for p in position))
+
+
+# -------------------------------------------------------------------------------------
+# Sweep
+# -------------------------------------------------------------------------------------
+
+def param_grid(thresholds, commissions, chunks, last_seconds):
+    """Cartesian product as an (n x 4) array of threshold, commission, chunk, last_seconds."""
+    mesh = np.meshgrid(np.asarray(thresholds, dtype=float), np.asarray(commissions, dtype=float),
+                       np.asarray(chunks, dtype=float), np.asarray(last_seconds, dtype=float),
+                       indexing='ij')
+    return np.stack([axis.ravel() for axis in mesh], axis=1)
+
+
+def sweep(case, grid, rules, workers=None, chunk_size=None):
+    """
+    Runs every row of `grid` on a process pool sharing `case` through shared memory,
+    following LT3's `rules` (lt3_rules). Returns an (n x 5) array of RESULT_FIELDS
+    in grid order.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, -(-len(grid) // (workers * 4)))
+    blocks = [grid[i:i + chunk_size] for i in range(0, len(grid), chunk_size)]
+    shared = SharedCase(case, rules)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=(shared.spec,)) as pool:
+            results = list(pool.map(_run_chunk, blocks))
+    finally:
+        shared.close()
+    return np.concatenate(results) if results else np.empty((0, len(RESULT_FIELDS)))
+
+
+def ranked_rows(grid, results, top=None):
+    """Joins parameters and results into dicts, best P&L first."""
+    order = np.argsort(-results[:, 0], kind='stable')[:top]
+    names = ('threshold', 'commission', 'chunk', 'last_seconds') + RESULT_FIELDS
+    return [dict(zip(names, np.concatenate([grid[i], results[i]]).tolist())) for i in order]
+
+
+# -------------------------------------------------------------------------------------
+# Command Line
+# -------------------------------------------------------------------------------------
+
+def _values(text, cast=float):
+    """Parses 'a,b,c' or 'start:stop:step' (stop inclusive)."""
+    if ':' in text:
+        start, stop, step = (float(x) for x in text.split(':'))
+        return [cast(round(v, 10)) for v in np.arange(start, stop + step / 2, step)]
+    return [cast(v) for v in text.split(',')]
+
+
+def main():
+    lt3 = load_script(LT3_SCRIPT)
+    parser = argparse.ArgumentParser(description="Parallel LT3 tender-threshold sweep")
+    parser.add_argument('case', nargs='?', help='JSON {"history": {ticker: candles}, "tenders": [...]}')
+    parser.add_argument('--mock-seed', type=int, help="record a case from rit_mock_server instead of a file")
+    parser.add_argument('--tender-interval', type=int, default=10, help="tender spacing for --mock-seed")
+    parser.add_argument('--save-case', help="write the case used to this JSON file")
+    parser.add_argument('--thresholds', default='0.01:0.15:0.01')
+    parser.add_argument('--commissions', default=str(lt3.COMMISSION))
+    parser.add_argument('--chunks', default='500:5000:500')
+    parser.add_argument('--last-seconds', default=str(lt3.LAST_SECONDS))
+    parser.add_argument('--workers', type=int, help="processes (default: all cores)")
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    if args.case:
+        with open(args.case) as f:
+            data = json.load(f)
+    else:
+        data = record_mock_case(args.mock_seed or 1, args.tender_interval)
+    if args.save_case:
+        with open(args.save_case, 'w') as f:
+            json.dump(data, f)
+    case = CaseData.from_json(data)
+
+    grid = param_grid(_values(args.thresholds), _values(args.commissions),
+                      _values(args.chunks, int), _values(args.last_seconds, int))
+    start = time.perf_counter()
+    results = sweep(case, grid, lt3_rules(lt3), args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"Swept {len(grid)} combinations over {case.tenders.size} tenders in {elapsed:.2f} s "
+          f"({args.workers or os.cpu_count()} workers)")
+    print(f"{'Thresh':>7}{'Comm':>6}{'Chunk':>7}{'LastS':>6}{'P&L':>12}{'Acc':>5}{'Dec':>5}{'MaxPos':>8}{'EndPos':>8}")
+    for row in ranked_rows(grid, results, args.top):
+        print(f"{row['threshold']:>7.2f}{row['commission']:>6.2f}{row['chunk']:>7.0f}{row['last_seconds']:>6.0f}"
+              f"{row['pnl']:>12.2f}{row['accepted']:>5.0f}{row['declined']:>5.0f}"
+              f"{row['max_position']:>8.0f}{row['end_position']:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
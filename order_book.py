@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Full-depth order book analytics
+
+Parses a /v1/securities/book response once into NumPy price and remaining-size
+arrays (bids best-first, asks best-first) and answers depth questions with
+vectorized operations instead of Python loops over the book:
+- cumulative depth per level
+- VWAP to fill N shares (walking the book)
+- impact cost of N shares versus the mid price
+- shares available at or better than a limit price, and the sweep price for N shares
+
+"action" is always the action of the order we would send: a BUY walks the asks,
+a SELL walks the bids.
+
+Example:
+    book = OrderBook.from_json(session.get(f"{BASE_URL}/securities/book",
+                                           params={"ticker": "CRZY", "limit": 100}).json())
+    vwap, filled = book.vwap_to_fill("SELL", 10000)
+"""
+
+import numpy as np
+
+
+def _side_arrays(orders):
+    """Returns (prices, remaining sizes) arrays for one side of a book response."""
+    if not orders:
+        return np.empty(0), np.empty(0)
+    levels = np.array([(o["price"], o["quantity"] - o.get("quantity_filled", 0)) for o in orders],
+                      dtype=float)
+    return levels[:, 0], levels[:, 1]
+
+
+class OrderBook:
+    """Both sides of one ticker's book as NumPy arrays, best level first."""
+
+    def __init__(self, bid_prices, bid_sizes, ask_prices, ask_sizes):
+        self.bid_prices = bid_prices
+        self.bid_sizes = bid_sizes
+        self.ask_prices = ask_prices
+        self.ask_sizes = ask_sizes
+
+    @classmethod
+    def from_json(cls, book):
+        bid_prices, bid_sizes = _side_arrays(book.get("bids", []))
+        ask_prices, ask_sizes = _side_arrays(book.get("asks", []))
+        return cls(bid_prices, bid_sizes, ask_prices, ask_sizes)
+
+    @property
+    def best_bid(self):
+        return float(self.bid_prices[0]) if self.bid_prices.size else None
+
+    @property
+    def best_ask(self):
+        return float(self.ask_prices[0]) if self.ask_prices.size else None
+
+    @property
+    def mid(self):
+        if self.bid_prices.size and self.ask_prices.size:
+            return float(self.bid_prices[0] + self.ask_prices[0]) / 2.0
+        return None
+
+    def side(self, action):
+        """(prices, sizes) an order with `action` would trade against."""
+        if action.upper() == "BUY":
+            return self.ask_prices, self.ask_sizes
+        return self.bid_prices, self.bid_sizes
+
+    def cumulative_depth(self, action):
+        """Cumulative shares available through each level for `action`."""
+        return np.cumsum(self.side(action)[1])
+
+    def fill_sizes(self, action, quantity):
+        """Shares taken from each level when filling `quantity` by walking the book."""
+        sizes = self.side(action)[1]
+        before = np.cumsum(sizes) - sizes
+        return np.clip(quantity - before, 0.0, sizes)
+
+    def vwap_to_fill(self, action, quantity, extrapolate=False):
+        """
+        Average price of filling `quantity` shares against the book.
+        Returns (vwap, filled). If the visible book is too thin, `filled` is less than
+        `quantity`; with extrapolate=True the remainder is priced at the worst visible
+        level and `filled` is reported as `quantity`. Returns (None, 0) for an empty side.
+        """
+        prices = self.side(action)[0]
+        if not prices.size or quantity <= 0:
+            return None, 0
+        take = self.fill_sizes(action, quantity)
+        filled = float(take.sum())
+        notional = float(take @ prices)
+        if extrapolate and filled < quantity:
+            notional += (quantity - filled) * float(prices[-1])
+            filled = float(quantity)
+        return notional / filled, int(filled)
+
+    def impact_cost(self, action, quantity, extrapolate=True):
+        """
+        Per-share cost of filling `quantity` versus the mid price (positive = worse than mid).
+        Returns None if either side of the book is empty.
+        """
+        mid = self.mid
+        vwap, filled = self.vwap_to_fill(action, quantity, extrapolate)
+        if mid is None or vwap is None:
+            return None
+        return vwap - mid if action.upper() == "BUY" else mid - vwap
+
+    def depth_within(self, action, limit_price):
+        """Shares available at `limit_price` or better for an order with `action`."""
+        prices, sizes = self.side(action)
+        if action.upper() == "BUY":
+            return int(sizes[prices <= limit_price].sum())
+        return int(sizes[prices >= limit_price].sum())
+
+    def sweep_price(self, action, quantity):
+        """Worst price touched when filling `quantity` (the limit price that fills it at once)."""
+        prices = self.side(action)[0]
+        if not prices.size:
+            return None
+        levels = np.searchsorted(self.cumulative_depth(action), quantity)
+        return float(prices[min(levels, prices.size - 1)])
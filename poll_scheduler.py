@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Tick-aligned adaptive polling for the trading loops
+
+PollScheduler replaces a fixed sleep between loop passes:
+- While something needs watching (open orders, pending tenders, running unwinds)
+  the loop polls every `active_interval`.
+- When idle, the interval doubles each pass from `idle_interval` up to
+  `max_idle`, but never sleeps past the next tick boundary: the wake-up is
+  aligned to just after the tick changes, when new prices and tenders appear.
+- Every request made through the session (count_requests) is charged to one
+  requests-per-second token bucket, so all periodic work of the loop shares a
+  single budget; a pass that spent more than its share waits longer.
+
+Tick boundaries are learned from the ticks reported by /v1/case: every
+observation says the reported tick has started and the next one has not, which
+bounds the tick phase to a window. The windows are intersected, and while the
+window is still wide the idle wake-ups land in its middle, so each observation
+halves it until the phase is known to within `align_offset`.
+
+Example:
+    scheduler = PollScheduler(rps=20, tick_seconds=1.0, active_interval=0.05, idle_interval=0.2)
+    count_requests(session, scheduler)
+    while running:
+        tick = get_tick(session)
+        scheduler.observe_tick(tick)
+        ...
+        scheduler.wait(active=bool(open_orders))
+"""
+
+import threading
+import time
+
+from rate_limiter import TokenBucket
+
+
+class PollScheduler:
+    """Computes and sleeps the delay before the next loop pass."""
+
+    def __init__(self, rps, tick_seconds=1.0, active_interval=0.05, idle_interval=0.2,
+                 max_idle=1.0, align_offset=0.02, clock=time.monotonic, sleep=time.sleep):
+        self.budget = TokenBucket(rps, max(1, int(rps)), clock)
+        self.tick_seconds = tick_seconds
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        self.max_idle = max_idle
+        self.align_offset = align_offset
+        self.clock = clock
+        self.sleep = sleep
+
+        self.idle_passes = 0
+        self.used = 0                # Requests since the last wait()
+        self.lock = threading.Lock()
+        self.phase_lo = None         # Window for the clock time at which tick 0 started
+        self.phase_hi = None
+
+    def charge(self, requests=1):
+        """Counts requests against the budget (settled at the next wait() or settle())."""
+        with self.lock:
+            self.used += requests
+
+    def settle(self):
+        """
+        Charges the requests counted since the last wait()/settle() to the budget.
+        Returns how long to wait before the next request to stay within it.
+        """
+        with self.lock:
+            used, self.used = self.used, 0
+        return self.budget.reserve(used) if used else 0.0
+
+    def observe_tick(self, tick):
+        """Feeds a tick just read from /v1/case and narrows the tick phase window."""
+        now = self.clock()
+        # `tick` started no later than now; tick + 1 had not started yet
+        lo = now - (tick + 1) * self.tick_seconds
+        hi = now - tick * self.tick_seconds
+        if self.phase_lo is None or hi < self.phase_lo or lo > self.phase_hi:
+            self.phase_lo, self.phase_hi = lo, hi           # First window, or the clock drifted
+        else:
+            self.phase_lo, self.phase_hi = max(self.phase_lo, lo), min(self.phase_hi, hi)
+
+    def next_boundary(self):
+        """
+        Clock time of the next idle wake-up aligned to the tick: just after the next
+        tick starts once the phase is known, the middle of the phase window before
+        that. None before the first observation.
+        """
+        if self.phase_hi is None:
+            return None
+        if self.phase_hi - self.phase_lo <= 2 * self.align_offset:
+            target = self.phase_hi + self.align_offset
+        else:
+            target = (self.phase_lo + self.phase_hi) / 2
+        now = self.clock()
+        ticks = int((now - target) // self.tick_seconds) + 1
+        return target + ticks * self.tick_seconds
+
+    def delay(self, active):
+        """Seconds to wait before the next pass, before the request budget is applied."""
+        if active:
+            self.idle_passes = 0
+            return self.active_interval
+        delay = min(self.idle_interval * 2 ** self.idle_passes, self.max_idle)
+        self.idle_passes += 1
+        boundary = self.next_boundary()
+        if boundary is not None:
+            delay = min(delay, boundary - self.clock())
+        return max(delay, 0.0)
+
+    def wait(self, active):
+        """
+        Sleeps until the next pass: the adaptive delay, or longer if the requests
+        made since the last call exceeded the rps budget. Returns the time slept.
+        """
+        debt = self.settle()
+        wait = max(self.delay(active), debt)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+
+def count_requests(session, scheduler):
+    """
+    Wraps session.request so every call through the session is charged to
+    `scheduler`'s request budget. Returns the session.
+    """
+    send = session.request
+
+    def counted_request(method, url, *args, **kwargs):
+        scheduler.charge()
+        return send(method, url, *args, **kwargs)
+
+    session.request = counted_request
+    return session
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Token-bucket order rate limiter
+
+Replaces the cumulative-average speed bump. Each bucket refills at `rate` tokens
+per second up to `burst` tokens, on a monotonic clock. A request takes a token
+before it is sent; when the bucket is empty the caller waits exactly until its
+token is due, so sustained throughput stays pinned at `rate` with no overshoot
+and no idle gaps, whatever the individual transaction times are.
+
+Tokens are reserved under a lock and the wait happens outside it, so threads
+sharing one limiter are served in arrival order.
+
+Example (5 orders/sec, no bursts, separate budget for cancels):
+    limiter = RateLimiter({'orders': (5, 1), 'cancel': (5, 1)})
+    limiter.acquire('orders')
+    session.post(f'{BASE_URL}/orders', params=payload)
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Single token bucket. `rate` is tokens per second, `burst` the bucket size.
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.clock = clock
+        self.tokens = float(burst)
+        self.stamp = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def reserve(self, tokens=1):
+        """
+        Takes `tokens` now (possibly going into debt) and returns how long the
+        caller must wait before using them.
+        """
+        with self.lock:
+            self._refill(self.clock())
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def set_rate(self, rate):
+        """Changes the refill rate from now on (tokens already accrued are kept)."""
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        with self.lock:
+            self._refill(self.clock())
+            self.rate = float(rate)
+
+    def penalize(self, wait):
+        """
+        Empties the bucket so that the next token is not due for `wait` seconds,
+        e.g. after the server rejected a request with a retry hint.
+        """
+        with self.lock:
+            self._refill(self.clock())
+            self.tokens = min(self.tokens, 1.0 - wait * self.rate)
+
+    def try_acquire(self, tokens=1):
+        """Takes `tokens` only if they are available right now. Returns True on success."""
+        with self.lock:
+            self._refill(self.clock())
+            if self.tokens < tokens:
+                return False
+            self.tokens -= tokens
+            return True
+
+    def acquire(self, tokens=1):
+        """Blocks until `tokens` are available. Returns the time waited in seconds."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """
+    Per-endpoint token buckets plus an optional overall budget.
+
+    `endpoints` maps an endpoint name to (rate, burst); `total` is an optional
+    (rate, burst) shared by every acquire, including endpoints without their own
+    budget. Endpoints that have no budget and no total are not limited.
+    """
+
+    def __init__(self, endpoints=None, total=None, clock=time.monotonic):
+        self.clock = clock
+        self.buckets = {name: TokenBucket(rate, burst, clock)
+                        for name, (rate, burst) in (endpoints or {}).items()}
+        self.total = TokenBucket(total[0], total[1], clock) if total else None
+
+    def reserve(self, endpoint=None, tokens=1):
+        """Reserves tokens on every applicable bucket. Returns the wait in seconds."""
+        wait = 0.0
+        bucket = self.buckets.get(endpoint)
+        if bucket is not None:
+            wait = bucket.reserve(tokens)
+        if self.total is not None:
+            wait = max(wait, self.total.reserve(tokens))
+        return wait
+
+    def acquire(self, endpoint=None, tokens=1):
+        """Blocks until the request may be sent. Returns the time waited in seconds."""
+        wait = self.reserve(endpoint, tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
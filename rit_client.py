@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Typed RIT REST client shared by the trading scripts
+
+RitClient is a requests.Session with the API key header and an explicitly
+sized keep-alive pool, so it drops in wherever the scripts used a plain
+session (session.get/post/delete, latency_stats.instrument and
+session_recorder.record_session keep working). On top of that it has typed
+calls for the hot endpoints:
+- response bodies are decoded straight from bytes with orjson when it is
+  installed (the standard json module otherwise), skipping requests' charset
+  detection in resp.json()
+- orders, securities, book levels and tenders come back as __slots__ records
+  (Order, Security, BookLevel, Tender): attribute access instead of dict
+  lookups with .get(), and no per-instance __dict__
+- failed calls raise RitApiError with the HTTP status and the API's error message
+
+Example:
+    with RitClient(BASE_URL, {"X-API-Key": "..."}, pool_size=8) as client:
+        tick = client.tick()
+        for order in client.orders("TRANSACTED", "ALGO"):
+            print(order.order_id, order.action, order.quantity_filled)
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    import json
+    loads = json.loads
+
+POOL_SIZE = 8
+
+
+class RitApiError(Exception):
+    """A non-2xx API response."""
+
+    def __init__(self, status, code=None, message=None):
+        super().__init__(f"{status} {code or ''} {message or ''}".strip())
+        self.status = status
+        self.code = code
+        self.message = message
+
+    @classmethod
+    def from_response(cls, resp):
+        try:
+            body = loads(resp.content)
+        except ValueError:
+            body = None
+        if isinstance(body, dict):
+            return cls(resp.status_code, body.get('code'), body.get('message'))
+        return cls(resp.status_code, None, resp.reason)
+
+
+# -------------------------------------------------------------------------------------
+# Records
+# -------------------------------------------------------------------------------------
+
+def _compile_from_json(cls, fields):
+    """
+    Builds cls.from_json as straight-line code (one assignment per field, as
+    namedtuple does) instead of a setattr loop; that keeps record construction
+    cheaper than the dict lookups it replaces.
+    """
+    lines = ["def from_json(data):", "    record = new(cls)", "    get = data.get"]
+    lines += [f"    record.{name} = get({name!r})" for name in fields]
+    lines.append("    return record")
+    namespace = {'new': object.__new__, 'cls': cls}
+    exec('\n'.join(lines), namespace)
+    return staticmethod(namespace['from_json'])
+
+
+class Record:
+    """Base for the response records: one slot per API field, missing fields are None."""
+
+    __slots__ = ()
+    fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.fields = cls.fields + cls.__dict__.get('__slots__', ())
+        cls.from_json = _compile_from_json(cls, cls.fields)
+
+    @classmethod
+    def list_from_json(cls, items):
+        from_json = cls.from_json
+        return [from_json(item) for item in items]
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.fields}
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.fields)
+        return f"{type(self).__name__}({fields})"
+
+
+class Order(Record):
+    __slots__ = ('order_id', 'period', 'tick', 'trader_id', 'ticker', 'type', 'quantity',
+                 'action', 'price', 'quantity_filled', 'vwap', 'status')
+
+    @property
+    def remaining(self):
+        return (self.quantity or 0) - (self.quantity_filled or 0)
+
+
+class BookLevel(Order):
+    """One resting order in a /securities/book response."""
+
+    __slots__ = ()
+
+
+class Security(Record):
+    __slots__ = ('ticker', 'type', 'position', 'vwap', 'nlv', 'last', 'bid', 'bid_size',
+                 'ask', 'ask_size', 'volume', 'unrealized', 'realized', 'total_volume',
+                 'is_tradeable', 'is_shortable')
+
+
+class Tender(Record):
+    __slots__ = ('tender_id', 'period', 'tick', 'expires', 'caption', 'quantity', 'action',
+                 'is_fixed_bid', 'price', 'ticker')
+
+
+# -------------------------------------------------------------------------------------
+# Client
+# -------------------------------------------------------------------------------------
+
+class RitClient(requests.Session):
+    """
+    requests.Session bound to one RIT API base URL, with typed calls.
+    `api_key` is the header dict, e.g. {"X-API-Key": "..."}.
+    """
+
+    def __init__(self, base_url, api_key=None, pool_size=POOL_SIZE):
+        super().__init__()
+        self.base_url = base_url.rstrip('/')
+        if api_key:
+            self.headers.update(api_key)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def call(self, method, path, params=None):
+        """Sends one request and returns the decoded body. Raises RitApiError on failure."""
+        resp = self.request(method, self.base_url + path, params=params)
+        if not resp.ok:
+            raise RitApiError.from_response(resp)
+        return loads(resp.content) if resp.content else None
+
+    def get_json(self, path, **params):
+        """GET with query parameters (None values dropped), decoded."""
+        return self.call('GET', path, {k: v for k, v in params.items() if v is not None})
+
+    # Reads
+
+    def tick(self):
+        return self.get_json('/case')['tick']
+
+    def securities(self, ticker=None):
+        return Security.list_from_json(self.get_json('/securities', ticker=ticker))
+
+    def orders(self, status='OPEN', ticker=None):
+        return Order.list_from_json(self.get_json('/orders', status=status, ticker=ticker))
+
+    def book_levels(self, ticker, limit=20):
+        """Returns (bids, asks) as BookLevel lists, best level first."""
+        book = self.get_json('/securities/book', ticker=ticker, limit=limit)
+        return BookLevel.list_from_json(book.get('bids', [])), BookLevel.list_from_json(book.get('asks', []))
+
+    def tenders(self):
+        return Tender.list_from_json(self.get_json('/tenders'))
+
+    # Writes
+
+    def post_order(self, ticker, order_type, quantity, action, price=None):
+        params = {'ticker': ticker, 'type': order_type, 'quantity': quantity, 'action': action}
+        if price is not None:
+            params['price'] = price
+        return Order.from_json(self.call('POST', '/orders', params))
+
+    def cancel_order(self, order_id):
+        return self.call('DELETE', f'/orders/{order_id}')
+
+    def cancel_orders(self, ids=None, ticker=None, all_orders=False):
+        """Bulk cancel; returns the cancelled order ids."""
+        params = {}
+        if all_orders:
+            params['all'] = 1
+        if ticker:
+            params['ticker'] = ticker
+        if ids:
+            params['ids'] = ','.join(str(i) for i in ids)
+        return self.call('POST', '/commands/cancel', params).get('cancelled_order_ids', [])
+
+    def accept_tender(self, tender_id):
+        return self.call('POST', f'/tenders/{tender_id}')
+
+    def decline_tender(self, tender_id):
+        return self.call('DELETE', f'/tenders/{tender_id}')
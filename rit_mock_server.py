@@ -0,0 +1,671 @@
+# -*- coding: utf-8 -*-
+"""
+Local RIT REST stand-in server
+
+Serves the subset of the RIT REST API used by ALGO2, LT3 and the speed bump test,
+so the scripts can be exercised, benchmarked and regression-tested without the
+live RIT client:
+- GET  /v1/case
+- GET  /v1/securities, /v1/securities/book, /v1/securities/history, /v1/securities/tas
+- GET  /v1/orders, POST /v1/orders, GET/DELETE /v1/orders/{id}
+- POST /v1/commands/cancel
+- GET  /v1/tenders, POST/DELETE /v1/tenders/{id}
+
+The market is simulated with a seeded random walk per ticker. Every tick the
+background liquidity is re-posted as a ladder around the reference price and a
+few noise market orders trade against the top of the book, so resting orders
+from the scripts get filled the way they would in a real case.
+
+Also supports injected latency (fixed + jitter), request/order rate limits that
+answer 429 with a 'wait' hint, and scripted or periodic tender arrival.
+
+Run it, then point the scripts at it through RIT_BASE_URL:
+    python rit_mock_server.py --port 9999 --tick-seconds 0.5 --start-tick 6
+    RIT_BASE_URL=http://localhost:9999/v1 python "ALGO2 small volume.py"
+
+Refer to:
+https://rit.306w.ca/RIT-REST-API/1.0.3/#/
+for the real API this mirrors.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# -------------------------------------------------------------------------------------
+# Defaults
+# -------------------------------------------------------------------------------------
+DEFAULT_TICKERS = {'ALGO': 20.00, 'CRZY': 25.00, 'TAME': 25.00}
+TICKS_PER_PERIOD = 300
+TICK_SECONDS = 1.0          # Wall-clock seconds per simulated tick
+PRICE_STEP = 0.01           # Minimum price increment
+VOLATILITY = 0.03           # Std-dev of the reference price move per tick
+HALF_SPREAD = 0.02          # Background quotes sit at ref -/+ HALF_SPREAD
+BOOK_DEPTH = 10             # Background levels per side
+NOISE_ORDERS = 2            # Background market orders per tick (each side drawn at random)
+TENDER_TTL = 15             # Ticks a generated tender stays open
+TRADER_ID = 'TRADER'
+MARKET_ID = 'MARKET'
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request exceeds a configured rate limit."""
+
+    def __init__(self, wait):
+        super().__init__(f"Rate limit exceeded, retry in {wait:.3f}s")
+        self.wait = wait
+
+
+class ApiError(Exception):
+    """Raised for requests the exchange rejects (answered with `status`)."""
+
+    def __init__(self, status, code, message):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+class _Budget:
+    """
+    Requests-per-second budget with a one-second burst, used to emulate the
+    exchange's rate limiting. A rate of 0 disables the budget.
+    """
+
+    def __init__(self, rate, clock):
+        self.rate = rate
+        self.clock = clock
+        self.tokens = float(rate)
+        self.stamp = clock()
+
+    def take(self):
+        if self.rate <= 0:
+            return
+        now = self.clock()
+        self.tokens = min(float(self.rate), self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens < 1.0:
+            raise RateLimitExceeded((1.0 - self.tokens) / self.rate)
+        self.tokens -= 1.0
+
+
+# -------------------------------------------------------------------------------------
+# Simulated Exchange
+# -------------------------------------------------------------------------------------
+
+class MockExchange:
+    """
+    In-process simulated exchange. Thread-safe; every public method takes the
+    exchange lock and first advances the simulation to the current tick.
+    It can be used directly (e.g. from benchmarks) or served over HTTP with
+    make_server().
+    """
+
+    def __init__(self, tickers=None, tick_seconds=TICK_SECONDS, start_tick=1,
+                 ticks_per_period=TICKS_PER_PERIOD, seed=1, order_rate=0,
+                 request_rate=0, tenders=None, tender_interval=0,
+                 tender_tickers=('CRZY', 'TAME'), commission=0.0, clock=time.monotonic):
+        self.lock = threading.RLock()
+        self.clock = clock
+        self.rng = random.Random(seed)
+        self.tick_seconds = tick_seconds
+        self.start_tick = start_tick
+        self.ticks_per_period = ticks_per_period
+        self.commission = commission
+        self.order_budget = _Budget(order_rate, clock)
+        self.request_budget = _Budget(request_rate, clock)
+        self.t0 = clock()
+
+        self.next_order_id = 1
+        self.next_tender_id = 1
+        self.orders = {}            # order_id -> order dict (user orders only)
+        self.books = {}             # ticker -> {'bids': [...], 'asks': [...]}
+        self.securities = {}        # ticker -> security dict
+        self.history = {}           # ticker -> list of candles, oldest first
+        self.tas = {}               # ticker -> list of trade prints, oldest first
+        self.next_print_id = 1
+        self.ref = {}               # ticker -> reference price
+        self.tenders = {}           # tender_id -> tender dict (open only)
+        self.tender_script = sorted(tenders or [], key=lambda t: t['tick'])
+        self.tender_interval = tender_interval
+        self.tender_tickers = [t for t in tender_tickers if t in (tickers or DEFAULT_TICKERS)]
+
+        for ticker, price in (tickers or DEFAULT_TICKERS).items():
+            self.ref[ticker] = price
+            self.books[ticker] = {'bids': [], 'asks': []}
+            self.history[ticker] = []
+            self.tas[ticker] = []
+            self.securities[ticker] = {
+                'ticker': ticker, 'type': 'STOCK', 'size': 1, 'position': 0,
+                'vwap': 0.0, 'nlv': 0.0, 'last': price, 'bid': 0.0, 'bid_size': 0,
+                'ask': 0.0, 'ask_size': 0, 'volume': 0, 'unrealized': 0.0,
+                'realized': 0.0, 'currency': 'CAD', 'total_volume': 0,
+                'is_tradeable': True, 'is_shortable': True,
+            }
+        self.tick = start_tick - 1
+        self._advance()
+
+    # ---------------------------------------------------------------------------------
+    # Clock & simulation
+    # ---------------------------------------------------------------------------------
+
+    def current_tick(self):
+        elapsed = int((self.clock() - self.t0) / self.tick_seconds) if self.tick_seconds > 0 else 0
+        return min(self.start_tick + elapsed, self.ticks_per_period)
+
+    def _advance(self):
+        """Runs the simulation forward to the current wall-clock tick."""
+        target = self.current_tick()
+        while self.tick < target:
+            self.tick += 1
+            for ticker in self.ref:
+                self._step_market(ticker)
+            self._step_tenders()
+
+    def _step_market(self, ticker):
+        rng = self.rng
+        ref = max(PRICE_STEP, round(self.ref[ticker] + rng.gauss(0.0, VOLATILITY), 2))
+        self.ref[ticker] = ref
+        open_price = self.securities[ticker]['last']
+        candle = {'tick': self.tick, 'open': open_price, 'high': open_price,
+                  'low': open_price, 'close': open_price}
+        self.history[ticker].append(candle)
+
+        # Re-post the background ladder; crossing levels trade against resting orders
+        book = self.books[ticker]
+        book['bids'] = [o for o in book['bids'] if o['trader_id'] != MARKET_ID]
+        book['asks'] = [o for o in book['asks'] if o['trader_id'] != MARKET_ID]
+        for level in range(BOOK_DEPTH):
+            offset = HALF_SPREAD + level * PRICE_STEP
+            size = rng.randrange(1, 21) * 100
+            self._submit(self._new_order(ticker, 'LIMIT', size, 'BUY', round(ref - offset, 2), MARKET_ID))
+            self._submit(self._new_order(ticker, 'LIMIT', size, 'SELL', round(ref + offset, 2), MARKET_ID))
+
+        for _ in range(NOISE_ORDERS):
+            action = 'BUY' if rng.random() < 0.5 else 'SELL'
+            size = rng.randrange(1, 11) * 100
+            self._submit(self._new_order(ticker, 'MARKET', size, action, None, MARKET_ID))
+
+    def _step_tenders(self):
+        for t_id in [t_id for t_id, t in self.tenders.items() if t['expires'] <= self.tick]:
+            del self.tenders[t_id]
+        while self.tender_script and self.tender_script[0]['tick'] <= self.tick:
+            spec = self.tender_script.pop(0)
+            ticker = spec['ticker']
+            price = spec.get('price', round(self.ref[ticker] + spec.get('price_offset', 0.0), 2))
+            self._add_tender(ticker, spec['action'], spec['quantity'], price,
+                             spec.get('expires_in', TENDER_TTL))
+        if (self.tender_interval > 0 and self.tender_tickers
+                and self.tick % self.tender_interval == 0):
+            rng = self.rng
+            ticker = rng.choice(self.tender_tickers)
+            action = 'BUY' if rng.random() < 0.5 else 'SELL'
+            price = round(self.ref[ticker] + rng.uniform(-0.15, 0.15), 2)
+            self._add_tender(ticker, action, rng.randrange(5, 21) * 1000, price, TENDER_TTL)
+
+    def _add_tender(self, ticker, action, quantity, price, expires_in):
+        t_id = self.next_tender_id
+        self.next_tender_id += 1
+        self.tenders[t_id] = {
+            'tender_id': t_id, 'period': 1, 'tick': self.tick,
+            'expires': self.tick + expires_in, 'caption': f"{action} {quantity} {ticker}",
+            'quantity': quantity, 'action': action, 'is_fixed_bid': True,
+            'price': price, 'ticker': ticker,
+        }
+
+    # ---------------------------------------------------------------------------------
+    # Matching engine
+    # ---------------------------------------------------------------------------------
+
+    def _new_order(self, ticker, order_type, quantity, action, price, trader_id):
+        order_id = self.next_order_id
+        self.next_order_id += 1
+        return {
+            'order_id': order_id, 'period': 1, 'tick': self.tick, 'trader_id': trader_id,
+            'ticker': ticker, 'type': order_type, 'quantity': quantity, 'action': action,
+            'price': price, 'quantity_filled': 0, 'vwap': None, 'status': 'OPEN',
+        }
+
+    def _submit(self, order):
+        """Matches an incoming order against the book, then rests any LIMIT remainder."""
+        book = self.books[order['ticker']]
+        buying = order['action'] == 'BUY'
+        resting = book['asks'] if buying else book['bids']
+        while resting and order['quantity_filled'] < order['quantity']:
+            best = resting[0]
+            if order['type'] == 'LIMIT':
+                if buying and best['price'] > order['price']:
+                    break
+                if not buying and best['price'] < order['price']:
+                    break
+            qty = min(order['quantity'] - order['quantity_filled'],
+                      best['quantity'] - best['quantity_filled'])
+            self._fill(order, qty, best['price'])
+            self._fill(best, qty, best['price'])
+            self._print(order['ticker'], best['price'], qty)
+            if best['quantity_filled'] >= best['quantity']:
+                resting.pop(0)
+
+        if order['quantity_filled'] >= order['quantity']:
+            order['status'] = 'TRANSACTED'
+        elif order['type'] == 'LIMIT':
+            side = book['bids'] if buying else book['asks']
+            side.append(order)
+            if buying:
+                side.sort(key=lambda o: (-o['price'], o['order_id']))
+            else:
+                side.sort(key=lambda o: (o['price'], o['order_id']))
+        else:
+            # MARKET remainder with no liquidity left is dropped
+            order['status'] = 'TRANSACTED' if order['quantity_filled'] else 'CANCELLED'
+        self._refresh_quote(order['ticker'])
+        return order
+
+    def _fill(self, order, qty, price):
+        filled = order['quantity_filled']
+        vwap = order['vwap'] or 0.0
+        order['vwap'] = round((vwap * filled + price * qty) / (filled + qty), 4)
+        order['quantity_filled'] = filled + qty
+        if order['quantity_filled'] >= order['quantity']:
+            order['status'] = 'TRANSACTED'
+        if order['trader_id'] == TRADER_ID:
+            self._book_trade(order['ticker'], qty if order['action'] == 'BUY' else -qty, price)
+
+    def _print(self, ticker, price, qty):
+        """Records a trade print: last price, volume and the current candle."""
+        sec = self.securities[ticker]
+        sec['last'] = price
+        sec['volume'] += qty
+        candle = self.history[ticker][-1]
+        candle['close'] = price
+        candle['high'] = max(candle['high'], price)
+        candle['low'] = min(candle['low'], price)
+        self.tas[ticker].append({'id': self.next_print_id, 'period': 1, 'tick': self.tick,
+                                 'price': price, 'quantity': qty})
+        self.next_print_id += 1
+
+    def _book_trade(self, ticker, signed_qty, price):
+        sec = self.securities[ticker]
+        pos = sec['position']
+        new_pos = pos + signed_qty
+        if pos == 0 or (pos > 0) == (signed_qty > 0):
+            sec['vwap'] = round((sec['vwap'] * abs(pos) + price * abs(signed_qty)) / abs(new_pos), 4)
+        else:
+            closed = min(abs(pos), abs(signed_qty))
+            direction = 1 if pos > 0 else -1
+            sec['realized'] = round(sec['realized'] + closed * (price - sec['vwap']) * direction, 2)
+            if new_pos == 0:
+                sec['vwap'] = 0.0
+            elif (new_pos > 0) != (pos > 0):
+                sec['vwap'] = price
+        sec['realized'] = round(sec['realized'] - self.commission * abs(signed_qty), 2)
+        sec['position'] = new_pos
+        sec['total_volume'] += abs(signed_qty)
+
+    def _refresh_quote(self, ticker):
+        book = self.books[ticker]
+        sec = self.securities[ticker]
+        for side, price_key, size_key in (('bids', 'bid', 'bid_size'), ('asks', 'ask', 'ask_size')):
+            levels = book[side]
+            if levels:
+                top = levels[0]['price']
+                sec[price_key] = top
+                sec[size_key] = sum(o['quantity'] - o['quantity_filled']
+                                    for o in levels if o['price'] == top)
+            else:
+                sec[price_key] = 0.0
+                sec[size_key] = 0
+        sec['unrealized'] = round(sec['position'] * (sec['last'] - sec['vwap']), 2) if sec['position'] else 0.0
+        sec['nlv'] = round(sec['position'] * sec['last'], 2)
+
+    def _cancel(self, order):
+        if order['status'] != 'OPEN':
+            return False
+        book = self.books[order['ticker']]
+        side = book['bids'] if order['action'] == 'BUY' else book['asks']
+        side.remove(order)
+        order['status'] = 'CANCELLED'
+        self._refresh_quote(order['ticker'])
+        return True
+
+    # ---------------------------------------------------------------------------------
+    # API (one method per endpoint)
+    # ---------------------------------------------------------------------------------
+
+    def check_rate(self, is_order=False):
+        with self.lock:
+            self.request_budget.take()
+            if is_order:
+                self.order_budget.take()
+
+    def get_case(self):
+        with self.lock:
+            self._advance()
+            status = 'ACTIVE' if self.tick < self.ticks_per_period else 'STOPPED'
+            return {'name': 'RIT Mock', 'period': 1, 'tick': self.tick,
+                    'ticks_per_period': self.ticks_per_period, 'total_periods': 1,
+                    'status': status, 'is_enforce_trading_limits': False}
+
+    def get_securities(self, ticker=None):
+        with self.lock:
+            self._advance()
+            if ticker is not None:
+                if ticker not in self.securities:
+                    raise ApiError(400, 'INVALID_TICKER', f"Unknown ticker {ticker}")
+                return [dict(self.securities[ticker])]
+            return [dict(sec) for sec in self.securities.values()]
+
+    def get_book(self, ticker, limit=20):
+        with self.lock:
+            self._advance()
+            if ticker not in self.books:
+                raise ApiError(400, 'INVALID_TICKER', f"Unknown ticker {ticker}")
+            book = self.books[ticker]
+            return {'bids': [dict(o) for o in book['bids'][:limit]],
+                    'asks': [dict(o) for o in book['asks'][:limit]]}
+
+    def get_history(self, ticker, limit=None):
+        with self.lock:
+            self._advance()
+            if ticker not in self.history:
+                raise ApiError(400, 'INVALID_TICKER', f"Unknown ticker {ticker}")
+            candles = self.history[ticker][::-1]
+            return [dict(c) for c in (candles[:limit] if limit else candles)]
+
+    def get_tas(self, ticker, after=None, limit=None):
+        """Trade prints newest first; `after` returns only prints with a larger id."""
+        with self.lock:
+            self._advance()
+            if ticker not in self.tas:
+                raise ApiError(400, 'INVALID_TICKER', f"Unknown ticker {ticker}")
+            prints = []
+            for p in reversed(self.tas[ticker]):
+                if (after is not None and p['id'] <= after) or (limit and len(prints) >= limit):
+                    break
+                prints.append(dict(p))
+            return prints
+
+    def get_orders(self, status='OPEN', ticker=None):
+        with self.lock:
+            self._advance()
+            return [dict(o) for o in self.orders.values()
+                    if o['status'] == status and (ticker is None or o['ticker'] == ticker)]
+
+    def get_order(self, order_id):
+        with self.lock:
+            self._advance()
+            if order_id not in self.orders:
+                raise ApiError(404, 'NOT_FOUND', f"Order {order_id} not found")
+            return dict(self.orders[order_id])
+
+    def post_order(self, ticker, order_type, quantity, action, price=None):
+        with self.lock:
+            self._advance()
+            if self.tick >= self.ticks_per_period:
+                raise ApiError(400, 'CASE_STOPPED', "Case is not active")
+            if ticker not in self.books:
+                raise ApiError(400, 'INVALID_TICKER', f"Unknown ticker {ticker}")
+            if order_type not in ('LIMIT', 'MARKET') or action not in ('BUY', 'SELL'):
+                raise ApiError(400, 'INVALID_ORDER', "type must be LIMIT/MARKET, action BUY/SELL")
+            if quantity <= 0:
+                raise ApiError(400, 'INVALID_ORDER', "quantity must be positive")
+            if order_type == 'LIMIT':
+                if price is None:
+                    raise ApiError(400, 'INVALID_ORDER', "LIMIT orders require a price")
+                price = round(price, 2)
+            order = self._new_order(ticker, order_type, quantity, action, price, TRADER_ID)
+            self.orders[order['order_id']] = order
+            return dict(self._submit(order))
+
+    def delete_order(self, order_id):
+        with self.lock:
+            self._advance()
+            order = self.orders.get(order_id)
+            if order is None:
+                raise ApiError(404, 'NOT_FOUND', f"Order {order_id} not found")
+            if not self._cancel(order):
+                raise ApiError(400, 'INVALID_ORDER', f"Order {order_id} is not open")
+            return {'success': True}
+
+    def cancel_orders(self, all_orders=False, ticker=None, ids=None):
+        with self.lock:
+            self._advance()
+            cancelled = []
+            for order in list(self.orders.values()):
+                if order['status'] != 'OPEN':
+                    continue
+                if all_orders or (ticker and order['ticker'] == ticker) or (ids and order['order_id'] in ids):
+                    self._cancel(order)
+                    cancelled.append(order['order_id'])
+            return {'cancelled_order_ids': cancelled}
+
+    def get_tenders(self):
+        with self.lock:
+            self._advance()
+            return [dict(t) for t in self.tenders.values()]
+
+    def accept_tender(self, tender_id):
+        with self.lock:
+            self._advance()
+            tender = self.tenders.pop(tender_id, None)
+            if tender is None:
+                raise ApiError(404, 'NOT_FOUND', f"Tender {tender_id} not found")
+            signed = tender['quantity'] if tender['action'] == 'BUY' else -tender['quantity']
+            self._book_trade(tender['ticker'], signed, tender['price'])
+            self._refresh_quote(tender['ticker'])
+            return {'success': True}
+
+    def decline_tender(self, tender_id):
+        with self.lock:
+            self._advance()
+            if self.tenders.pop(tender_id, None) is None:
+                raise ApiError(404, 'NOT_FOUND', f"Tender {tender_id} not found")
+            return {'success': True}
+
+
+# -------------------------------------------------------------------------------------
+# HTTP Layer
+# -------------------------------------------------------------------------------------
+
+def _param(query, name, cast=str, default=None):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        return cast(values[0])
+    except ValueError:
+        raise ApiError(400, 'INVALID_PARAMETER', f"Invalid value for {name}: {values[0]}")
+
+
+def _route(exchange, method, path, query):
+    """Dispatches one request to the exchange. Returns the JSON-serialisable body."""
+    parts = [p for p in path.split('/') if p]
+    if parts[:1] != ['v1']:
+        raise ApiError(404, 'NOT_FOUND', f"Unknown path {path}")
+    parts = parts[1:]
+    is_order = method == 'POST' and parts == ['orders']
+    exchange.check_rate(is_order)
+
+    if method == 'GET' and parts == ['case']:
+        return exchange.get_case()
+    if method == 'GET' and parts == ['securities']:
+        return exchange.get_securities(_param(query, 'ticker'))
+    if method == 'GET' and parts == ['securities', 'book']:
+        return exchange.get_book(_param(query, 'ticker'), _param(query, 'limit', int, 20))
+    if method == 'GET' and parts == ['securities', 'history']:
+        return exchange.get_history(_param(query, 'ticker'), _param(query, 'limit', int))
+    if method == 'GET' and parts == ['securities', 'tas']:
+        return exchange.get_tas(_param(query, 'ticker'), _param(query, 'after', int), _param(query, 'limit', int))
+    if parts == ['orders']:
+        if method == 'GET':
+            return exchange.get_orders(_param(query, 'status', str, 'OPEN'), _param(query, 'ticker'))
+        if method == 'POST':
+            return exchange.post_order(_param(query, 'ticker'), _param(query, 'type'),
+                                       _param(query, 'quantity', int, 0), _param(query, 'action'),
+                                       _param(query, 'price', float))
+    if len(parts) == 2 and parts[0] == 'orders':
+        order_id = _param({'id': [parts[1]]}, 'id', int)
+        if method == 'GET':
+            return exchange.get_order(order_id)
+        if method == 'DELETE':
+            return exchange.delete_order(order_id)
+    if method == 'POST' and parts == ['commands', 'cancel']:
+        ids = _param(query, 'ids')
+        ids = {int(i) for i in ids.split(',') if i} if ids else None
+        return exchange.cancel_orders(bool(_param(query, 'all', int, 0)), _param(query, 'ticker'), ids)
+    if parts == ['tenders'] and method == 'GET':
+        return exchange.get_tenders()
+    if len(parts) == 2 and parts[0] == 'tenders':
+        tender_id = _param({'id': [parts[1]]}, 'id', int)
+        if method == 'POST':
+            return exchange.accept_tender(tender_id)
+        if method == 'DELETE':
+            return exchange.decline_tender(tender_id)
+    raise ApiError(404, 'NOT_FOUND', f"Unknown endpoint {method} {path}")
+
+
+def dispatch(exchange, method, path, query):
+    """
+    Answers one API request the way the HTTP server does, without the HTTP.
+    Returns (status, body, extra headers).
+    """
+    headers = {}
+    try:
+        status, body = 200, _route(exchange, method, path, query)
+    except RateLimitExceeded as e:
+        status = 429
+        body = {'code': 'TOO_MANY_REQUESTS', 'message': str(e), 'wait': round(e.wait, 3)}
+        headers['Retry-After'] = f"{e.wait:.3f}"
+    except ApiError as e:
+        status, body = e.status, {'code': e.code, 'message': str(e)}
+    return status, body, headers
+
+
+class RitRequestHandler(BaseHTTPRequestHandler):
+    """Serves MockExchange over HTTP/1.1 keep-alive connections."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = 64 * 1024            # Headers and body go out in one write
+
+    def _handle(self, method):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        if server.latency > 0 or server.jitter > 0:
+            time.sleep(server.latency + server.rng.random() * server.jitter)
+
+        headers = {}
+        if server.api_key and self.headers.get('X-API-Key') != server.api_key:
+            status, body = 401, {'code': 'UNAUTHORIZED', 'message': 'API key required'}
+        else:
+            url = urlparse(self.path)
+            status, body, headers = dispatch(server.exchange, method, url.path, parse_qs(url.query))
+
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(exchange, host='localhost', port=9999, latency=0.0, jitter=0.0,
+                api_key=None, verbose=False, seed=1):
+    """
+    Builds a threading HTTP server around `exchange`. Latency and jitter are in seconds.
+    Use port=0 to bind a free port (read it back from server.server_address).
+    """
+    server = ThreadingHTTPServer((host, port), RitRequestHandler)
+    server.daemon_threads = True
+    server.exchange = exchange
+    server.latency = latency
+    server.jitter = jitter
+    server.api_key = api_key
+    server.verbose = verbose
+    server.rng = random.Random(seed)
+    return server
+
+
+def start_background(exchange=None, **kwargs):
+    """
+    Starts a server on a daemon thread and returns (server, base_url).
+    Call server.shutdown() to stop it.
+    """
+    server = make_server(exchange or MockExchange(), **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+# -------------------------------------------------------------------------------------
+# Command Line
+# -------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Local RIT REST stand-in server")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=9999)
+    parser.add_argument('--tick-seconds', type=float, default=TICK_SECONDS,
+                        help="wall-clock seconds per tick (default: %(default)s)")
+    parser.add_argument('--start-tick', type=int, default=1)
+    parser.add_argument('--ticks', type=int, default=TICKS_PER_PERIOD, help="ticks per period")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="fixed latency added to every response")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="uniform random extra latency")
+    parser.add_argument('--order-rate', type=float, default=0,
+                        help="max order submissions per second, 0 = unlimited")
+    parser.add_argument('--request-rate', type=float, default=0,
+                        help="max requests per second (all endpoints), 0 = unlimited")
+    parser.add_argument('--tenders', help="JSON file with scripted tenders: "
+                        "[{\"tick\", \"ticker\", \"action\", \"quantity\", \"price\" or \"price_offset\", \"expires_in\"}]")
+    parser.add_argument('--tender-interval', type=int, default=0,
+                        help="also generate a random tender every N ticks, 0 = off")
+    parser.add_argument('--commission', type=float, default=0.0, help="per-share commission")
+    parser.add_argument('--api-key', help="require this X-API-Key (default: accept any)")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    args = parser.parse_args()
+
+    tenders = None
+    if args.tenders:
+        with open(args.tenders) as f:
+            tenders = json.load(f)
+
+    exchange = MockExchange(tick_seconds=args.tick_seconds, start_tick=args.start_tick,
+                            ticks_per_period=args.ticks, seed=args.seed,
+                            order_rate=args.order_rate, request_rate=args.request_rate,
+                            tenders=tenders, tender_interval=args.tender_interval,
+                            commission=args.commission)
+    server = make_server(exchange, args.host, args.port, args.latency_ms / 1000.0,
+                         args.jitter_ms / 1000.0, args.api_key, args.verbose, args.seed)
+    print(f"RIT mock serving on http://{args.host}:{args.port}/v1 (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
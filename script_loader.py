@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Import helper for the trading scripts
+
+The scripts are named for humans ("ALGO2 small volume.py", "LT3 auto 1.py",
+"Speed bump test.py") and cannot be imported with a plain import statement.
+load_script() imports one of them as a module, without running main(), so
+offline tools (backtests, sweeps, benchmarks) can reuse its parameters and
+functions.
+"""
+
+import importlib.util
+import os
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ALGO2_SCRIPT = 'ALGO2 small volume.py'
+LT3_SCRIPT = 'LT3 auto 1.py'
+SPEEDBUMP_SCRIPT = 'Speed bump test.py'
+
+
+def load_script(filename, module_name=None):
+    """
+    Imports a script from this directory as a fresh module object and returns it.
+    Each call returns a new, independent module (its globals are not shared).
+    """
+    path = os.path.join(SCRIPT_DIR, filename)
+    name = module_name or os.path.splitext(filename)[0].lower().replace(' ', '_')
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
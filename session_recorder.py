@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Always-on binary recorder for RIT API sessions
+
+record_session(session, recorder) wraps a requests.Session (like
+latency_stats.instrument) so every response the script sees is appended to two
+memory-mapped, append-only files:
+- <name>.idx: a 32-byte header followed by one fixed 48-byte record per call
+  (time, latency, endpoint, status, ticker, numeric id from the URL, and the
+  offset/length of the response body)
+- <name>.dat: the raw response bodies, back to back, exactly as received
+
+Recording is a struct.pack_into and a memcpy into the mapping under a lock
+(a few microseconds per call); nothing is serialized or flushed on the hot path.
+The files grow by doubling and are trimmed to size by close(). The record count
+in the header is updated after every record, so a session cut short by a crash
+is still readable up to its last complete record.
+
+SessionLog reads a session back: the index is memory-mapped straight into a
+NumPy structured array (one column per field, no parsing); bodies are sliced
+from the data file on demand.
+
+Example:
+    recorder = SessionRecorder('lt3_session')
+    record_session(session, recorder)
+    ...
+    recorder.close()
+
+    log = SessionLog('lt3_session')
+    books = log.select('GET /securities/book', ticker='CRZY')
+    latency_ms = log['latency'][books] * 1000
+    first_book = log.json(books.nonzero()[0][0])
+"""
+
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+import numpy as np
+
+from latency_stats import endpoint_name
+
+MAGIC = b'RITREC01'
+HEADER = struct.Struct('<8sQdQ')       # magic, record count, wall-clock start, reserved
+INITIAL_SIZE = 1 << 20
+
+# Endpoint codes stored in the index; 0 is any other endpoint
+ENDPOINTS = (
+    'OTHER',
+    'GET /case',
+    'GET /trader',
+    'GET /limits',
+    'GET /news',
+    'GET /securities',
+    'GET /securities/book',
+    'GET /securities/history',
+    'GET /securities/tas',
+    'GET /orders',
+    'GET /orders/{id}',
+    'POST /orders',
+    'DELETE /orders/{id}',
+    'POST /commands/cancel',
+    'GET /tenders',
+    'POST /tenders/{id}',
+    'DELETE /tenders/{id}',
+)
+ENDPOINT_CODES = {name: code for code, name in enumerate(ENDPOINTS)}
+METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+
+RECORD_DTYPE = np.dtype([
+    ('time', '<f8'),          # Seconds since the recorder started (perf_counter)
+    ('latency', '<f4'),       # Seconds from request to response
+    ('endpoint', '<u2'),      # Index into ENDPOINTS
+    ('status', '<u2'),        # HTTP status, 0 if the request raised
+    ('method', 'u1'),         # Index into METHODS
+    ('ticker', 'S11'),        # "ticker" request parameter, if any
+    ('ref_id', '<i8'),        # Numeric id in the URL (order / tender id), else -1
+    ('offset', '<u8'),        # Body position in the .dat file
+    ('length', '<u4'),        # Body length in bytes
+])
+RECORD = struct.Struct('<dfHHB11sqQI')
+assert RECORD.size == RECORD_DTYPE.itemsize
+
+_ID = re.compile(r'/(\d+)(?:/|$)')
+
+
+class _MappedFile:
+    """An append-only file written through a growing mmap."""
+
+    def __init__(self, path, reserved=0):
+        self.file = open(path, 'w+b')
+        self.size = max(INITIAL_SIZE, reserved)
+        self.file.truncate(self.size)
+        self.map = mmap.mmap(self.file.fileno(), self.size)
+        self.pos = reserved
+
+    def reserve(self, n):
+        """Returns the position of `n` fresh bytes, growing the mapping if needed."""
+        pos = self.pos
+        if pos + n > self.size:
+            while pos + n > self.size:
+                self.size *= 2
+            self.map.resize(self.size)
+        self.pos = pos + n
+        return pos
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.truncate(self.pos)
+        self.file.close()
+
+
+class SessionRecorder:
+    """
+    Appends one index record and one body per API call to <name>.idx / <name>.dat.
+    Thread-safe; call close() at exit to trim the files.
+    """
+
+    def __init__(self, name, clock=time.perf_counter):
+        self.name = name
+        self.clock = clock
+        self.start = clock()
+        self.count = 0
+        self.lock = threading.Lock()
+        self.index = _MappedFile(name + '.idx', HEADER.size)
+        self.data = _MappedFile(name + '.dat')
+        HEADER.pack_into(self.index.map, 0, MAGIC, 0, time.time(), 0)
+        self.closed = False
+
+    def record(self, method, url, params, started, latency, status, body):
+        """Appends one call. `started` is a clock() reading, `body` the raw response bytes."""
+        label = endpoint_name(method, url)
+        ticker = params.get('ticker', '') if isinstance(params, dict) else ''
+        ref = _ID.search(url.split('?', 1)[0])
+        length = len(body)
+        with self.lock:
+            if self.closed:
+                return
+            offset = self.data.reserve(length)
+            self.data.map[offset:offset + length] = body
+            RECORD.pack_into(self.index.map, self.index.reserve(RECORD.size),
+                             started - self.start, latency, ENDPOINT_CODES.get(label, 0), status or 0,
+                             METHODS.index(method.upper()) if method.upper() in METHODS else 0,
+                             ticker.encode()[:11], int(ref.group(1)) if ref else -1, offset, length)
+            self.count += 1
+            struct.pack_into('<Q', self.index.map, 8, self.count)
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.index.close()
+            self.data.close()
+
+
+def record_session(session, recorder):
+    """
+    Wraps session.request so every response through the session is appended to
+    `recorder`. Requests that raise are recorded with status 0 and an empty body.
+    Returns the session.
+    """
+    send = session.request
+    clock = recorder.clock
+
+    def recorded_request(method, url, *args, **kwargs):
+        start = clock()
+        try:
+            resp = send(method, url, *args, **kwargs)
+        except Exception:
+            recorder.record(method, url, kwargs.get('params'), start, clock() - start, 0, b'')
+            raise
+        recorder.record(method, url, kwargs.get('params'), start, clock() - start,
+                        resp.status_code, resp.content)
+        return resp
+
+    session.request = recorded_request
+    return session
+
+
+class SessionLog:
+    """
+    A recorded session. Indexing by field name returns that column for every
+    call, e.g. log['latency'], log['status'], log['endpoint'].
+    """
+
+    def __init__(self, name):
+        with open(name + '.idx', 'rb') as f:
+            magic, count, self.wall_start, _ = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{name}.idx is not a session recording")
+        self.records = np.memmap(name + '.idx', dtype=RECORD_DTYPE, mode='r',
+                                 offset=HEADER.size, shape=(count,)) if count else \
+            np.empty(0, dtype=RECORD_DTYPE)
+        self.data = np.memmap(name + '.dat', dtype=np.uint8, mode='r') \
+            if os.path.getsize(name + '.dat') else np.empty(0, dtype=np.uint8)
+
+    def __len__(self):
+        return self.records.size
+
+    def __getitem__(self, field):
+        return self.records[field]
+
+    @property
+    def endpoints(self):
+        """Endpoint label for every call, as an array of strings."""
+        return np.array(ENDPOINTS)[self.records['endpoint']]
+
+    def select(self, endpoint, ticker=None, status=None):
+        """Boolean mask of calls to `endpoint`, optionally filtered by ticker and status."""
+        mask = self.records['endpoint'] == ENDPOINT_CODES[endpoint]
+        if ticker is not None:
+            mask &= self.records['ticker'] == ticker.encode()
+        if status is not None:
+            mask &= self.records['status'] == status
+        return mask
+
+    def body(self, i):
+        """Raw response body of call `i`."""
+        record = self.records[i]
+        return self.data[record['offset']:record['offset'] + record['length']].tobytes()
+
+    def json(self, i):
+        """Parsed response body of call `i` (None if empty)."""
+        body = self.body(i)
+        return json.loads(body) if body else None
+
+    def bodies(self, mask):
+        """Parsed response bodies for every call selected by `mask`, in order."""
+        return [self.json(i) for i in np.flatnonzero(mask)]
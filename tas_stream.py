@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming time-and-sales reader
+
+tas_pages() is a generator over GET /v1/securities/tas that keeps an `after`
+cursor (the id of the newest print seen), so each step downloads only the
+prints that happened since the previous one instead of re-reading history.
+
+TasStream drives that generator for one ticker and folds every new print into
+running statistics in O(1) per print:
+- last traded price and tick
+- volume and VWAP over the last `window_ticks` ticks (running sums over a deque;
+  prints leaving the window are subtracted, never re-summed)
+- total volume and VWAP since the stream started
+
+Other code can subscribe a callback that is called with each new print.
+
+Example:
+    stream = TasStream(session, BASE_URL, "CRZY", window_ticks=10)
+    stream.subscribe(lambda p: print(p["tick"], p["price"], p["quantity"]))
+    stream.update()                 # one request, only prints after the cursor
+    print(stream.last, stream.vwap, stream.volume)
+"""
+
+from collections import deque
+
+WINDOW_TICKS = 10            # Default rolling window for VWAP and volume
+
+
+def tas_pages(session, base_url, ticker, after=0):
+    """
+    Generator: each next() makes one request and yields the list of prints newer
+    than the cursor, oldest first (empty if nothing traded). The cursor then moves
+    to the newest print yielded. Raises requests.HTTPError on a failed request
+    (the generator is finished after that; start a new one from the last cursor).
+    """
+    while True:
+        resp = session.get(f"{base_url}/securities/tas", params={"ticker": ticker, "after": after})
+        resp.raise_for_status()
+        prints = sorted(resp.json(), key=lambda p: p["id"])
+        if prints:
+            after = prints[-1]["id"]
+        yield prints
+
+
+class TasStream:
+    """Incremental last price, rolling VWAP and volume for one ticker's prints."""
+
+    def __init__(self, session, base_url, ticker, window_ticks=WINDOW_TICKS):
+        self.session = session
+        self.base_url = base_url
+        self.ticker = ticker
+        self.window_ticks = window_ticks
+        self.after = 0
+        self.pages = tas_pages(session, base_url, ticker)
+        self.subscribers = []
+
+        self.last = None
+        self.last_tick = None
+        self.window = deque()        # (tick, price * quantity, quantity) inside the window
+        self.window_notional = 0.0
+        self.window_volume = 0
+        self.total_notional = 0.0
+        self.total_volume = 0
+
+    def subscribe(self, callback):
+        """Calls callback(print_dict) for every new print, in order."""
+        self.subscribers.append(callback)
+
+    def update(self):
+        """
+        Fetches the prints since the cursor and applies them. Returns the number of
+        new prints. Request errors propagate; the next update() retries from the
+        same cursor.
+        """
+        try:
+            prints = next(self.pages)
+        except Exception:
+            self.pages = tas_pages(self.session, self.base_url, self.ticker, self.after)
+            raise
+        for p in prints:
+            self.apply(p)
+        return len(prints)
+
+    def apply(self, p):
+        """Folds one print into the running statistics."""
+        if p["id"] <= self.after:
+            return
+        self.after = p["id"]
+        price, quantity, tick = p["price"], p["quantity"], p["tick"]
+        notional = price * quantity
+        self.last = price
+        self.last_tick = tick
+        self.total_notional += notional
+        self.total_volume += quantity
+
+        self.window.append((tick, notional, quantity))
+        self.window_notional += notional
+        self.window_volume += quantity
+        while self.window and self.window[0][0] <= tick - self.window_ticks:
+            _, old_notional, old_quantity = self.window.popleft()
+            self.window_notional -= old_notional
+            self.window_volume -= old_quantity
+
+        for callback in self.subscribers:
+            callback(p)
+
+    @property
+    def vwap(self):
+        """VWAP over the last window_ticks ticks (None before the first print)."""
+        return self.window_notional / self.window_volume if self.window_volume else None
+
+    @property
+    def volume(self):
+        """Shares traded over the last window_ticks ticks."""
+        return self.window_volume
+
+    @property
+    def session_vwap(self):
+        """VWAP of every print since the stream started."""
+        return self.total_notional / self.total_volume if self.total_volume else None
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Warm start for the trading loops
+
+Lets a script be launched before the period opens and still act on the first
+tradable tick:
+- wait_for_case() polls /v1/case until the tick reaches `first_tick`. The polls
+  are paced by the loop's PollScheduler, which learns the tick phase from them,
+  so they back off while the case is far from open. In the last tick before the
+  open it sleeps until the earliest time the tick can change, then polls every
+  `spin` seconds until it does: the opening tick is seen a few milliseconds
+  after it starts, at the cost of a handful of extra requests. Every poll is
+  settled against the scheduler's request budget as it goes (a spin faster than
+  the budget is slowed to it), and the spin stops `spin_limit` seconds after
+  the earliest open time, falling back to the scheduler's idle polling.
+- One tick before the open it calls `arm()`, where the script re-warms
+  everything that may have gone cold during the wait.
+- open_connections() fills the session's keep-alive pool with concurrent
+  requests, so the first concurrent reads and order legs do not each pay for a
+  new connection.
+- start_workers() starts the `workers` threads of a ThreadPoolExecutor ahead of
+  time (executors otherwise spawn their threads on first use).
+
+What to prefetch (securities, streams, book, payload templates) is up to each
+script's warm-up function.
+
+Example:
+    def warm_up():
+        open_connections(session, f"{BASE_URL}/case", POOL_SIZE)
+        start_workers(pair_executor, PAIR_WORKERS)
+        read_state()                    # one request per endpoint the loop uses
+
+    warm_up()
+    tick = wait_for_case(lambda: get_tick(session), scheduler, first_tick=6, arm=warm_up)
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+FIRST_TICK = 6               # First tick the scripts trade on (they run while 5 < tick < 295)
+SPIN_INTERVAL = 0.005        # Poll spacing while the opening tick is due
+SPIN_LIMIT = 0.1             # Longest spin past the earliest open time
+BARRIER_TIMEOUT = 2.0        # Seconds the warm-up threads wait for each other
+
+
+def wait_for_case(read_tick, scheduler, first_tick=FIRST_TICK, arm=None, stop=None, spin=SPIN_INTERVAL,
+                  spin_limit=SPIN_LIMIT):
+    """
+    Polls the tick with `read_tick()` (one /v1/case request) until it is at least
+    `first_tick` and returns it (or the last tick read once `stop()` is true).
+    `arm()` runs once, when the tick before `first_tick` is first seen
+    (immediately if the case is already open).
+    """
+    armed = arm is None
+    while True:
+        tick = read_tick()
+        scheduler.observe_tick(tick)
+        if not armed and tick >= first_tick - 1:
+            armed = True
+            arm()
+            continue                    # Arming took time; re-read before sleeping
+        if tick >= first_tick or (stop is not None and stop()):
+            return tick
+        if tick == first_tick - 1 and scheduler.phase_lo is not None:
+            # The opening tick starts somewhere in the phase window: sleep to its start, then spin
+            earliest = scheduler.phase_lo + first_tick * scheduler.tick_seconds
+            now = scheduler.clock()
+            if now < earliest + spin_limit:
+                debt = scheduler.settle()           # Pay for each poll now, not at the loop's first wait()
+                scheduler.sleep(max(spin, debt, min(earliest - now, scheduler.max_idle)))
+                continue
+        scheduler.wait(active=False)
+
+
+def open_connections(session, url, count):
+    """
+    Sends `count` concurrent GETs to `url` so the pool holds that many open
+    keep-alive connections. Returns the number that succeeded.
+    """
+    if count <= 0:
+        return 0
+    barrier = threading.Barrier(count, timeout=BARRIER_TIMEOUT)
+
+    def request():
+        try:
+            barrier.wait()
+            return session.get(url).ok
+        except (threading.BrokenBarrierError, requests.RequestException):
+            return False
+
+    with ThreadPoolExecutor(max_workers=count, thread_name_prefix='warm') as pool:
+        return sum(pool.map(lambda _: request(), range(count)))
+
+
+def start_workers(executor, workers):
+    """Starts `workers` threads of a ThreadPoolExecutor now (pass its max_workers)."""
+    barrier = threading.Barrier(workers, timeout=BARRIER_TIMEOUT)
+    for future in [executor.submit(barrier.wait) for _ in range(workers)]:
+        try:
+            future.result()
+        except threading.BrokenBarrierError:
+            pass